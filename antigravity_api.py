@@ -7,13 +7,17 @@ Based on insights from Henrik-3/AntigravityQuota extension.
 import subprocess
 import ssl
 import json
-import urllib.request
-import re
+import http.client
+import socket
+import threading
 import platform
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
+from ls_discovery import ProcessInfo, LanguageServerDiscovery, get_backend
+
 
 @dataclass
 class ModelQuotaInfo:
@@ -46,68 +50,192 @@ class QuotaSnapshot:
     raw_response: Optional[Dict[str, Any]] = None
 
 
-@dataclass
-class ProcessInfo:
-    """Antigravity process connection info."""
-    extension_port: int
-    connect_port: int
-    csrf_token: str
+# === REQUEST CONSTANTS ===
+# Bodies never change, so serialize them once at import time
+API_HOST = "127.0.0.1"
+SERVICE_PREFIX = "/exa.language_server_pb.LanguageServerService"
+UNLEASH_PATH = f"{SERVICE_PREFIX}/GetUnleashData"
+USER_STATUS_PATH = f"{SERVICE_PREFIX}/GetUserStatus"
+UNLEASH_BODY = json.dumps({"wrapper_data": {}}).encode('utf-8')
+USER_STATUS_BODY = json.dumps({
+    "metadata": {
+        "ideName": "antigravity",
+        "extensionName": "antigravity",
+        "locale": "en"
+    }
+}).encode('utf-8')
+
+CONNECT_TIMEOUT = 2  # seconds - localhost should accept almost instantly
+PROBE_CONNECT_TIMEOUT = 0.5  # Port probes: a listener that doesn't accept at once isn't ours
+PROBE_TIMEOUT = 3
+PROBE_WORKERS = 4
+PORT_HINT_SPAN = 3  # The API port is usually allocated right next to extension_port
+FETCH_TIMEOUT = 5
+
+# Errors that mean a kept-alive socket went stale and one retry is worthwhile
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                            http.client.BadStatusLine, ConnectionResetError,
+                            ConnectionAbortedError, BrokenPipeError)
+
+
+class _PooledConnection:
+    """A keep-alive HTTPS connection to one local port, safe to share across threads."""
+    
+    def __init__(self, port: int, ssl_context: ssl.SSLContext):
+        self.port = port
+        self._ssl_context = ssl_context
+        self._conn: Optional[http.client.HTTPSConnection] = None
+        self._lock = threading.Lock()
+    
+    def post(self, path: str, body: bytes, headers: Dict[str, str], timeout: float,
+             connect_timeout: float = CONNECT_TIMEOUT):
+        """POST and return (status, body bytes). Reconnects once on a stale socket."""
+        with self._lock:
+            for attempt in (1, 2):
+                reused = self._conn is not None
+                try:
+                    conn = self._connect(timeout, connect_timeout)
+                    conn.request('POST', path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                    if response.will_close:
+                        self.close_locked()
+                    return response.status, data
+                except _STALE_CONNECTION_ERRORS:
+                    self.close_locked()
+                    if attempt == 2 or not reused:
+                        raise
+                except Exception:
+                    self.close_locked()
+                    raise
+    
+    def _connect(self, timeout: float, connect_timeout: float) -> http.client.HTTPSConnection:
+        if self._conn is None:
+            conn = http.client.HTTPSConnection(API_HOST, self.port, timeout=connect_timeout,
+                                               context=self._ssl_context)
+            conn.connect()
+            # Small request/response pairs: don't let Nagle hold back a write
+            conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._conn = conn
+        # Bound every read, not just the connect
+        self._conn.sock.settimeout(timeout)
+        return self._conn
+    
+    def close_locked(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+    
+    def close(self):
+        if self._lock.acquire(blocking=False):
+            try:
+                self.close_locked()
+            finally:
+                self._lock.release()
+            return
+        # A request is in flight: abort its socket so it fails now instead of timing out
+        conn = self._conn
+        sock = conn.sock if conn is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
 
 
 class AntigravityAPI:
     """Client for Antigravity's local language server API."""
     
     def __init__(self):
-        self.process_info: Optional[ProcessInfo] = None
+        self.backend = get_backend()
+        self.discovery = LanguageServerDiscovery(
+            rediscover=self.detect_process, probe=self._test_port, backend=self.backend)
         self._ssl_context = ssl.create_default_context()
         self._ssl_context.check_hostname = False
         self._ssl_context.verify_mode = ssl.CERT_NONE
+        
+        # Keep-alive connections per port (avoids a TCP+TLS handshake per refresh)
+        self._pool: Dict[int, _PooledConnection] = {}
+        self._pool_lock = threading.Lock()
+        self._headers_cache: Dict[str, Dict[str, str]] = {}
+    
+    def _headers(self, csrf_token: str) -> Dict[str, str]:
+        headers = self._headers_cache.get(csrf_token)
+        if headers is None:
+            headers = {
+                'Content-Type': 'application/json',
+                'X-Codeium-Csrf-Token': csrf_token,
+                'Connect-Protocol-Version': '1',
+                'Connection': 'keep-alive'
+            }
+            self._headers_cache = {csrf_token: headers}  # Only the live token matters
+        return headers
+    
+    def _connection(self, port: int) -> _PooledConnection:
+        with self._pool_lock:
+            conn = self._pool.get(port)
+            if conn is None:
+                conn = self._pool[port] = _PooledConnection(port, self._ssl_context)
+            return conn
+    
+    def _post(self, port: int, path: str, body: bytes, csrf_token: str, timeout: float,
+              connect_timeout: float = CONNECT_TIMEOUT):
+        """POST to the language server over a pooled connection. Returns (status, bytes)."""
+        return self._connection(port).post(path, body, self._headers(csrf_token), timeout,
+                                           connect_timeout)
+    
+    def close_connections(self, keep_port: Optional[int] = None):
+        """Close pooled connections (except `keep_port`)."""
+        with self._pool_lock:
+            ports = [p for p in self._pool if p != keep_port]
+            conns = [self._pool.pop(p) for p in ports]
+        for conn in conns:
+            conn.close()
+    
+    @property
+    def process_info(self) -> Optional[ProcessInfo]:
+        """Last known-good connection info (never blocks; may trigger background discovery)."""
+        return self.discovery.current()
+    
+    @process_info.setter
+    def process_info(self, info: Optional[ProcessInfo]):
+        self.discovery.set(info)
     
     def detect_process(self) -> Optional[ProcessInfo]:
-        """Detect the Antigravity language server process and extract connection info."""
-        if platform.system() != "Windows":
-            print("[AntigravityAPI] Only Windows is supported currently")
+        """Detect the Antigravity language server process and extract connection info.
+        
+        Blocking - runs on the discovery thread, not the UI thread.
+        """
+        if self.backend is None:
+            print(f"[AntigravityAPI] Process detection not supported on {platform.system()}")
             return None
         
         try:
-            # Find language_server process with WMIC
-            cmd = 'wmic process where "name like \'%language_server%\'" get CommandLine,ProcessId /FORMAT:CSV'
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=10)
-            
-            if not result.stdout:
+            candidates = self.backend.find_candidates()
+            if not candidates:
                 print("[AntigravityAPI] No language_server process found")
                 return None
             
-            for line in result.stdout.splitlines():
-                if 'language_server' not in line.lower():
-                    continue
+            for candidate in candidates:
+                print(f"[AntigravityAPI] Found process: port={candidate.extension_port}, pid={candidate.pid}")
                 
-                # Parse command line for extension port and CSRF token
-                # Format: --extension_server_port XXXXX --csrf_token XXXXX
-                ext_port_match = re.search(r'--extension_server_port\s+(\d+)', line)
-                csrf_match = re.search(r'--csrf_token\s+([a-fA-F0-9-]+)', line)
-                pid_match = re.search(r',(\d+)$', line)
-
+                # Find the actual listening port
+                connect_port = self._find_listening_port(candidate.pid, candidate.csrf_token,
+                                                         candidate.extension_port)
                 
-                if ext_port_match and csrf_match:
-                    extension_port = int(ext_port_match.group(1))
-                    csrf_token = csrf_match.group(1)
-                    pid = int(pid_match.group(1)) if pid_match else 0
-                    
-                    print(f"[AntigravityAPI] Found process: port={extension_port}, pid={pid}")
-                    
-                    # Find the actual listening port
-                    connect_port = self._find_listening_port(pid, csrf_token)
-                    
-                    if connect_port:
-                        self.process_info = ProcessInfo(
-                            extension_port=extension_port,
-                            connect_port=connect_port,
-                            csrf_token=csrf_token
-                        )
-                        return self.process_info
+                if connect_port:
+                    self.close_connections(keep_port=connect_port)
+                    return ProcessInfo(
+                        extension_port=candidate.extension_port,
+                        connect_port=connect_port,
+                        csrf_token=candidate.csrf_token,
+                        pid=candidate.pid
+                    )
             
-            print("[AntigravityAPI] Could not parse process info from command line")
+            print("[AntigravityAPI] No responding port for language_server")
             return None
             
         except subprocess.TimeoutExpired:
@@ -117,97 +245,89 @@ class AntigravityAPI:
             print(f"[AntigravityAPI] Error detecting process: {e}")
             return None
     
-    def _find_listening_port(self, pid: int, csrf_token: str) -> Optional[int]:
+    def _find_listening_port(self, pid: int, csrf_token: str,
+                             extension_port: Optional[int] = None) -> Optional[int]:
         """Find the actual listening port for the language server."""
         try:
-            # Use netstat to find ports for this PID
-            cmd = f'netstat -ano | findstr ":{pid}" | findstr LISTENING'
-            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=5)
-            
-            ports = set()
-            for line in result.stdout.splitlines():
-                match = re.search(r':(\d+)\s+', line)
-                if match:
-                    port = int(match.group(1))
-                    if 10000 < port < 65535:  # Reasonable port range
-                        ports.add(port)
-            
-            if not ports:
-                # Fallback: try netstat with PID at end
-                cmd = f'netstat -ano | findstr {pid}'
-                result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=5)
-                for line in result.stdout.splitlines():
-                    if 'LISTENING' in line:
-                        match = re.search(r'127\.0\.0\.1:(\d+)', line)
-                        if match:
-                            ports.add(int(match.group(1)))
-            
-            # Test each port
-            for port in sorted(ports):
-                if self._test_port(port, csrf_token):
-                    return port
-            
-            return None
+            ports = self._probe_order(self.backend.listening_ports(pid), extension_port)
+            return self._probe_ports(ports, csrf_token)
             
         except Exception as e:
             print(f"[AntigravityAPI] Error finding listening port: {e}")
             return None
     
+    def _probe_order(self, ports: List[int], extension_port: Optional[int]) -> List[int]:
+        """Candidate ports with the likely ones first (last-known, extension_port neighbours)."""
+        hints = []
+        last = self.discovery.last_known
+        if last:
+            hints.append(last.connect_port)
+        if extension_port:
+            for offset in range(1, PORT_HINT_SPAN + 1):
+                hints += [extension_port + offset, extension_port - offset]
+        
+        if ports:
+            listening = set(ports)
+            hints = [p for p in hints if p in listening]
+        return list(dict.fromkeys(hints + sorted(ports)))
+    
+    def _probe_ports(self, ports: List[int], csrf_token: str) -> Optional[int]:
+        """Probe ports in parallel; the first to answer wins and the rest are cancelled."""
+        if not ports:
+            return None
+        if len(ports) == 1:
+            return ports[0] if self._test_port(ports[0], csrf_token) else None
+        
+        pool = ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(ports)),
+                                  thread_name_prefix="PortProbe")
+        try:
+            # Submission order = start order, so hints get the first workers
+            futures = {pool.submit(self._test_port, port, csrf_token): port for port in ports}
+            for future in as_completed(futures):
+                if future.result():
+                    return futures[future]
+            return None
+        finally:
+            # Don't wait for losing probes: queued ones never start and
+            # in-flight ones are aborted by close_connections(keep_port=...)
+            pool.shutdown(wait=False, cancel_futures=True)
+    
     def _test_port(self, port: int, csrf_token: str) -> bool:
         """Test if a port responds to the API."""
         try:
-            url = f"https://127.0.0.1:{port}/exa.language_server_pb.LanguageServerService/GetUnleashData"
-            
-            data = json.dumps({"wrapper_data": {}}).encode('utf-8')
-            
-            req = urllib.request.Request(url, data=data, method='POST')
-            req.add_header('Content-Type', 'application/json')
-            req.add_header('X-Codeium-Csrf-Token', csrf_token)
-            req.add_header('Connect-Protocol-Version', '1')
-            
-            with urllib.request.urlopen(req, timeout=3, context=self._ssl_context) as response:
-                if response.status == 200:
-                    return True
+            status, _ = self._post(port, UNLEASH_PATH, UNLEASH_BODY, csrf_token, PROBE_TIMEOUT,
+                                   PROBE_CONNECT_TIMEOUT)
+            if status == 200:
+                return True  # Keep the connection: fetch_quota will reuse it
         except Exception:
             pass
+        with self._pool_lock:
+            conn = self._pool.pop(port, None)
+        if conn is not None:
+            conn.close()
         return False
     
     def fetch_quota(self) -> Optional[QuotaSnapshot]:
         """Fetch quota data from the Antigravity API."""
-        if not self.process_info:
-            self.detect_process()
-        
-        if not self.process_info:
-            print("[AntigravityAPI] No process info available")
+        info = self.process_info
+        if not info:
+            # Discovery is running in the background; the next poll picks it up
             return None
         
         try:
-            url = f"https://127.0.0.1:{self.process_info.connect_port}/exa.language_server_pb.LanguageServerService/GetUserStatus"
-            
-            payload = {
-                "metadata": {
-                    "ideName": "antigravity",
-                    "extensionName": "antigravity",
-                    "locale": "en"
-                }
-            }
-            
-            data = json.dumps(payload).encode('utf-8')
-            
-            req = urllib.request.Request(url, data=data, method='POST')
-            req.add_header('Content-Type', 'application/json')
-            req.add_header('X-Codeium-Csrf-Token', self.process_info.csrf_token)
-            req.add_header('Connect-Protocol-Version', '1')
-            
-            with urllib.request.urlopen(req, timeout=5, context=self._ssl_context) as response:
-                response_data = json.loads(response.read().decode('utf-8'))
+            status, body = self._post(info.connect_port, USER_STATUS_PATH, USER_STATUS_BODY,
+                                      info.csrf_token, FETCH_TIMEOUT)
+            if status != 200:
+                raise RuntimeError(f"HTTP {status}")
             
+            response_data = json.loads(body.decode('utf-8'))
             return self._parse_response(response_data)
             
         except Exception as e:
             print(f"[AntigravityAPI] Error fetching quota: {e}")
-            # Invalidate process info so we re-detect next time
-            self.process_info = None
+            # Re-validate (cheap) or re-detect in the background
+            self.close_connections()
+            self.discovery.report_failure()
             return None
     
     def _parse_response(self, data: Dict[str, Any]) -> QuotaSnapshot:
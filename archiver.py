@@ -0,0 +1,360 @@
+"""
+Session Archiver
+Parallel, throttled compression of old conversation files.
+
+Files are compressed in a process pool, streamed in fixed-size chunks so
+memory stays bounded regardless of file size. Each worker honours a share of
+a global I/O rate limit and checks a shared cancel event between chunks.
+Output is written to a temp file, verified by decompressing it and comparing
+SHA-256 digests, and only then renamed into place and the original removed.
+
+Codecs: gzip, bz2, lzma (xz) from the stdlib, zstd when the `zstandard`
+package is installed, and 'dedup' (chunk_store: cross-session deduplication).
+"""
+import bz2
+import gzip
+import hashlib
+import lzma
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from chunk_store import open_dedup
+from config import (ARCHIVE_MIN_AGE_DAYS, ARCHIVE_MIN_SIZE, ARCHIVE_CHUNK_SIZE,
+                    ARCHIVE_RATE_LIMIT_MB, ARCHIVE_WORKERS)
+
+# Optional zstd support
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+
+@dataclass
+class Codec:
+    """A compression format usable for archived sessions."""
+    name: str
+    suffix: str  # Full session suffix, e.g. '.pb.gz'
+    levels: range
+    default_level: int
+
+
+def _zstd_open(path, mode, level=None):
+    if 'r' in mode:
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return zstandard.ZstdCompressor(level=level or 3).stream_writer(open(path, 'wb'), closefd=True)
+
+
+CODECS: Dict[str, Codec] = {
+    'gzip': Codec('gzip', '.pb.gz', range(1, 10), 6),
+    'bz2': Codec('bz2', '.pb.bz2', range(1, 10), 9),
+    'lzma': Codec('lzma', '.pb.xz', range(0, 10), 6),
+    'dedup': Codec('dedup', '.pb.dedup', range(1, 10), 6),
+}
+if HAS_ZSTD:
+    CODECS['zstd'] = Codec('zstd', '.pb.zst', range(1, 23), 3)
+
+# Every suffix a session file may carry (whether or not its codec is installed)
+SESSION_SUFFIXES = ('.pb', '.pb.gz', '.pb.bz2', '.pb.xz', '.pb.zst', '.pb.dedup')
+ARCHIVE_SUFFIXES = SESSION_SUFFIXES[1:]
+
+
+def split_session_name(name: str):
+    """'abc.pb.xz' -> ('abc', '.pb.xz'); None if not a session file."""
+    for suffix in ARCHIVE_SUFFIXES + ('.pb',):
+        if name.endswith(suffix):
+            return name[:-len(suffix)], suffix
+    return None
+
+
+def codec_for(path) -> Optional[str]:
+    """Codec name for an archived session path (None for plain .pb)."""
+    name = str(path)
+    for codec in CODECS.values():
+        if name.endswith(codec.suffix):
+            return codec.name
+    return None
+
+
+def open_codec(path, mode='rb', codec=None, level=None):
+    """Open a (possibly compressed) file for streaming binary read/write."""
+    codec = codec or codec_for(path)
+    if codec == 'gzip':
+        return gzip.open(path, mode, compresslevel=level or 6) if 'w' in mode else gzip.open(path, mode)
+    if codec == 'bz2':
+        return bz2.open(path, mode, compresslevel=level or 9) if 'w' in mode else bz2.open(path, mode)
+    if codec == 'lzma':
+        return lzma.open(path, mode, preset=level) if 'w' in mode else lzma.open(path, mode)
+    if codec == 'dedup':
+        return open_dedup(path, mode, level)
+    if codec == 'zstd':
+        if not HAS_ZSTD:
+            raise RuntimeError("zstandard is not installed")
+        return _zstd_open(path, mode, level)
+    return open(path, mode)
+
+
+def is_appendable(path) -> bool:
+    """Plain .pb sessions only grow, so a scan can resume where the last one stopped.
+
+    A compressed stream is rewritten as a whole; offsets into its
+    decompressed data say nothing about how much of it changed.
+    """
+    return not str(path).endswith(ARCHIVE_SUFFIXES)
+
+
+def open_session_file(path):
+    """Open a session file for reading, decompressing transparently."""
+    return open_codec(path, 'rb')
+
+
+def find_archive_candidates(conversations_dir, exclude_ids=(), min_age_days=ARCHIVE_MIN_AGE_DAYS,
+                            min_size=ARCHIVE_MIN_SIZE) -> List[dict]:
+    """Uncompressed sessions old and large enough to archive."""
+    cutoff = time.time() - min_age_days * 86400
+    candidates = []
+    for f in Path(conversations_dir).glob('*.pb'):
+        if '.tmp' in f.name or any(sid and sid in f.stem for sid in exclude_ids):
+            continue
+        try:
+            stat = f.stat()
+        except OSError:
+            continue
+        if stat.st_mtime < cutoff and stat.st_size > min_size:
+            candidates.append({
+                'path': f,
+                'size': stat.st_size,
+                'size_mb': round(stat.st_size / 1024 / 1024, 2),
+                'age_days': int((time.time() - stat.st_mtime) / 86400)
+            })
+    return candidates
+
+
+# ==== WORKER PROCESS ====
+
+_cancel_event = None
+_progress_queue = None
+
+
+def _lower_priority():
+    """Drop this worker to background CPU/IO priority (best effort)."""
+    try:
+        if hasattr(os, 'nice'):
+            os.nice(10)
+        else:
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+    except Exception:
+        pass
+
+
+def _init_worker(cancel_event, progress_queue, low_priority=False):
+    global _cancel_event, _progress_queue
+    _cancel_event = cancel_event
+    _progress_queue = progress_queue
+    if low_priority:
+        _lower_priority()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _Throttle:
+    """Sleep as needed to keep throughput under `rate` bytes/second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.start = time.monotonic()
+        self.done = 0
+
+    def consume(self, n):
+        if not self.rate:
+            return
+        self.done += n
+        ahead = self.done / self.rate - (time.monotonic() - self.start)
+        # Sleep in slices so cancellation stays responsive
+        while ahead > 0:
+            if _cancel_event is not None and _cancel_event.is_set():
+                raise _Cancelled()
+            time.sleep(min(ahead, 0.1))
+            ahead -= 0.1
+
+
+def _check_cancel():
+    if _cancel_event is not None and _cancel_event.is_set():
+        raise _Cancelled()
+
+
+def compress_file(src, codec, level, chunk_size=ARCHIVE_CHUNK_SIZE, rate=None) -> dict:
+    """Compress one file (runs in a worker process). Returns a result dict."""
+    src = Path(src)
+    dst = src.with_name(src.name[:-len('.pb')] + CODECS[codec].suffix)
+    tmp = dst.with_name(dst.name + '.tmp')
+    result = {'src': str(src), 'dst': str(dst), 'orig_size': 0, 'new_size': 0,
+              'status': 'ok', 'error': None}
+    throttle = _Throttle(rate)
+    try:
+        before = src.stat()
+        result['orig_size'] = before.st_size
+
+        digest = hashlib.sha256()
+        with open(src, 'rb') as f_in, open_codec(tmp, 'wb', codec, level) as f_out:
+            while True:
+                _check_cancel()
+                chunk = f_in.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f_out.write(chunk)
+                throttle.consume(len(chunk))
+                if _progress_queue is not None:
+                    _progress_queue.put((str(src), len(chunk)))
+
+        # Verify: the archive must decompress to exactly what we read
+        check = hashlib.sha256()
+        with open_codec(tmp, 'rb', codec) as f_check:
+            while True:
+                _check_cancel()
+                chunk = f_check.read(chunk_size)
+                if not chunk:
+                    break
+                check.update(chunk)
+                throttle.consume(len(chunk))
+        if check.digest() != digest.digest():
+            raise ValueError("verification failed (digest mismatch)")
+
+        after = src.stat()
+        if (after.st_size, after.st_mtime) != (before.st_size, before.st_mtime):
+            raise ValueError("source changed while archiving")
+
+        os.replace(tmp, dst)
+        # Keep the session's age so sorting and retention still see it as old
+        os.utime(dst, (before.st_atime, before.st_mtime))
+        src.unlink()
+        result['new_size'] = dst.stat().st_size
+    except _Cancelled:
+        result['status'] = 'cancelled'
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    finally:
+        if tmp.exists():
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    return result
+
+
+# ==== JOB (parent process) ====
+
+@dataclass
+class ArchiveProgress:
+    total_files: int
+    total_bytes: int
+    done_files: int = 0
+    done_bytes: int = 0
+    saved_bytes: int = 0
+    failed: int = 0
+    finished: bool = False
+    cancelled: bool = False
+    results: List[dict] = field(default_factory=list)
+
+    @property
+    def fraction(self):
+        return self.done_bytes / self.total_bytes if self.total_bytes else 1.0
+
+
+class ArchiveJob:
+    """Background archive run; poll `progress` from the UI thread."""
+
+    def __init__(self, files: Iterable, codec='gzip', level=None, workers=ARCHIVE_WORKERS,
+                 rate_limit_mb=ARCHIVE_RATE_LIMIT_MB, chunk_size=ARCHIVE_CHUNK_SIZE,
+                 on_done: Optional[Callable[['ArchiveProgress'], None]] = None, low_priority=False):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown or unavailable codec: {codec}")
+        self.files = [Path(f) for f in files]
+        self.codec = codec
+        self.level = CODECS[codec].default_level if level is None else level
+        self.workers = max(1, min(workers, len(self.files) or 1))
+        self.chunk_size = chunk_size
+        # The global budget is split evenly across workers
+        self.rate = (rate_limit_mb * 1024 * 1024 / self.workers) if rate_limit_mb else None
+        self.on_done = on_done
+        self.low_priority = low_priority
+
+        sizes = []
+        for f in self.files:
+            try:
+                sizes.append(f.stat().st_size)
+            except OSError:
+                sizes.append(0)
+        self.progress = ArchiveProgress(total_files=len(self.files), total_bytes=sum(sizes))
+
+        ctx = multiprocessing.get_context()
+        self._cancel = ctx.Event()
+        self._queue = ctx.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ArchiveJob", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.progress.cancelled = True
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        if self._thread:
+            self._thread.join(timeout)
+        return self.progress
+
+    def _drain(self):
+        try:
+            while True:
+                _, n = self._queue.get_nowait()
+                self.progress.done_bytes += n
+        except queue.Empty:
+            pass
+
+    def _run(self):
+        progress = self.progress
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                     initargs=(self._cancel, self._queue, self.low_priority)) as pool:
+                futures = [pool.submit(compress_file, str(f), self.codec, self.level,
+                                       self.chunk_size, self.rate) for f in self.files]
+                pending = set(futures)
+                while pending:
+                    done = {f for f in pending if f.done()}
+                    for future in done:
+                        result = future.result()
+                        progress.results.append(result)
+                        if result['status'] == 'ok':
+                            progress.done_files += 1
+                            progress.saved_bytes += result['orig_size'] - result['new_size']
+                        elif result['status'] == 'error':
+                            progress.failed += 1
+                            print(f"[Archiver] Error compressing {result['src']}: {result['error']}")
+                    pending -= done
+                    self._drain()
+                    if pending:
+                        time.sleep(0.05)
+        except Exception as e:
+            print(f"[Archiver] Archive job failed: {e}")
+        finally:
+            self._drain()
+            progress.finished = True
+            if self.on_done:
+                self.on_done(progress)
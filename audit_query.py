@@ -0,0 +1,316 @@
+"""
+Audit Query Engine
+Streaming reader and incremental sidecar index over audit_log.jsonl.
+
+The index (audit_log.idx.json) remembers how far each segment has been read,
+so every refresh only parses bytes appended since the last one. It keeps
+per-task and per-agent counters, an hourly action histogram, and byte-offset
+ranges per task/agent/time bucket so record lookups only touch the parts of
+the log that can match. Rotated gzip segments are read transparently.
+
+Segments are identified by a hash of their first line rather than their file
+name, so a log that gets rotated and compressed mid-index resumes where it
+left off instead of being counted twice.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from quota_config import AUDIT_LOG_FILE, AUDIT_HISTOGRAM_BUCKET
+from audit_writer import audit_writer, list_audit_segments
+
+INDEX_VERSION = 1
+
+COUNTER_FIELDS = ('total_actions', 'model_calls', 'high_cost_actions',
+                  'artifacts_created', 'suspected_rate_limit_events', 'failed_actions')
+
+
+def _parse_ts(value) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _open_segment(path: Path):
+    return gzip.open(path, 'rb') if path.name.endswith('.gz') else open(path, 'rb')
+
+
+def _segment_key(path: Path) -> Optional[str]:
+    """Stable identity of a segment: hash of its first line."""
+    try:
+        with _open_segment(path) as f:
+            first = f.readline()
+    except (OSError, EOFError):
+        return None
+    if not first.endswith(b'\n'):
+        return None  # Empty or first record still being written
+    return hashlib.sha1(first).hexdigest()[:16]
+
+
+def _new_counters():
+    counters = {name: 0 for name in COUNTER_FIELDS}
+    counters.update({'first_ts': None, 'last_ts': None, 'ranges': {}})
+    return counters
+
+
+class AuditIndex:
+    """Incrementally maintained index over the audit log and its rotated segments."""
+
+    def __init__(self, log_path=AUDIT_LOG_FILE, index_path=None, bucket_seconds=AUDIT_HISTOGRAM_BUCKET):
+        self.log_path = Path(log_path)
+        self.index_path = Path(index_path) if index_path else self.log_path.with_name(
+            f"{self.log_path.stem}.idx.json")
+        self.bucket_seconds = bucket_seconds
+        self._lock = threading.Lock()
+        self._state = None
+        self._files: Dict[str, Path] = {}  # segment key -> current path
+
+    # === INDEX MAINTENANCE ===
+
+    def refresh(self):
+        """Index any bytes appended since the last refresh and persist the index."""
+        if self.log_path == audit_writer.path:
+            audit_writer.flush()
+
+        with self._lock:
+            state = self._load()
+            changed = False
+            for path in list_audit_segments(self.log_path) + [self.log_path]:
+                if not path.exists():
+                    continue
+                key = _segment_key(path)
+                if key is None:
+                    continue
+                self._files[key] = path
+                seg = state['segments'].setdefault(key, {'offset': 0, 'done': False})
+                seg['file'] = path.name
+                if seg['done']:
+                    continue
+                if self._index_segment(state, key, path, seg):
+                    changed = True
+                # Rotated segments never change again
+                if path != self.log_path and path.name.endswith('.gz'):
+                    seg['done'] = True
+                    changed = True
+            if changed:
+                self._save(state)
+        return self
+
+    def _index_segment(self, state, key, path: Path, seg) -> bool:
+        offset = seg['offset']
+        indexed = False
+        try:
+            with _open_segment(path) as f:
+                f.seek(offset)  # gzip: decompress-forward, still streaming
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Partial record; pick it up next refresh
+                    self._index_record(state, key, offset, line)
+                    offset += len(line)
+                    indexed = True
+        except (OSError, EOFError) as e:
+            print(f"[AuditIndex] Error reading {path.name}: {e}")
+        seg['offset'] = offset
+        return indexed
+
+    def _index_record(self, state, key, offset, line: bytes):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        if record.get('type') != 'USAGE_LOG':
+            return
+
+        ts = _parse_ts(record.get('timestamp_utc'))
+        task = state['tasks'].setdefault(record.get('task_id') or 'unknown_task', _new_counters())
+        agent = state['agents'].setdefault(record.get('agent_id') or 'unknown_agent', _new_counters())
+        for counters in (task, agent):
+            self._count(counters, record, ts, key, offset, len(line))
+
+        if ts is not None:
+            bucket = str(int(ts // self.bucket_seconds * self.bucket_seconds))
+            hist = state['histogram'].setdefault(bucket, {})
+            action = record.get('action_type', 'unknown')
+            hist[action] = hist.get(action, 0) + 1
+            if bucket not in state['time_index']:
+                state['time_index'][bucket] = [key, offset]
+
+    @staticmethod
+    def _count(counters, record, ts, key, offset, length):
+        is_model = record.get('action_type') == 'model_inference'
+        success = record.get('success', True)
+        counters['total_actions'] += 1
+        counters['model_calls'] += is_model
+        counters['high_cost_actions'] += record.get('estimated_token_cost') == 'high'
+        counters['artifacts_created'] += record.get('artifacts_produced') or 0
+        counters['failed_actions'] += not success
+        # Failed model calls are the best signal we have for rate limiting
+        counters['suspected_rate_limit_events'] += is_model and not success
+        if ts is not None:
+            if counters['first_ts'] is None or ts < counters['first_ts']:
+                counters['first_ts'] = ts
+            if counters['last_ts'] is None or ts > counters['last_ts']:
+                counters['last_ts'] = ts
+        # Byte range per segment so lookups only read what can match
+        rng = counters['ranges'].get(key)
+        if rng is None:
+            counters['ranges'][key] = [offset, offset + length]
+        else:
+            rng[1] = offset + length
+
+    # === PERSISTENCE ===
+
+    def _load(self):
+        if self._state is not None:
+            return self._state
+        state = None
+        try:
+            if self.index_path.exists():
+                with open(self.index_path, 'r') as f:
+                    state = json.load(f)
+                if state.get('version') != INDEX_VERSION or state.get('bucket_seconds') != self.bucket_seconds:
+                    state = None
+        except Exception as e:
+            print(f"[AuditIndex] Rebuilding index ({e})")
+            state = None
+        if state is None:
+            state = {'version': INDEX_VERSION, 'bucket_seconds': self.bucket_seconds,
+                     'segments': {}, 'tasks': {}, 'agents': {}, 'histogram': {}, 'time_index': {}}
+        self._state = state
+        return state
+
+    def _save(self, state):
+        try:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print(f"[AuditIndex] Failed to save index: {e}")
+
+    # === QUERIES ===
+
+    def task_summary(self, task_id, refresh=True) -> Dict[str, Any]:
+        """Counters for one task, in the shape emit_task_summary expects."""
+        return self._summary('tasks', task_id, refresh)
+
+    def agent_summary(self, agent_id, refresh=True) -> Dict[str, Any]:
+        return self._summary('agents', agent_id, refresh)
+
+    def tasks(self, refresh=True) -> Dict[str, Dict[str, Any]]:
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return {tid: self._public(c) for tid, c in self._load()['tasks'].items()}
+
+    def agents(self, refresh=True) -> Dict[str, Dict[str, Any]]:
+        if refresh:
+            self.refresh()
+        with self._lock:
+            return {aid: self._public(c) for aid, c in self._load()['agents'].items()}
+
+    def histogram(self, since=None, until=None, bucket_seconds=None, refresh=True) -> List[Dict[str, Any]]:
+        """Action counts per time bucket, oldest first.
+
+        bucket_seconds may be any multiple of the index bucket (e.g. a day).
+        """
+        if refresh:
+            self.refresh()
+        width = max(self.bucket_seconds, bucket_seconds or self.bucket_seconds)
+        merged: Dict[int, Dict[str, int]] = {}
+        with self._lock:
+            for bucket, actions in self._load()['histogram'].items():
+                start = int(bucket)
+                if (since is not None and start + self.bucket_seconds <= since) or \
+                   (until is not None and start >= until):
+                    continue
+                slot = merged.setdefault(start // width * width, {})
+                for action, count in actions.items():
+                    slot[action] = slot.get(action, 0) + count
+        return [{'start': start, 'total': sum(actions.values()), 'actions': actions}
+                for start, actions in sorted(merged.items())]
+
+    def iter_records(self, task_id=None, agent_id=None, since=None, until=None,
+                     refresh=True) -> Iterator[Dict[str, Any]]:
+        """Stream matching USAGE_LOG records, reading only indexed byte ranges."""
+        if refresh:
+            self.refresh()
+        with self._lock:
+            state = self._load()
+            ranges = self._candidate_ranges(state, task_id, agent_id, since)
+            order = list(state['segments'].keys())
+
+        for key in sorted(ranges, key=order.index):
+            path = self._files.get(key)
+            if path is None or not path.exists():
+                continue
+            start, end = ranges[key]
+            with _open_segment(path) as f:
+                f.seek(start)
+                pos = start
+                for line in f:
+                    if end is not None and pos >= end:
+                        break
+                    pos += len(line)
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('type') != 'USAGE_LOG':
+                        continue
+                    if task_id is not None and record.get('task_id') != task_id:
+                        continue
+                    if agent_id is not None and record.get('agent_id') != agent_id:
+                        continue
+                    ts = _parse_ts(record.get('timestamp_utc'))
+                    if since is not None and (ts is None or ts < since):
+                        continue
+                    if until is not None and ts is not None and ts >= until:
+                        continue
+                    yield record
+
+    def _candidate_ranges(self, state, task_id, agent_id, since):
+        """Byte ranges per segment that may contain matching records."""
+        if task_id is not None or agent_id is not None:
+            table, key = ('tasks', task_id) if task_id is not None else ('agents', agent_id)
+            counters = state[table].get(key)
+            return {k: tuple(r) for k, r in counters['ranges'].items()} if counters else {}
+
+        ranges = {k: (0, None) for k in state['segments']}
+        if since is not None:
+            # Skip whole segments/prefixes before the first bucket that can match
+            buckets = sorted((int(b), loc) for b, loc in state['time_index'].items()
+                             if int(b) + self.bucket_seconds > since)
+            if buckets:
+                first_key, first_offset = buckets[0][1]
+                order = list(state['segments'].keys())
+                cut = order.index(first_key) if first_key in order else 0
+                ranges = {k: (0, None) for k in order[cut:]}
+                ranges[first_key] = (first_offset, None)
+            else:
+                ranges = {}
+        return ranges
+
+    def _summary(self, table, key, refresh):
+        if refresh:
+            self.refresh()
+        with self._lock:
+            counters = self._load()[table].get(key)
+            return self._public(counters or _new_counters())
+
+    @staticmethod
+    def _public(counters):
+        return {k: v for k, v in counters.items() if k != 'ranges'}
+
+
+# Singleton instance
+audit_index = AuditIndex()
@@ -0,0 +1,210 @@
+"""
+Audit Log Writer
+Buffered, background-flushed writer for audit_log.jsonl with rotation.
+
+Records are serialized on the caller's thread and appended to an in-memory
+buffer; a daemon thread writes them in batches (every N records or T ms)
+through a file handle that stays open. The log rotates by size or by day
+and rotated segments are gzip-compressed off the hot path.
+"""
+import atexit
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from quota_config import (AUDIT_LOG_FILE, AUDIT_FLUSH_EVERY, AUDIT_FLUSH_INTERVAL_MS,
+                          AUDIT_FSYNC, AUDIT_ROTATE_MAX_BYTES, AUDIT_ROTATE_DAILY)
+
+
+def list_audit_segments(log_path: Path) -> List[Path]:
+    """Rotated segments for `log_path`, oldest first (compressed or pending)."""
+    log_path = Path(log_path)
+    pattern = f"{log_path.stem}.*{log_path.suffix}*"
+    segments = [p for p in log_path.parent.glob(pattern)
+                if p != log_path and not p.name.endswith('.tmp')]
+    return sorted(segments, key=lambda p: _segment_sort_key(p, log_path.stem))
+
+
+def _segment_sort_key(segment: Path, stem: str):
+    """'audit_log.20250101-120000-2.jsonl.gz' -> ('20250101', '120000', 2)"""
+    parts = segment.name[len(stem) + 1:].split('.')[0].split('-')
+    seq = int(parts[2]) if len(parts) > 2 and parts[2].isdigit() else 0
+    return (parts[0], parts[1] if len(parts) > 1 else '', seq)
+
+
+class AuditLogWriter:
+    """Append-only JSONL writer with batching, fsync policy and rotation."""
+
+    def __init__(self, path=AUDIT_LOG_FILE, flush_every=AUDIT_FLUSH_EVERY,
+                 flush_interval_ms=AUDIT_FLUSH_INTERVAL_MS, fsync=AUDIT_FSYNC,
+                 max_bytes=AUDIT_ROTATE_MAX_BYTES, rotate_daily=AUDIT_ROTATE_DAILY):
+        self.path = Path(path)
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.fsync = fsync
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+
+        self._buffer: List[str] = []
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()  # Serializes file access and rotation
+        self._file = None
+        self._file_size = 0
+        self._segment_day = None
+        self._thread = None
+        self._closed = False
+        self._compressing = set()
+        self._recovered = False
+
+        atexit.register(self.close)
+
+    # === PUBLIC API ===
+
+    def write(self, record: Dict[str, Any]):
+        """Queue one record. Never blocks on disk (written synchronously once closed)."""
+        line = json.dumps(record) + '\n'
+        with self._cond:
+            self._buffer.append(line)
+            closed = self._closed
+            if not closed:
+                if self._thread is None:
+                    self._start_thread()
+                if len(self._buffer) >= self.flush_every:
+                    self._cond.notify()
+        if closed:
+            # No background thread after close (e.g. a late atexit handler): write it now
+            self._drain()
+            self._close_file()
+
+    def flush(self):
+        """Synchronously write everything queued so far."""
+        self._drain()
+
+    def close(self):
+        """Flush and close the file handle (registered with atexit)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+        self._close_file()
+
+    # === BACKGROUND FLUSH ===
+
+    def _start_thread(self):
+        self._thread = threading.Thread(target=self._run, name="AuditLogWriter", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            with self._cond:
+                if len(self._buffer) < self.flush_every and not self._closed:
+                    self._cond.wait(self.flush_interval)
+            self._drain()
+
+    def _drain(self):
+        """Write out the buffer. It is taken under the I/O lock, so batches reach the file
+        in the order they were queued and a flush() returns only after every earlier
+        batch (possibly one the background thread is writing) is on disk."""
+        with self._io_lock:
+            with self._cond:
+                lines, self._buffer = self._buffer, []
+            if lines:
+                self._write_lines(lines)
+
+    # === FILE I/O ===
+
+    def _write_lines(self, lines: List[str]):
+        """Append a batch (caller holds _io_lock)."""
+        data = ''.join(lines).encode('utf-8')
+        try:
+            self._maybe_rotate(len(data))
+            if self._file is None:
+                self._open()
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file_size += len(data)
+        except Exception as e:
+            print(f"CRITICAL: Failed to write usage log: {e}")
+            # Reopen on next batch (handle may be stale)
+            self._file = None
+
+    def _close_file(self):
+        with self._io_lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._file_size = os.fstat(self._file.fileno()).st_size
+        if self._file_size > 0:
+            self._segment_day = datetime.fromtimestamp(self.path.stat().st_mtime).date()
+        else:
+            self._segment_day = datetime.now().date()
+        if not self._recovered:
+            # Finish compressing segments left behind by a previous run
+            self._recovered = True
+            for seg in list_audit_segments(self.path):
+                if not seg.name.endswith('.gz'):
+                    self._spawn_compress(seg)
+
+    def _maybe_rotate(self, incoming_bytes):
+        if self._file is None:
+            if not self.path.exists():
+                return
+            self._open()
+        if self._file_size == 0:
+            return
+
+        too_big = self.max_bytes and self._file_size + incoming_bytes > self.max_bytes
+        new_day = self.rotate_daily and self._segment_day != datetime.now().date()
+        if too_big or new_day:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        target = self.path.with_name(f"{self.path.stem}.{stamp}{self.path.suffix}")
+        n = 1
+        while target.exists() or Path(f"{target}.gz").exists():
+            target = self.path.with_name(f"{self.path.stem}.{stamp}-{n}{self.path.suffix}")
+            n += 1
+        os.replace(self.path, target)
+        self._spawn_compress(target)
+
+    def _spawn_compress(self, segment: Path):
+        if segment in self._compressing:
+            return
+        self._compressing.add(segment)
+        threading.Thread(target=self._compress_segment, args=(segment,), daemon=True).start()
+
+    def _compress_segment(self, segment: Path):
+        """gzip a rotated segment, replacing it only once the .gz is complete."""
+        gz_path = Path(f"{segment}.gz")
+        tmp_path = Path(f"{gz_path}.tmp")
+        try:
+            with open(segment, 'rb') as f_in, gzip.open(tmp_path, 'wb', compresslevel=6) as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.replace(tmp_path, gz_path)
+            segment.unlink()
+        except FileNotFoundError:
+            pass  # Another writer already compressed it
+        except Exception as e:
+            print(f"[AuditLog] Failed to compress {segment.name}: {e}")
+        finally:
+            self._compressing.discard(segment)
+
+
+# Singleton instance
+audit_writer = AuditLogWriter()
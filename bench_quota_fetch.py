@@ -0,0 +1,124 @@
+"""
+Benchmark: Quota Fetch Latency
+Compares the legacy urllib path (new TCP+TLS handshake per request) against
+the pooled keep-alive client, using a local stand-in HTTPS language server.
+
+Usage: python bench_quota_fetch.py [requests]
+Requires the `openssl` CLI to generate a throwaway self-signed certificate.
+"""
+import json
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from antigravity_api import AntigravityAPI, ProcessInfo, USER_STATUS_PATH
+
+CSRF_TOKEN = "bench-csrf-token"
+
+SAMPLE_RESPONSE = json.dumps({
+    "userStatus": {
+        "planStatus": {"planInfo": {"monthlyPromptCredits": 1000}, "availablePromptCredits": 750},
+        "cascadeModelConfigData": {"clientModelConfigs": [
+            {"label": "Gemini 3 Pro (High)", "modelOrAlias": {"model": "gemini-3-pro"},
+             "quotaInfo": {"remainingFraction": 0.6, "resetTime": "2030-01-01T00:00:00Z"}}
+        ]}
+    }
+}).encode('utf-8')
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Allow keep-alive
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        ok = self.path == USER_STATUS_PATH and self.headers.get('X-Codeium-Csrf-Token') == CSRF_TOKEN
+        body = SAMPLE_RESPONSE if ok else b'{}'
+        self.send_response(200 if ok else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def make_self_signed_cert(directory: Path):
+    """Generate a throwaway localhost certificate with the openssl CLI."""
+    cert, key = directory / 'cert.pem', directory / 'key.pem'
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                    '-keyout', str(key), '-out', str(cert), '-days', '1',
+                    '-subj', '/CN=127.0.0.1'],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def start_stand_in_server(cert, key):
+    """Start a local HTTPS server on a free port; returns (server, port)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StandInHandler)
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+    server.socket = ctx.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+def legacy_fetch(port, ssl_context):
+    """The pre-pooling request path: a fresh urllib request per fetch."""
+    url = f"https://127.0.0.1:{port}{USER_STATUS_PATH}"
+    payload = {"metadata": {"ideName": "antigravity", "extensionName": "antigravity", "locale": "en"}}
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'), method='POST')
+    req.add_header('Content-Type', 'application/json')
+    req.add_header('X-Codeium-Csrf-Token', CSRF_TOKEN)
+    req.add_header('Connect-Protocol-Version', '1')
+    with urllib.request.urlopen(req, timeout=5, context=ssl_context) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def measure(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[int(len(samples) * 0.95) - 1],
+        'mean': statistics.fmean(samples)
+    }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = make_self_signed_cert(Path(tmp))
+        server, port = start_stand_in_server(cert, key)
+        try:
+            api = AntigravityAPI()
+            api.process_info = ProcessInfo(extension_port=0, connect_port=port, csrf_token=CSRF_TOKEN)
+            assert api.fetch_quota() is not None, "Stand-in server did not answer"
+            
+            legacy = measure(lambda: legacy_fetch(port, api._ssl_context), n)
+            pooled = measure(api.fetch_quota, n)
+        finally:
+            server.shutdown()
+    
+    print(f"Quota fetch latency over {n} requests (ms)")
+    print(f"{'path':<22}{'p50':>8}{'p95':>8}{'mean':>8}")
+    for name, stats in (("legacy urllib", legacy), ("pooled keep-alive", pooled)):
+        print(f"{name:<22}{stats['p50']:>8.2f}{stats['p95']:>8.2f}{stats['mean']:>8.2f}")
+    print(f"p50 speedup: {legacy['p50'] / pooled['p50']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
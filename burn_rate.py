@@ -0,0 +1,149 @@
+"""
+Burn Rate Estimator for Context Monitor
+Online (O(1) per sample) token burn-rate tracking used for time-to-handoff.
+
+Each session keeps a time-aware EWMA of tokens/second together with an
+exponentially weighted variance, so the estimate is updated once per history
+sample and then read by every view (gauge, ttf label, dashboard) for free.
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from config import BURN_RATE_HALF_LIFE, BURN_RATE_CONFIDENCE_Z
+
+
+@dataclass
+class HandoffEstimate:
+    """Time until a token threshold, with a confidence interval (seconds)."""
+    seconds: int
+    seconds_low: int
+    seconds_high: Optional[int]  # None = upper bound unbounded (rate may be ~0)
+    rate_per_second: float
+
+
+class BurnRateEstimator:
+    """EWMA of token burn rate for a single session."""
+
+    __slots__ = ('half_life', 'last_ts', 'last_tokens', 'rate', 'var',
+                 '_w', '_w2', 'samples')
+
+    def __init__(self, half_life=BURN_RATE_HALF_LIFE):
+        self.half_life = half_life
+        self.reset()
+
+    def reset(self):
+        """Forget everything (used when the session restarts)."""
+        self.last_ts = None
+        self.last_tokens = None
+        self.rate = 0.0
+        self.var = 0.0
+        self._w = 0.0   # Sum of EW weights (for Kish effective sample size)
+        self._w2 = 0.0
+        self.samples = 0
+
+    def update(self, ts, tokens):
+        """Feed one (timestamp, tokens) sample."""
+        if self.last_ts is None:
+            self.last_ts, self.last_tokens = ts, tokens
+            return
+
+        dt = ts - self.last_ts
+        if dt <= 0:
+            # Duplicate/out-of-order sample; keep the newest token reading
+            self.last_tokens = tokens
+            return
+
+        d_tokens = tokens - self.last_tokens
+        if d_tokens < 0:
+            # Token count dropped: new conversation or context compaction.
+            # The old slope says nothing about the new session.
+            self.reset()
+            self.last_ts, self.last_tokens = ts, tokens
+            return
+
+        sample_rate = d_tokens / dt
+        # Time-aware smoothing so irregular polling intervals weigh correctly
+        alpha = 1.0 - math.exp(-dt * math.log(2) / self.half_life)
+        if self.samples == 0:
+            self.rate = sample_rate
+            self.var = 0.0
+            self._w, self._w2 = 1.0, 1.0
+        else:
+            diff = sample_rate - self.rate
+            incr = alpha * diff
+            self.rate += incr
+            self.var = (1.0 - alpha) * (self.var + diff * incr)
+            self._w = (1.0 - alpha) * self._w + alpha
+            self._w2 = (1.0 - alpha) ** 2 * self._w2 + alpha ** 2
+
+        self.samples += 1
+        self.last_ts, self.last_tokens = ts, tokens
+
+    @property
+    def effective_samples(self):
+        """Kish effective sample size of the weighted window."""
+        return (self._w * self._w / self._w2) if self._w2 > 0 else 0.0
+
+    def rate_bounds(self, z=BURN_RATE_CONFIDENCE_Z):
+        """Return (low, high) confidence bounds for the mean burn rate."""
+        n_eff = self.effective_samples
+        if n_eff <= 1:
+            return 0.0, self.rate
+        stderr = math.sqrt(max(self.var, 0.0) / n_eff)
+        return max(0.0, self.rate - z * stderr), self.rate + z * stderr
+
+    def time_to(self, threshold_tokens, z=BURN_RATE_CONFIDENCE_Z) -> Optional[HandoffEstimate]:
+        """Estimate seconds until `threshold_tokens` is reached."""
+        if self.last_tokens is None or self.samples < 2:
+            return None
+
+        remaining = threshold_tokens - self.last_tokens
+        if remaining <= 0:
+            return HandoffEstimate(0, 0, 0, self.rate)
+        if self.rate <= 0:
+            return None
+
+        low_rate, high_rate = self.rate_bounds(z)
+        return HandoffEstimate(
+            seconds=int(remaining / self.rate),
+            seconds_low=int(remaining / high_rate),
+            seconds_high=int(remaining / low_rate) if low_rate > 0 else None,
+            rate_per_second=self.rate
+        )
+
+
+class BurnRateTracker:
+    """Per-session registry of burn-rate estimators."""
+
+    def __init__(self, half_life=BURN_RATE_HALF_LIFE):
+        self.half_life = half_life
+        self._estimators: Dict[str, BurnRateEstimator] = {}
+
+    def has_session(self, session_id):
+        return session_id in self._estimators
+
+    def update(self, session_id, ts, tokens):
+        """Record one history sample for a session."""
+        est = self._estimators.get(session_id)
+        if est is None:
+            est = self._estimators[session_id] = BurnRateEstimator(self.half_life)
+        est.update(ts, tokens)
+
+    def seed(self, session_id, points: Iterable[dict]):
+        """Warm a session from persisted history points ({'ts', 'tokens'})."""
+        est = BurnRateEstimator(self.half_life)
+        for p in points:
+            est.update(p['ts'], p['tokens'])
+        self._estimators[session_id] = est
+
+    def estimate(self, session_id, threshold_tokens) -> Optional[HandoffEstimate]:
+        est = self._estimators.get(session_id)
+        return est.time_to(threshold_tokens) if est else None
+
+    def forget(self, session_id):
+        self._estimators.pop(session_id, None)
+
+
+# Singleton instance
+burn_rate_tracker = BurnRateTracker()
@@ -0,0 +1,160 @@
+"""
+Bytes-per-Token Calibration
+Learns how many payload bytes make one token, per model, from the quota API.
+
+While the API is reachable, `load_session` reports (payload bytes, percent
+used) for the active session. Growth between two reports gives a pair
+(Δbytes, Δtokens = Δpercent × context window). Tokens per byte is fitted
+online with scalar recursive least squares (forgetting factor
+CALIBRATION_FORGETTING, so the fit follows model/tokenizer changes), and a
+pair whose innovation is more than CALIBRATION_OUTLIER_Z standard deviations
+off the prediction is rejected (session switches, quota resets, compaction).
+
+Once a model has CALIBRATION_MIN_SAMPLES accepted pairs, the offline path
+uses payload_bytes / bytes_per_token instead of the static estimators. The
+fit is persisted to CALIBRATION_FILE; no extra API calls are made.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import (CALIBRATION_FILE, CALIBRATION_FORGETTING, CALIBRATION_OUTLIER_Z, CALIBRATION_MIN_SAMPLES,
+                    CALIBRATION_MIN_DELTA_PERCENT, CALIBRATION_BPT_RANGE, CALIBRATION_SAVE_INTERVAL,
+                    TOKEN_ESTIMATION_BYTES)
+
+
+class ModelFit:
+    """Scalar RLS fit of tokens = theta * bytes."""
+
+    def __init__(self, theta=1.0 / TOKEN_ESTIMATION_BYTES, p=1.0, noise=None, samples=0, rejected=0):
+        self.theta = theta
+        self.p = p  # Parameter variance (scaled by the noise)
+        self.noise = noise  # Running measurement noise variance (tokens^2)
+        self.samples = samples
+        self.rejected = rejected
+
+    @property
+    def bytes_per_token(self) -> float:
+        return 1.0 / self.theta if self.theta > 0 else float(TOKEN_ESTIMATION_BYTES)
+
+    def update(self, d_bytes, d_tokens, forgetting=CALIBRATION_FORGETTING, z=CALIBRATION_OUTLIER_Z) -> bool:
+        """Add one (Δbytes, Δtokens) pair; returns False if it was rejected as an outlier."""
+        lo, hi = CALIBRATION_BPT_RANGE
+        if not lo <= d_bytes / d_tokens <= hi:
+            self.rejected += 1
+            return False
+        x, y = float(d_bytes), float(d_tokens)
+        error = y - self.theta * x
+        spread = 1 + x * self.p * x  # Innovation variance in units of the noise
+        if self.samples >= CALIBRATION_MIN_SAMPLES and self.noise:
+            if error * error > z * z * self.noise * spread:
+                self.rejected += 1
+                return False
+        gain = self.p * x / (forgetting + x * self.p * x)
+        self.theta += gain * error
+        self.p = (self.p - gain * x * self.p) / forgetting
+        scaled = error * error / spread
+        self.noise = scaled if self.noise is None else 0.9 * self.noise + 0.1 * scaled
+        self.samples += 1
+        return True
+
+    def to_dict(self):
+        return {'theta': self.theta, 'p': self.p, 'noise': self.noise,
+                'samples': self.samples, 'rejected': self.rejected}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{k: data[k] for k in ('theta', 'p', 'noise', 'samples', 'rejected') if k in data})
+
+
+class Calibrator:
+    """Per-model fits plus the last API observation each pair is measured from."""
+
+    def __init__(self, path=CALIBRATION_FILE, min_delta_percent=CALIBRATION_MIN_DELTA_PERCENT,
+                 save_interval=CALIBRATION_SAVE_INTERVAL):
+        self.path = Path(path)
+        self.min_delta_percent = min_delta_percent
+        self.save_interval = save_interval
+        self.fits: Dict[str, ModelFit] = {}
+        self._anchors = {}  # model -> (session_id, context_window, payload_bytes, percent_used)
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        self._load()
+
+    def observe(self, model, session_id, payload_bytes, percent_used, context_window) -> Optional[bool]:
+        """Record an API reading; returns True/False when a pair was accepted/rejected, None otherwise."""
+        if not model or not payload_bytes or not context_window:
+            return None
+        with self._lock:
+            anchor = self._anchors.get(model)
+            key = (session_id, context_window)
+            if anchor is None or anchor[0:2] != key:
+                self._anchors[model] = (session_id, context_window, payload_bytes, percent_used)
+                return None
+            d_bytes = payload_bytes - anchor[2]
+            d_percent = percent_used - anchor[3]
+            if d_bytes < 0 or d_percent < 0:
+                # Quota reset or a rewritten file: start a new pair from here
+                self._anchors[model] = (session_id, context_window, payload_bytes, percent_used)
+                return None
+            if d_percent < self.min_delta_percent or d_bytes == 0:
+                return None  # Keep accumulating; small deltas are dominated by rounding
+            self._anchors[model] = (session_id, context_window, payload_bytes, percent_used)
+            fit = self.fits.setdefault(model, ModelFit())
+            accepted = fit.update(d_bytes, d_percent / 100 * context_window)
+            if accepted and fit.samples == CALIBRATION_MIN_SAMPLES:
+                print(f"[Calibration] {model}: {fit.bytes_per_token:.2f} bytes/token")
+            self._dirty = True
+        self._maybe_save()
+        return accepted
+
+    def bytes_per_token(self, model) -> Optional[float]:
+        """Fitted bytes per token, or None until the model has enough samples."""
+        fit = self.fits.get(model)
+        if fit and fit.samples >= CALIBRATION_MIN_SAMPLES:
+            return fit.bytes_per_token
+        return None
+
+    def estimate_tokens(self, model, payload_bytes) -> Optional[int]:
+        bpt = self.bytes_per_token(model)
+        return int(payload_bytes / bpt) if bpt and payload_bytes else None
+
+    # --- Persistence ---
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.fits = {model: ModelFit.from_dict(fit) for model, fit in data.get('models', {}).items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[Calibration] Could not load {self.path}: {e}")
+
+    def _maybe_save(self):
+        now = time.time()
+        if now - self._last_save >= self.save_interval:
+            self.flush()
+            self._last_save = now
+
+    def flush(self):
+        """Write the fits to disk if they changed (also called at exit)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'models': {model: fit.to_dict() for model, fit in self.fits.items()}}
+            self._dirty = False
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            tmp_file.replace(self.path)
+        except Exception as e:
+            print(f"[Calibration] Could not save {self.path}: {e}")
+
+
+calibrator = Calibrator()
@@ -0,0 +1,551 @@
+"""
+Chunk Store
+Content-defined, deduplicated archive storage for conversation files.
+
+Sessions are split into variable-size chunks with a gear rolling hash
+(FastCDC-style normalized chunking), so identical regions shared between
+sessions - system prompts, repeated file contents - produce identical chunks
+even when their offsets differ. Each unique chunk is stored once, compressed,
+in append-only pack files under `.chunks/` next to the conversations; an
+archived session is just a small JSON manifest (`<sid>.pb.dedup`) listing its
+chunks for streaming restore. Chunks no manifest references are removed by
+`collect_garbage`, which rewrites the packs that hold them.
+
+Cost: the boundary scan runs at about 40-50 MB/s; with SHA-256 and zlib a
+writer sustains roughly 15-20 MB/s per worker, so the default pool already
+saturates the archiver's 20 MB/s rate limit. Each writer appends to its own
+pack (up to CHUNK_PACK_MAX_SIZE), so the store grows by two files (pack +
+index) per archived session rather than one file per ~8 KiB chunk.
+"""
+import hashlib
+import io
+import json
+import os
+import struct
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from config import (CHUNK_STORE_DIRNAME, CHUNK_MIN_SIZE, CHUNK_AVG_SIZE, CHUNK_MAX_SIZE,
+                    CHUNK_PACK_MAX_SIZE, CHUNK_GC_GRACE)
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.pb.dedup'
+
+# Gear table: 256 pseudo-random 64-bit values (deterministic so chunking is stable)
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'little') for i in range(256)]
+_MASK64 = (1 << 64) - 1
+# Low 16 bits of each gear value, as translate() tables for the block scan
+_GEAR_LO = bytes(g & 0xFF for g in _GEAR)
+_GEAR_HI = bytes((g >> 8) & 0xFF for g in _GEAR)
+_SCAN_BLOCK = 2048  # positions tested per block (most cuts land in the first few)
+
+
+def _masks(avg_size):
+    """Normalized chunking: stricter mask before avg, looser after."""
+    bits = max(1, avg_size.bit_length() - 1)
+    return (1 << (bits + 1)) - 1, (1 << (bits - 1)) - 1
+
+
+@lru_cache(maxsize=64)
+def _lanes(value, count):
+    """`value` repeated in `count` 32-bit lanes of one integer."""
+    return int.from_bytes(value.to_bytes(4, 'little') * count, 'little')
+
+
+def _first_zero(data, lo, hi, mask, origin):
+    """First i in [lo, hi) where the gear hash (started at `origin`) has no `mask` bits set, else -1.
+
+    The masked bits only depend on the last 16 bytes, so every position is
+    hashed at once: one 32-bit lane per byte in a big integer, summed over
+    16 shifted copies (lane i gets gear[data[i-k]] << k) in four doublings.
+    """
+    ctx = max(origin, lo - 15)
+    seg = bytes(data[ctx:hi])
+    count = len(seg)
+    buf = bytearray(4 * count)
+    buf[0::4] = seg.translate(_GEAR_LO)
+    buf[1::4] = seg.translate(_GEAR_HI)
+    h = int.from_bytes(buf, 'little')
+    h += h << 33
+    h += h << 66
+    h += h << 132
+    h += h << 264
+    # A lane is zero under the mask iff adding the mask doesn't carry into the next bit
+    top = _lanes(mask + 1, count)
+    zero = (((h & _lanes(mask, count)) + _lanes(mask, count)) & top ^ top) >> (32 * (lo - ctx))
+    if not zero:
+        return -1
+    return lo + ((zero & -zero).bit_length() - 1) // 32
+
+
+def _find_cut_bytewise(data, n, min_size, barrier, mask_s, mask_l):
+    """Reference scan, one byte at a time (used when the masks exceed 16 bits)."""
+    gear = _GEAR
+    h = 0
+    i = min_size
+    while i < barrier:
+        h = ((h << 1) + gear[data[i]]) & _MASK64
+        if not h & mask_s:
+            return i + 1
+        i += 1
+    while i < n:
+        h = ((h << 1) + gear[data[i]]) & _MASK64
+        if not h & mask_l:
+            return i + 1
+        i += 1
+    return n
+
+
+def find_cut(data, min_size=CHUNK_MIN_SIZE, avg_size=CHUNK_AVG_SIZE, max_size=CHUNK_MAX_SIZE):
+    """Length of the first chunk in `data` (decided from at most max_size bytes)."""
+    n = len(data)
+    if n <= min_size:
+        return n
+    n = min(n, max_size)
+    mask_s, mask_l = _masks(avg_size)
+    barrier = min(avg_size, n)
+    if mask_s.bit_length() > 16:
+        return _find_cut_bytewise(data, n, min_size, barrier, mask_s, mask_l)
+    lo = min_size  # Cut-point skipping: nothing below min_size can be a boundary
+    while lo < n:
+        mask, end = (mask_s, barrier) if lo < barrier else (mask_l, n)
+        hi = min(lo + _SCAN_BLOCK, end)
+        i = _first_zero(data, lo, hi, mask, min_size)
+        if i >= 0:
+            return i + 1
+        lo = hi
+    return n
+
+
+class Chunker:
+    """Incremental content-defined chunker: feed bytes, get complete chunks."""
+
+    def __init__(self, min_size=CHUNK_MIN_SIZE, avg_size=CHUNK_AVG_SIZE, max_size=CHUNK_MAX_SIZE):
+        self.min_size, self.avg_size, self.max_size = min_size, avg_size, max_size
+        self._buf = bytearray()
+
+    def feed(self, data) -> List[bytes]:
+        self._buf += data
+        return self._drain(final=False)
+
+    def finish(self) -> List[bytes]:
+        return self._drain(final=True)
+
+    def _drain(self, final):
+        chunks = []
+        buf, pos = self._buf, 0
+        # A cut only depends on the next max_size bytes, so wait for that many
+        while len(buf) - pos >= self.max_size or (final and pos < len(buf)):
+            view = memoryview(buf)[pos:pos + self.max_size]
+            cut = find_cut(view, self.min_size, self.avg_size, self.max_size)
+            chunks.append(bytes(view[:cut]))
+            view.release()
+            pos += cut
+        del buf[:pos]
+        return chunks
+
+
+def iter_chunks(f, read_size=1024 * 1024, **sizes) -> Iterable[bytes]:
+    """Stream content-defined chunks from a binary file object."""
+    chunker = Chunker(**sizes)
+    while True:
+        data = f.read(read_size)
+        if not data:
+            break
+        yield from chunker.feed(data)
+    yield from chunker.finish()
+
+
+# ==== PACKED STORE ====
+
+_IDX_ENTRY = struct.Struct('>32sQI')  # sha256 digest, offset in pack, compressed length
+
+
+def _read_idx(path):
+    with open(path, 'rb') as f:
+        return list(_IDX_ENTRY.iter_unpack(f.read()))
+
+
+class ChunkStore:
+    """Compressed, content-addressed chunks appended to pack files under one directory.
+
+    Each store appends to its own `pack-<stamp>-<pid>.pack` and seals it by
+    writing the matching `.idx` (digest, offset, length per chunk) on close()
+    or once the pack reaches CHUNK_PACK_MAX_SIZE; other stores only see sealed
+    packs, so writers running side by side may store the same chunk twice
+    until `compact` drops the extra copy. Chunks written one file each
+    (`<id[:2]>/<id>`) by older versions are still read and collected.
+    """
+
+    def __init__(self, root, level=6, pack_max_size=CHUNK_PACK_MAX_SIZE):
+        self.root = Path(root)
+        self.level = level
+        self.pack_max_size = pack_max_size
+        self._index = None   # digest -> (pack name, offset, length)
+        self._sealed = set()  # pack names loaded into _index
+        self._touched = set()
+        self._pack = None    # (name, file) being appended to
+        self._entries = []   # index entries of that pack
+        self._readers = {}   # pack name -> open file
+        self._has_loose = False
+
+    # -- index --
+
+    def _refresh(self):
+        """Load packs sealed since the last look; forget packs GC removed."""
+        names = {p.stem for p in self.root.glob('*.idx')} if self.root.exists() else set()
+        if self._index is None or self._sealed - names:
+            own = [(d, e) for d, e in (self._index or {}).items() if e[0] not in self._sealed]
+            self._index, self._sealed = dict(own), set()
+            self._has_loose = self.root.exists() and any(p.is_dir() for p in self.root.iterdir())
+        for name in sorted(names - self._sealed):
+            try:
+                entries = _read_idx(self.root / f"{name}.idx")
+            except OSError:
+                continue  # Removed by a concurrent GC
+            for digest, offset, length in entries:
+                self._index[digest] = (name, offset, length)
+            self._sealed.add(name)
+
+    def _lookup(self, digest, refresh=False):
+        if self._index is None or refresh:
+            self._refresh()
+        return self._index.get(digest)
+
+    # -- writing --
+
+    def put(self, data: bytes) -> str:
+        """Store a chunk once; returns its id (sha256 hex)."""
+        digest = hashlib.sha256(data).digest()
+        for refresh in (False, True):
+            entry = self._lookup(digest, refresh)
+            if entry is None:
+                break
+            if self._touch(entry[0]):
+                return digest.hex()
+            # Pack rewritten by GC since we loaded the index; look again
+        if self._has_loose:
+            try:
+                os.utime(self._loose_path(digest.hex()))
+                return digest.hex()
+            except OSError:
+                pass  # Not stored loose (or swept meanwhile)
+        self._append(digest, zlib.compress(data, self.level))
+        return digest.hex()
+
+    def _touch(self, name):
+        """Refresh a pack's index mtime so a concurrent GC's grace period protects it."""
+        if (self._pack and name == self._pack[0]) or name in self._touched:
+            return True
+        try:
+            os.utime(self.root / f"{name}.idx")
+        except OSError:
+            return False
+        self._touched.add(name)
+        return True
+
+    def _append(self, digest, blob):
+        if self._pack is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            name = f"pack-{time.time_ns():016x}-{os.getpid()}"
+            self._pack = (name, open(self.root / f"{name}.pack", 'xb'))
+        name, f = self._pack
+        offset = f.tell()
+        f.write(blob)
+        self._entries.append((digest, offset, len(blob)))
+        self._index[digest] = (name, offset, len(blob))
+        if offset + len(blob) >= self.pack_max_size:
+            self.seal()
+
+    def seal(self):
+        """Finish the current pack: write its index so other stores can use it."""
+        if self._pack is None:
+            return
+        name, f = self._pack
+        f.close()
+        self._pack = None
+        reader = self._readers.pop(name, None)
+        if reader:
+            reader.close()
+        tmp = self.root / f"{name}.idx.tmp"
+        with open(tmp, 'wb') as out:
+            out.write(b''.join(_IDX_ENTRY.pack(*e) for e in self._entries))
+        os.replace(tmp, self.root / f"{name}.idx")
+        self._entries = []
+        self._sealed.add(name)
+        self._touched.add(name)
+
+    def close(self):
+        self.seal()
+        for f in self._readers.values():
+            f.close()
+        self._readers.clear()
+
+    # -- reading --
+
+    def get(self, chunk_id: str) -> bytes:
+        digest = bytes.fromhex(chunk_id)
+        entry = self._lookup(digest)
+        if entry is None:
+            entry = self._lookup(digest, refresh=True)
+        if entry is None:
+            with open(self._loose_path(chunk_id), 'rb') as f:
+                blob = f.read()
+        else:
+            try:
+                blob = self._read(*entry)
+            except FileNotFoundError:
+                # Moved to a new pack by GC; reload the index and retry
+                entry = self._lookup(digest, refresh=True)
+                if entry is None:
+                    raise
+                blob = self._read(*entry)
+        try:
+            data = zlib.decompress(blob)
+        except zlib.error:
+            data = None
+        if data is None or hashlib.sha256(data).digest() != digest:
+            raise ValueError(f"chunk {chunk_id[:12]} is corrupt")
+        return data
+
+    def _read(self, name, offset, length):
+        if self._pack and name == self._pack[0]:
+            self._pack[1].flush()
+        f = self._readers.get(name)
+        if f is None:
+            f = self._readers[name] = open(self.root / f"{name}.pack", 'rb')
+        f.seek(offset)
+        return f.read(length)
+
+    # -- maintenance --
+
+    def _loose_path(self, chunk_id: str) -> Path:
+        return self.root / chunk_id[:2] / chunk_id
+
+    def iter_loose(self):
+        """(id, path) of chunks stored one file each by older versions."""
+        if not self.root.exists():
+            return
+        for sub in self.root.iterdir():
+            if sub.is_dir():
+                for path in sub.iterdir():
+                    if not path.name.endswith('.tmp'):
+                        yield path.name, path
+
+    def iter_packs(self):
+        """(name, .idx path, .pack path) of sealed packs, oldest first."""
+        if not self.root.exists():
+            return
+        for idx in sorted(self.root.glob('*.idx')):
+            yield idx.stem, idx, idx.with_suffix('.pack')
+
+    def stats(self):
+        self._refresh()
+        count, size = len(self._index), 0
+        if self.root.exists():
+            for path in self.root.glob('*.pack'):
+                size += path.stat().st_size
+        for _, path in self.iter_loose():
+            count += 1
+            size += path.stat().st_size
+        return {'chunks': count, 'stored_bytes': size}
+
+    def compact(self, live, cutoff, dry_run=False):
+        """Rewrite packs not touched since `cutoff` without chunks outside `live`.
+
+        Surviving chunks are copied into a fresh pack (merging small packs as
+        they go), which is sealed before the old packs are removed, so a
+        chunk is always reachable. Duplicates stored by concurrent writers
+        are dropped too. Returns (chunks removed, bytes freed).
+        """
+        self._refresh()
+        removed = freed = 0
+        kept, retired = set(), []
+        for name, idx, pack in list(self.iter_packs()):
+            try:
+                mtime = idx.stat().st_mtime
+                entries = _read_idx(idx)
+            except OSError:
+                continue
+            if mtime > cutoff:
+                kept.update(e[0] for e in entries)
+                continue
+            keep = [e for e in entries if e[0].hex() in live and e[0] not in kept]
+            kept.update(e[0] for e in keep)
+            if len(keep) == len(entries):
+                continue
+            removed += len(entries) - len(keep)
+            freed += sum(e[2] for e in entries) - sum(e[2] for e in keep)
+            if dry_run:
+                continue
+            with open(pack, 'rb') as f:
+                for digest, offset, length in keep:
+                    f.seek(offset)
+                    self._append(digest, f.read(length))
+            retired.append((idx, pack, mtime))
+        if self._pack is not None:
+            self.seal()
+
+        for idx, pack, mtime in retired:
+            try:
+                if idx.stat().st_mtime != mtime:
+                    continue  # A writer just reused it; the copies are collected next time
+                idx.unlink()
+                pack.unlink()
+            except OSError:
+                continue
+
+        # Packs never sealed: their writer crashed (or was cancelled)
+        if self.root.exists():
+            for pack in self.root.glob('*.pack'):
+                try:
+                    stat = pack.stat()
+                    if pack.with_suffix('.idx').exists() or stat.st_mtime > cutoff:
+                        continue
+                    if not dry_run:
+                        pack.unlink()
+                    freed += stat.st_size
+                except OSError:
+                    continue
+        return removed, freed
+
+
+def store_for(manifest_path) -> ChunkStore:
+    """The chunk store that serves manifests in a given directory."""
+    return ChunkStore(Path(manifest_path).parent / CHUNK_STORE_DIRNAME)
+
+
+# ==== STREAMING WRITER / READER (used via archiver.open_codec) ====
+
+class DedupWriter(io.RawIOBase):
+    """File-like sink: chunks and stores data, writes the manifest on close."""
+
+    def __init__(self, manifest_path, level=6):
+        self.manifest_path = Path(manifest_path)
+        self.store = store_for(manifest_path)
+        self.store.level = level or 6
+        self._chunker = Chunker()
+        self._chunks = []
+        self._sha = hashlib.sha256()
+        self._size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._sha.update(data)
+        self._size += len(data)
+        for chunk in self._chunker.feed(data):
+            self._chunks.append([self.store.put(chunk), len(chunk)])
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        for chunk in self._chunker.finish():
+            self._chunks.append([self.store.put(chunk), len(chunk)])
+        self.store.close()  # Seal the pack before the manifest points into it
+        manifest = {'version': MANIFEST_VERSION, 'size': self._size,
+                    'sha256': self._sha.hexdigest(), 'chunks': self._chunks}
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f, separators=(',', ':'))
+        super().close()
+
+
+class DedupReader(io.RawIOBase):
+    """Streams a session back from its manifest, one chunk in memory at a time."""
+
+    def __init__(self, manifest_path):
+        with open(manifest_path, 'r') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"unsupported manifest version {self.manifest.get('version')}")
+        self.store = store_for(manifest_path)
+        self._next = 0
+        self._current = b''
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.store.close()
+        super().close()
+
+    def readinto(self, b):
+        while self._pos >= len(self._current):
+            if self._next >= len(self.manifest['chunks']):
+                return 0
+            chunk_id, _ = self.manifest['chunks'][self._next]
+            self._current, self._pos = self.store.get(chunk_id), 0
+            self._next += 1
+        n = min(len(b), len(self._current) - self._pos)
+        b[:n] = self._current[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+
+def open_dedup(path, mode='rb', level=None):
+    if 'w' in mode:
+        return DedupWriter(path, level)
+    return io.BufferedReader(DedupReader(path))
+
+
+# ==== GARBAGE COLLECTION ====
+
+def collect_garbage(directory, grace=CHUNK_GC_GRACE, dry_run=False):
+    """Mark-and-sweep: drop chunks no manifest in `directory` references.
+
+    Packs touched within `grace` seconds are kept whole, so an archive that is
+    still being written (chunks stored, manifest not yet renamed into place)
+    is safe. Older packs holding dead chunks are rewritten without them.
+    """
+    directory = Path(directory)
+    store = ChunkStore(directory / CHUNK_STORE_DIRNAME)
+
+    # Mark (in-progress .tmp manifests count too)
+    live = set()
+    for manifest in list(directory.glob(f'*{MANIFEST_SUFFIX}')) + list(directory.glob(f'*{MANIFEST_SUFFIX}.tmp')):
+        try:
+            with open(manifest, 'r') as f:
+                live.update(c[0] for c in json.load(f)['chunks'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[ChunkStore] Skipping GC: unreadable manifest {manifest.name} ({e})")
+            return {'removed': 0, 'freed_bytes': 0, 'live': None}
+
+    # Sweep
+    cutoff = time.time() - grace
+    removed, freed = store.compact(live, cutoff, dry_run)
+    for chunk_id, path in list(store.iter_loose()):
+        if chunk_id in live:
+            continue
+        try:
+            stat = path.stat()
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                path.unlink()
+            removed += 1
+            freed += stat.st_size
+        except OSError:
+            continue
+    return {'removed': removed, 'freed_bytes': freed, 'live': len(live)}
+
+
+def dedup_stats(directory) -> Optional[dict]:
+    """Logical (restored) vs stored bytes for archived sessions in `directory`."""
+    directory = Path(directory)
+    logical = sessions = 0
+    for manifest in directory.glob(f'*{MANIFEST_SUFFIX}'):
+        try:
+            with open(manifest, 'r') as f:
+                logical += json.load(f)['size']
+            sessions += 1
+        except (OSError, ValueError, KeyError):
+            continue
+    stats = ChunkStore(directory / CHUNK_STORE_DIRNAME).stats()
+    stats.update({'sessions': sessions, 'logical_bytes': logical})
+    return stats
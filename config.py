@@ -2,6 +2,7 @@
 Configuration for Context Monitor
 All hardcoded values, colors, model definitions, and default settings.
 """
+import os
 from pathlib import Path
 
 # === PATHS ===
@@ -14,6 +15,7 @@ GITHUB_DIR = Path.home() / 'Documents' / 'GitHub'
 SETTINGS_FILE = SCRATCH_DIR / 'settings.json'
 HISTORY_FILE = SCRATCH_DIR / 'history.json'
 ANALYTICS_FILE = SCRATCH_DIR / 'analytics.json'
+LS_DISCOVERY_FILE = SCRATCH_DIR / 'ls_discovery.json'
 
 # === THEME COLORS (GitHub Dark) ===
 COLORS = {
@@ -72,11 +74,67 @@ DEFAULT_SETTINGS = {
 # === UI CONSTANTS ===
 MIN_WINDOW_WIDTH = 400
 MIN_WINDOW_HEIGHT = 200
-HISTORY_CACHE_TTL = 5  # seconds
+HISTORY_CACHE_TTL = 5  # seconds - how often the history file is checked for outside changes
+DERIVED_CACHE_MAX = 256  # memoized views over history/analytics (summaries, estimates, graphs)
 ANALYTICS_SAVE_THROTTLE = 60  # seconds (increased from 30 for less disk I/O)
 VSCODE_CACHE_TTL = 10  # seconds - cache VS Code detection result
+PROJECT_SCAN_TTL = 60  # seconds - backstop for the GitHub-dir scan (its mtime misses edits inside projects)
+WORKSPACE_INDEX_TTL = 300  # seconds - how often workspace roots may be rediscovered
+WORKSPACE_MIN_HITS = 2  # path mentions needed before content attribution is trusted
+WORKSPACE_SCAN_BLOCK = 4 * 1024 * 1024  # bytes per read when scanning a conversation
+WORKSPACE_BRAIN_FILES = 200  # newest brain files mined for workspace paths
 MAX_HISTORY_POINTS = 200
 TOKEN_ESTIMATION_BYTES = 4
+TOKEN_MIN_TEXT_RUN = 6  # bytes - shorter printable runs in a .pb are protobuf framing, not text
+TOKEN_SCAN_BLOCK = 4 * 1024 * 1024  # bytes per read when extracting text payloads
+TOKEN_BPE_VOCAB_FILE = SCRATCH_DIR / 'bpe_vocab.tiktoken'  # optional: "<base64 token> <rank>" per line
+TOKEN_BPE_SAMPLE = 512 * 1024  # payload bytes BPE-encoded per scan; the rest is extrapolated
+TOKEN_ESTIMATOR_BY_MODEL = {'Gemini': 'charclass', 'Claude': 'charclass', 'GPT': 'bpe'}  # name prefix -> estimator
+TOKEN_INPUT_SHARE = 0.4  # heuristic input/output split for the breakdown views
+CALIBRATION_FILE = SCRATCH_DIR / 'calibration.json'  # fitted bytes-per-token per model
+CALIBRATION_FORGETTING = 0.98  # RLS forgetting factor (~50 pairs of memory)
+CALIBRATION_OUTLIER_Z = 3.0  # reject pairs this many std devs off the fit
+CALIBRATION_MIN_SAMPLES = 5  # accepted pairs before the fit replaces the estimators
+CALIBRATION_MIN_DELTA_PERCENT = 3.0  # API percentage growth per pair (whole-percent rounding biases smaller deltas)
+CALIBRATION_BPT_RANGE = (1.0, 16.0)  # plausible payload bytes per token
+CALIBRATION_SAVE_INTERVAL = 60  # seconds between calibration file writes
+MULTI_SESSION_WINDOW = 900  # seconds - sessions written to this recently are all tracked (0 = current only)
+MULTI_SESSION_MAX = 6  # sessions sampled per pass, including the current one
+SESSION_TITLES_FILE = SCRATCH_DIR / 'session_titles.json'  # first user message per session (picker search)
+SESSION_TITLE_SCAN_BYTES = 64 * 1024  # head of a conversation searched for its first message
+SESSION_TITLE_MAX_CHARS = 120
+METADATA_CACHE_MAX = 2000  # sessions with cached metadata / project attribution (LRU)
+SESSION_SCAN_TOP_K = 50  # most recent sessions returned by each poll (and re-stat'ed when the dir is unchanged)
+SESSION_FULL_SCAN_INTERVAL = 30  # seconds - full listing backstop for writes to older sessions
+BURN_RATE_HALF_LIFE = 300  # seconds - EWMA half-life for time-to-handoff
+BURN_RATE_CONFIDENCE_Z = 1.96  # ~95% interval on the burn rate
+DISCOVERY_BACKOFF_MIN = 5  # seconds - language server rediscovery backoff
+DISCOVERY_BACKOFF_MAX = 300
+MEMORY_TREND_SAMPLES = 360  # per-process ring buffer (1h at the default 10s poll)
+MEMORY_TREND_MIN_SAMPLES = 12  # don't trust a slope fitted on fewer points
+MEMORY_TREND_MIN_SPAN = 120  # seconds of history before trend alerts
+MEMORY_LEAK_HORIZON = 1800  # seconds - alert when proc_crit/total_crit is projected sooner
+MEMORY_ALERT_COOLDOWN = 600  # seconds between repeated leak alerts
+
+# === ARCHIVING ===
+ARCHIVE_MIN_AGE_DAYS = 3
+ARCHIVE_MIN_SIZE = 100_000  # bytes - smaller sessions aren't worth compressing
+ARCHIVE_CHUNK_SIZE = 1024 * 1024  # bytes streamed per read (bounds worker memory)
+ARCHIVE_RATE_LIMIT_MB = 20  # MB/s across all workers (0 = unlimited) - leave I/O for the IDE
+ARCHIVE_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+ARCHIVE_DEFAULT_CODEC = 'gzip'
+CHUNK_STORE_DIRNAME = '.chunks'  # dedup chunk packs, next to the conversations
+CHUNK_MIN_SIZE = 2 * 1024  # content-defined chunk bounds (bytes)
+CHUNK_AVG_SIZE = 8 * 1024
+CHUNK_MAX_SIZE = 64 * 1024
+CHUNK_PACK_MAX_SIZE = 64 * 1024 * 1024  # bytes - a writer starts a new pack file past this
+CHUNK_GC_GRACE = 3600  # seconds - unreferenced chunks younger than this survive GC
+
+# === RETENTION (background policy engine) ===
+RETENTION_INTERVAL = 600  # seconds between background policy passes
+RETENTION_IO_BUDGET_MB = 200  # MB of sessions archived/deleted per pass at most
+RETENTION_RATE_LIMIT_MB = 5  # MB/s compression rate for background archiving
+RETENTION_MIN_IDLE_HOURS = 24  # never delete a session touched more recently than this
 DEFAULT_CONTEXT_WINDOW = 1_000_000
 
 # === FONT DEFINITIONS ===
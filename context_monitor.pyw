@@ -17,11 +17,22 @@ import time
 
 from utils import get_total_memory, calculate_thresholds, extract_pb_tokens, get_antigravity_processes
 from widgets import ToolTip
-from config import COLORS, MODELS, DEFAULT_SETTINGS, SETTINGS_FILE, HISTORY_FILE, ANALYTICS_FILE, CONVERSATIONS_DIR, GITHUB_DIR, VSCODE_CACHE_TTL
+from config import COLORS, MODELS, DEFAULT_SETTINGS, SETTINGS_FILE, HISTORY_FILE, ANALYTICS_FILE, CONVERSATIONS_DIR, GITHUB_DIR, VSCODE_CACHE_TTL, MEMORY_ALERT_COOLDOWN, MULTI_SESSION_WINDOW
 from data_service import data_service
+from burn_rate import burn_rate_tracker
+from memory_trend import memory_trend
+from retention import RetentionEngine, RetentionPolicy
 from dialogs import show_history_dialog, show_diagnostics_dialog, show_advanced_stats_dialog
 from menu_builder import build_context_menu
 from quota_manager import quota_manager
+from project_resolver import project_resolver
+from workspace_index import workspace_index
+from calibration import calibrator
+from session_tracker import SessionTracker
+from session_scanner import SessionScanner
+from snapshot_bus import SnapshotBus, Snapshot
+from metadata_cache import MetadataCache, SessionMeta
+from token_estimator import token_engine
 
 # Windows toast notifications
 try:
@@ -74,9 +85,11 @@ class ContextMonitor:
         self.tray_icon = None
         self.tray_thread = None
         
-        # Project name cache
-        self.project_name_cache = {}
-        self.project_name_timestamp = {}
+        # Project name cache (owned by the resolver; shared with menus/exports)
+        self.project_resolver = project_resolver
+        self.project_name_cache = project_resolver.names
+        self.project_name_timestamp = project_resolver.timestamps
+        workspace_index.set_extra_roots(self.settings.get('workspace_roots', []))
         
         # Tab caching (Sprint 1: Performance)
         self.tab_frames = {}
@@ -86,15 +99,23 @@ class ContextMonitor:
         
         # Polling settings (in milliseconds)
         self.polling_interval = self.settings.get('polling_interval', 10000)  # Default 10s
-        self.last_tokens = 0  # For delta tracking
         
-        # Performance/Lag Caching (Sprint 3)
-        self.session_metadata_cache = {} # Key: session_id, Value: {mtime, size, token_data, project_name}
-        self.conversations_mtime = 0
+        # Per-session delta tracking for every session active within the window
+        self.session_tracker = SessionTracker(self.settings.get('multi_session_window', MULTI_SESSION_WINDOW))
+        
+        # Refresh pass -> visible views; derived values are computed lazily per snapshot
+        self.snapshot_bus = SnapshotBus()
+        self.snapshot_bus.register_metric('handoff', lambda snap: self.estimate_time_to_handoff())
+        self.snapshot_bus.register_metric('recent_deltas', self.recent_deltas)
+        self.snapshot_bus.register_metric('processes', lambda snap: self.current_processes())
+        self.snapshot_bus.register_metric('analytics', lambda snap: self.load_analytics())
+        self.snapshot_bus.register_metric('weekly', lambda snap: self.get_weekly_summary())
+        self.snapshot_bus.register_metric('projects', lambda snap: self.get_project_summary())
+        self.processes = None  # Rows of this pass's process sample (CPU% needs one baseline per pass)
+        self._graph_drawn = None  # (canvas, session, history version, window) of the last mini graph
         
-        # VS Code detection cache (reduce ctypes calls)
-        self._vscode_project_cache = None
-        self._vscode_cache_time = 0
+        # Performance/Lag Caching (Sprint 3)
+        self.session_metadata_cache = MetadataCache()  # Bounded LRU of SessionMeta, pruned by the scanner
         
         # Threading for background updates
         self._update_lock = threading.Lock()
@@ -102,6 +123,7 @@ class ContextMonitor:
         
         # Paths (from config)
         self.conversations_dir = CONVERSATIONS_DIR
+        self.session_scanner = SessionScanner(self.conversations_dir)  # Top-k, dir-mtime short-circuit
         self.github_path = GITHUB_DIR
         self.history_file = HISTORY_FILE
         self.analytics_file = ANALYTICS_FILE
@@ -166,6 +188,10 @@ class ContextMonitor:
         # Quota Manager
         self.quota_manager = quota_manager
         
+        # Background retention policy (idle unless enabled in settings)
+        self.retention_engine = RetentionEngine(self.all_sessions, self.active_session_ids,
+                                                self.retention_policy, self.session_project).start()
+        
         self.setup_ui()
         self.load_session()
         self.root.after(self.polling_interval, self.auto_refresh)
@@ -276,7 +302,7 @@ class ContextMonitor:
             
             # Show latest delta in middle
             if hasattr(self, 'current_session') and self.current_session:
-                history_data = self.load_history().get(self.current_session['id'], [])
+                history_data = self.load_history().get(self.current_session.id, [])
                 recent_deltas = [h for h in history_data if h.get('delta', 0) != 0]
                 if recent_deltas:
                     last_delta = recent_deltas[-1].get('delta', 0)
@@ -325,102 +351,65 @@ class ContextMonitor:
                                           font=('Segoe UI', pct_font_size, 'bold'), fill=self.colors['text'], tags='text')
         
     def get_sessions(self):
-        sessions = []
+        """Most recent sessions, newest first (incremental scan, see session_scanner)"""
         try:
-            if not self.conversations_dir.exists():
-                return []
-                
-            # FAST SCAN: Use os.scandir for raw speed
-            # Cache optimization removed to fix "100% Usage" bug on new sessions
-            pass
-
-
-            # FAST SCAN: Use os.scandir for raw speed
-            with os.scandir(self.conversations_dir) as entries:
-                for entry in entries:
-                    name = entry.name
-                    if not entry.is_file() or not (name.endswith('.pb') or name.endswith('.pb.gz')):
-                        continue
-                    if '.tmp' in name: continue
-                    
-                    try:
-                        stat = entry.stat()
-                        sid = name[:-3] if name.endswith('.pb') else name[:-6]
-                        
-                        # LAZY LOADING: Use cached metadata if file hasn't changed
-                        cached = self.session_metadata_cache.get(sid)
-                        if cached and cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:
-                            token_data = cached['token_data']
-                            project_name = cached['project_name']
-                        else:
-                            # Placeholder - will be deep-scanned on demand or in background
-                            token_data = None
-                            project_name = None
-
-                        sessions.append({
-                            'id': sid,
-                            'size': stat.st_size,
-                            'modified': stat.st_mtime,
-                            'estimated_tokens': stat.st_size // 4,
-                            'token_data': token_data,
-                            'project_name': project_name,
-                            'compressed': name.endswith('.pb.gz'),
-                            'pb_path': Path(entry.path)
-                        })
-                    except: continue
-                            
-            sessions.sort(key=lambda x: x['modified'], reverse=True)
-            self.sessions_cache = sessions
+            sessions = self.session_scanner.scan(pinned=(self.selected_session_id,))
         except Exception as e:
             print(f"Error scanning sessions: {e}")
+            return []
+        self.sessions_cache = sessions
+        self.handle_scan_changes(self.session_scanner.removed, self.session_scanner.moved)
         return sessions
 
+    def all_sessions(self):
+        """Every session, newest first (picker, retention)"""
+        return self.session_scanner.sessions()
+
     def resolve_session_metadata(self, session, force=False):
         """Deep scan a session for tokens and project name with caching (Heavy I/O)"""
         if not session: return None, None
         
-        sid = session['id']
-        pb_path = session['pb_path']
-        mtime = session['modified']
-        size = session['size']
+        sid = session.id
+        pb_path = session.pb_path
+        mtime = session.modified
+        size = session.size
         
         # Check cache
-        cached = self.session_metadata_cache.get(sid)
-        if not force and cached and cached['mtime'] == mtime and cached['size'] == size:
-            session['token_data'] = cached['token_data']
-            session['project_name'] = cached['project_name']
-            return cached['token_data'], cached['project_name']
+        cached = self.session_metadata_cache.get(sid, mtime, size)
+        if not force and cached:
+            if session.token_data is None:  # Cleared by the scanner whenever the file changes
+                session.token_data = cached.token_data
+                session.project_name = cached.project_name
+            return session.token_data, cached.project_name
+        cached = self.session_metadata_cache.peek(sid)  # Previous file version, for the safeguards
             
         # Perform standard scan (using fast stat)
-        token_data = extract_pb_tokens(pb_path, self._context_window)
+        token_data = extract_pb_tokens(pb_path, self._context_window, self.settings.get('model'),
+                                       self.settings.get('token_estimator'))
         
         # SAFEGUARD: Handle Locked File (None return)
         if token_data is None:
             # If we have cache, return it. Otherwise return None.
             if cached:
-                return cached['token_data'], cached['project_name']
+                return cached.token_data, cached.project_name
             return None, None
 
         # SAFEGUARD: Ignore transient drops during active writes (Race Condition Fix)
         # If tokens dropped by >50% and file was modified <2s ago, it's likely a partial write.
-        if cached and token_data.get('tokens_used', 0) < (cached['token_data'].get('tokens_used', 0) * 0.5):
+        if cached and token_data.get('tokens_used', 0) < cached.tokens_used * 0.5:
             if (time.time() - mtime) < 2.0:
                 # Keep cache, ignore this incomplete read
-                return cached['token_data'], cached['project_name']
+                return cached.token_data, cached.project_name
 
-        project_name = token_data.get('project_name')
+        # Workspace-root mentions first (incremental scan), GitHub/<name> regex as fallback
+        project_name = workspace_index.project_for(sid, pb_path) or token_data.get('project_name')
         
         # Update cache
-        self.session_metadata_cache[sid] = {
-            'mtime': mtime,
-            'size': size,
-            'token_data': token_data,
-            'project_name': project_name
-        }
+        self.session_metadata_cache.put(sid, SessionMeta(mtime, size, token_data, project_name))
         
         # Update session object
-        session['token_data'] = token_data
-        session['project_name'] = project_name
+        session.token_data = token_data
+        session.project_name = project_name
         
         return token_data, project_name
 
@@ -437,7 +426,7 @@ class ContextMonitor:
             sessions_to_scan = self.sessions_cache[:15]
             for s in sessions_to_scan:
                 # Skip if already resolved
-                if s.get('token_data'): continue
+                if s.token_data: continue
                 
                 # Resolve (Heavy I/O)
                 self.resolve_session_metadata(s)
@@ -445,6 +434,84 @@ class ContextMonitor:
         except Exception:
             pass  # Silently ignore metadata resolution errors
 
+    def handle_scan_changes(self, removed, moved):
+        """Drop per-session caches for sessions deleted, archived or renamed since the last scan"""
+        if not removed and not moved:
+            return
+        for sid, path in list(removed.items()) + list(moved.items()):
+            token_engine.forget(path)
+            workspace_index.forget(sid)
+        self.session_metadata_cache.invalidate(list(removed) + list(moved))
+        for sid in removed:
+            self.project_resolver.invalidate(sid)
+            burn_rate_tracker.forget(sid)
+            self.session_tracker.states.pop(sid, None)
+        print(f"[Scan] {len(removed)} sessions removed, {len(moved)} renamed")
+
+    def session_tokens(self, token_data):
+        """Tokens for a resolved session: calibrated bytes-per-token when fitted, else the estimator"""
+        return calibrator.estimate_tokens(self.settings.get('model'),
+                                          token_data.get('payload_bytes')) or token_data['tokens_used']
+
+    def session_reading(self, session):
+        """(tokens, context_window, source) recorded for a session: its file estimate, else its size
+
+        The quota API only describes whichever session is current, and sessions
+        trade that role between passes, so it is never recorded per session.
+        """
+        token_data = session.token_data
+        if token_data:
+            return self.session_tokens(token_data), token_data['context_window'], 'estimate'
+        return session.size // 40, self._context_window, 'size'
+
+    def record_session_sample(self, session_id, tokens, source, project_name):
+        """Record one reading in analytics and history; returns the delta since the last one"""
+        # A new source starts a new delta series instead of counting the jump as usage
+        last_tokens = self.session_tracker.delta_base(session_id, source)
+        self.save_analytics(tokens, project_name, session_id)  # Before save_history, which moves the base
+        self.save_history(session_id, tokens)
+        return tokens - last_tokens if last_tokens > 0 else 0
+
+    def sample_background_sessions(self, sessions):
+        """Record history, analytics and alerts for the other recently active sessions"""
+        for session in self.session_tracker.select(sessions, self.current_session.id):
+            token_data, _ = self.resolve_session_metadata(session)
+            if not token_data:
+                continue
+            tokens, window, source = self.session_reading(session)
+            percent = min(100, round((tokens / window) * 100))
+            # The foreground window belongs to the current session, so don't use it here
+            project_name = self.get_project_name(session.id, skip_vscode=True)
+            self.record_session_sample(session.id, tokens, source, project_name)
+            self.session_tracker.record(session, percent, project_name)
+            self.check_context_alerts(percent, tokens, session.id)
+
+    def draw_session_strip(self):
+        """Delegated to ui_builder module"""
+        from ui_builder import draw_session_strip
+        draw_session_strip(self)
+
+    def set_session_window(self, seconds):
+        """Set how recently a session must have been written to be tracked"""
+        self.session_tracker.window = seconds
+        self.settings['multi_session_window'] = seconds
+        self.save_settings()
+        self.load_session()
+
+    def active_session_ids(self):
+        """Sessions that must never be archived or deleted"""
+        ids = [self.selected_session_id]
+        if self.current_session:
+            ids.append(self.current_session.id)
+        return [sid for sid in ids if sid]
+
+    def session_project(self, session):
+        """Best-known project for a session without doing any I/O"""
+        return session.project_name or self.project_name_cache.get(session.id)
+
+    def retention_policy(self):
+        return RetentionPolicy.from_dict(self.settings.get('retention'))
+
     def get_active_vscode_project(self):
         """Delegated to utils module (Phase 5: V2.54)"""
         from utils import get_active_vscode_project
@@ -454,9 +521,10 @@ class ContextMonitor:
         from utils import get_recently_modified_project
         return get_recently_modified_project(self.github_path)
     def get_project_name(self, session_id, skip_vscode=False):
-        """Delegated to utils module (Phase 5: V2.54)"""
-        from utils import get_project_name
-        return get_project_name(session_id, self.github_path, skip_vscode)
+        """Cached attribution via project_resolver (file content hint from the metadata scan)"""
+        cached = self.session_metadata_cache.peek(session_id)
+        content_hint = cached.project_name if cached else None
+        return self.project_resolver.resolve(session_id, skip_vscode, content_hint)
     def ensure_logs_dir(self, session_id):
         """Proactively ensure the logs directory exists for agents to scan."""
         try:
@@ -478,7 +546,7 @@ class ContextMonitor:
         # 2. Pick current session
         self.current_session = sessions[0]
         if self.selected_session_id:
-            found = next((s for s in sessions if s['id'] == self.selected_session_id), None)
+            found = self.session_scanner.records.get(self.selected_session_id)  # Pinned, so fresh
             if found: self.current_session = found
             else: self.selected_session_id = None
 
@@ -495,9 +563,12 @@ class ContextMonitor:
         threading.Thread(target=self.background_metadata_scan, daemon=True).start()
 
         # Ensure logs directory exists for the current session
-        self.ensure_logs_dir(self.current_session['id'])
+        self.ensure_logs_dir(self.current_session.id)
 
-        context_window = self._context_window
+        # Per-session records (history, analytics, burn rate, strip) always use the
+        # file estimate, whichever session is current; the API only drives the gauge
+        recorded_tokens, recorded_window, source = self.session_reading(self.current_session)
+        recorded_percent = min(100, round((recorded_tokens / recorded_window) * 100))
         
         # === NEW: Try to use real API quota data first ===
         api_status = quota_manager.get_status()
@@ -506,45 +577,40 @@ class ContextMonitor:
         if use_api_data:
             # Use real quota data from Antigravity API
             percent = round(100 - api_status.get('percent_remaining', 0))
-            tokens_used = 0  # API doesn't give raw tokens, just percentage
-            tokens_left = 0  # Will show percentage instead
             
             # For display purposes, estimate tokens from percentage
             context_window = self._context_window
             tokens_used = int(context_window * (percent / 100))
             tokens_left = max(0, context_window - tokens_used)
-        else:
-            # Fallback: Use file-size based estimation
-            token_data = self.current_session.get('token_data')
-            if token_data:
-                tokens_used = token_data['tokens_used']
-                context_window = token_data['context_window']
-                tokens_left = token_data['tokens_remaining']
-            else:
-                # Fallback if first read failed
-                tokens_used = self.current_session['size'] // 40
-                tokens_left = max(0, context_window - tokens_used)
-            
-            percent = min(100, round((tokens_used / context_window) * 100))
 
-        
-        # Calculate delta from last reading
-        delta = tokens_used - self.last_tokens if self.last_tokens > 0 else 0
+            # Feed the bytes-per-token fit used when the API is unavailable
+            token_data = self.current_session.token_data or {}
+            calibrator.observe(self.settings.get('model'), self.current_session.id,
+                               token_data.get('payload_bytes', self.current_session.size),
+                               100 - api_status.get('percent_remaining', 0), context_window)
+        else:
+            # Fallback: payload-based estimation, calibrated against the API when a fit exists
+            context_window = recorded_window
+            tokens_used = recorded_tokens
+            tokens_left = max(0, context_window - tokens_used)
+            percent = recorded_percent
         
         self.current_percent = percent
         self.draw_gauge(percent)
         
         # Track analytics - skip VS Code detection if session was manually selected
-        # MUST run before save_history to capture correct delta (save_history updates self.last_tokens)
         is_manual_session = self.selected_session_id is not None
-        project_name = self.get_project_name(self.current_session['id'], skip_vscode=is_manual_session)
-        self.save_analytics(tokens_used, project_name)
-        
-        # Save history (throttle: save max once per 5 mins)
-        self.save_history(self.current_session['id'], tokens_used)
+        project_name = self.get_project_name(self.current_session.id, skip_vscode=is_manual_session)
+        delta = self.record_session_sample(self.current_session.id, recorded_tokens, source, project_name)
         
         # Check for context window alerts (handoff warnings)
         self.check_context_alerts(percent, tokens_used)
+        self.session_tracker.record(self.current_session, recorded_percent, project_name)
+        
+        # Other sessions written to recently share this pass (same scan, incremental parses)
+        self.sample_background_sessions(sessions)
+        if hasattr(self, 'sessions_strip') and self.sessions_strip.winfo_exists():
+            self.draw_session_strip()
         
         # DEBUG ALERTS
         if time.time() % 5 < 0.1: # Print every ~5s
@@ -553,134 +619,30 @@ class ContextMonitor:
             tod_total = ana['daily'].get(today, {}).get('total', 0)
             print(f"[DEBUG] Window%: {percent} | Tokens: {tokens_used} | Budget: {self._daily_budget} | Today: {tod_total}")
         
-        if not self.mini_mode:
-            # Show 0 if negative to avoid confusing the user
-            display_tokens = max(0, tokens_left)
-            self.tokens_label.config(text=f"{display_tokens:,}")
-            
-            # Update delta label
-            if hasattr(self, 'delta_label'):
-                if delta > 0:
-                    self.delta_label.config(text=f"↑ +{delta:,} since last", fg=self.colors['yellow'])
-                elif delta < 0:
-                    self.delta_label.config(text=f"↓ {delta:,} (new session)", fg=self.colors['blue'])
-                else:
-                    self.delta_label.config(text="— no change", fg=self.colors['muted'])
-            
-            # Use project name from file if session was manually selected
-            display_name = self.get_project_name(self.current_session['id'], skip_vscode=is_manual_session)
-            # PERFORMANCE: Cap display name to prevent layout breakage
-            capped_name = (display_name[:25] + "...") if len(display_name) > 25 else display_name
-        
-            # Update UI labels if they exist (Compact/Full mode)
-            if hasattr(self, 'session_label'):
-                self.session_label.config(text=capped_name)
-            if hasattr(self, 'project_label'):
-                self.project_label.config(text=capped_name)
-
         # Update tray icon (Run in all modes)
         if HAS_TRAY:
             self.update_tray_icon()
         
-        # Update mini history panel with recent deltas
-        if hasattr(self, 'history_labels'):
-            history_data = self.load_history().get(self.current_session['id'], [])
-            # Get last 5 entries with non-zero deltas
-            recent_deltas = [h for h in history_data if h.get('delta', 0) != 0][-5:]
-            
-            for i, lbl in enumerate(self.history_labels):
-                if i < len(recent_deltas):
-                    d = recent_deltas[-(i+1)]  # Reverse order (newest first)
-                    delta_val = d.get('delta', 0)
-                    if delta_val > 0:
-                        text = f"+{delta_val:,}"
-                        # Color based on magnitude
-                        if delta_val > 5000:
-                            color = self.colors['red']
-                        elif delta_val > 2000:
-                            color = self.colors['yellow']
-                        else:
-                            color = self.colors['green']
-                    else:
-                        text = f"{delta_val:,}"
-                        color = self.colors['blue']
-                    if i == 0: # Latest delta
-                        lbl.config(text=text, fg=color, font=('Consolas', 11, 'bold'))
-                    else:
-                        lbl.config(text=text, fg=color, font=('Consolas', 11))
-                else:
-                    lbl.config(text="—", fg=self.colors['muted'], font=('Consolas', 11))
+        # Visible views pick up what they need; derived metrics are computed on demand
+        self.snapshot_bus.publish(Snapshot(self.current_session.id, project_name, percent, tokens_used,
+                                           max(0, tokens_left), context_window, delta))
         
-        # Update time-to-handoff label if exists (Compact/Full mode)
-        if hasattr(self, 'ttf_label') and self.ttf_label.winfo_exists():
-            seconds = self.calculate_time_to_handoff()
-            time_str = self.format_time_remaining(seconds)
-            
-            # Color based on urgency
-            if seconds is None:
-                ttf_color = self.colors['text2']
-            elif seconds <= 0:
-                ttf_color = self.colors['red']
-            elif seconds < 300:  # < 5 min
-                ttf_color = self.colors['red']
-            elif seconds < 900:  # < 15 min
-                ttf_color = self.colors['yellow']
-            else:
-                ttf_color = self.colors['green']
-            
-            self.ttf_label.config(text=f"⏱️ {time_str}", fg=ttf_color)
-        
-        # Update tab-specific labels if they exist (Full Mode Caching)
-        if hasattr(self, 'stats_tokens_used_label') and self.stats_tokens_used_label.winfo_exists():
-            usage_color = self.colors['red'] if percent >= 80 else (self.colors['yellow'] if percent >= 60 else self.colors['green'])
-            self.stats_tokens_used_label.config(text=f"  • Tokens Used: {tokens_used:,} ({percent}%)", fg=usage_color)
-        if hasattr(self, 'stats_tokens_left_label') and self.stats_tokens_left_label.winfo_exists():
-            self.stats_tokens_left_label.config(text=f"  • Tokens Remaining: {tokens_left:,}")
-            
-        # Refresh high-frequency tabs if visible
-        if self.display_mode == 'full':
-            if self.active_tab == 'diagnostics':
-                # Re-render diagnostics to get fresh process list
-                if self.active_tab in self.tab_frames and self.tab_frames[self.active_tab].winfo_exists():
-                    frame = self.tab_frames[self.active_tab]
-                    for widget in frame.winfo_children():
-                        widget.destroy()
-                    self.render_diagnostics_inline(frame)
-            elif self.active_tab == 'history':
-                self.draw_mini_graph()
-        
-        # Last updated timestamp
-        updated_time = datetime.now().strftime("%H:%M:%S")
-        if hasattr(self, 'status_label'):
-            current_status = self.status_label.cget('text').split(' | ')[0]
-            self.status_label.config(text=f"{current_status} | {updated_time}")
-        
-        # Update status and auto-copy at 80% (Requires status_label/frame)
-        if hasattr(self, 'status_label') and hasattr(self, 'status_frame'):
-            if percent >= 80:
-                self.status_label.config(text="🔴 Handoff copied!", fg=self.colors['red'])
-                self.status_frame.config(bg='#2d1518')
-                if not self.handoff_copied:
-                    self.copy_handoff()
-                    self.handoff_copied = True
-            elif percent >= 60:
-                self.status_label.config(text="⚡ Approaching limit", fg=self.colors['yellow'])
-                self.status_frame.config(bg='#2d2a1a')
-                self.handoff_copied = False
-            else:
-                self.status_label.config(text="✓ Plenty of fuel", fg=self.colors['green'])
-                self.status_frame.config(bg=self.colors['bg3'])
-                self.handoff_copied = False
+        # Auto-copy the handoff bridge once when crossing 80% (needs the status bar)
+        if percent < 80:
+            self.handoff_copied = False
+        elif not self.handoff_copied and not self.mini_mode:
+            self.copy_handoff()
+            self.handoff_copied = True
             
     def auto_refresh(self):
+        self.sample_processes()
         self.load_session()
         self.root.after(self.polling_interval, self.auto_refresh)
     
     def force_refresh(self):
         """Force refresh project detection by clearing cache"""
         # Clear the cache to force re-detection
-        self.project_name_cache.clear()
-        self.project_name_timestamp.clear()
+        self.project_resolver.invalidate()
         
         # Show visual feedback
         if not self.mini_mode and hasattr(self, 'refresh_btn'):
@@ -692,7 +654,7 @@ class ContextMonitor:
         
         # Print debug info
         if self.current_session:
-            project = self.get_project_name(self.current_session['id'])
+            project = self.get_project_name(self.current_session.id)
             print(f"[Refresh] Detected project: {project}")
         
         
@@ -700,8 +662,7 @@ class ContextMonitor:
         """Manually switch to a specific session"""
         self.selected_session_id = session_id
         # Clear project name cache for this session to force refresh
-        if session_id in self.project_name_cache:
-            del self.project_name_cache[session_id]
+        self.project_resolver.invalidate(session_id)
         self.load_session()
     
     def start_drag(self, event):
@@ -757,6 +718,10 @@ class ContextMonitor:
                 'daily_budget': self._daily_budget,
                 'context_window': self._context_window,
                 'model': self.settings.get('model'),
+                'retention': self.settings.get('retention', {}),
+                'workspace_roots': self.settings.get('workspace_roots', []),
+                'token_estimator': self.settings.get('token_estimator'),
+                'multi_session_window': self.session_tracker.window,
                 'window_x': self.root.winfo_x(),
                 'window_y': self.root.winfo_y()
             }
@@ -854,8 +819,14 @@ class ContextMonitor:
     def save_history(self, session_id, tokens):
         """Save history using data_service (V2.46: Modularized)"""
         throttle_seconds = max(2, self.polling_interval / 1000)
-        delta = data_service.save_history(session_id, tokens, self.last_tokens, throttle_seconds)
-        self.last_tokens = tokens
+        state = self.session_tracker.state(session_id)
+        delta = data_service.save_history(session_id, tokens, state.last_tokens, throttle_seconds)
+        state.last_tokens = tokens
+        # Feed the burn-rate estimator exactly once per sample
+        if burn_rate_tracker.has_session(session_id):
+            burn_rate_tracker.update(session_id, time.time(), tokens)
+        else:
+            burn_rate_tracker.seed(session_id, self.load_history().get(session_id, []))
         return delta
     def _flush_history_cache(self):
         """Flush via data_service (V2.46: Modularized)"""
@@ -868,9 +839,15 @@ class ContextMonitor:
         if not self.current_session or not hasattr(self, 'graph_canvas'):
             return
             
-        sid = self.current_session['id']
+        sid = self.current_session.id
         data = self.load_history().get(sid, [])
         
+        # Nothing new for this session since the last draw on this canvas
+        key = (self.graph_canvas, sid, data_service.version('history', sid), self._context_window)
+        if key == self._graph_drawn:
+            return
+        self._graph_drawn = key
+        
         if not data:
             self.graph_canvas.create_text(280, 75, text="Not enough data yet",
                                          fill=self.colors['muted'], font=('Segoe UI', 10))
@@ -989,6 +966,9 @@ class ContextMonitor:
         # Render based on active tab
         if self.active_tab == 'diagnostics':
             self.render_diagnostics_inline(tab_frame)
+            # Re-rendered with fresh processes each pass, but only while the tab is shown
+            from ui_builder import refresh_diagnostics_inline
+            self.snapshot_bus.subscribe(lambda snap: refresh_diagnostics_inline(self, tab_frame, snap), tab_frame, fresh=True)
         elif self.active_tab == 'token_stats':
             self.render_token_stats_inline(tab_frame)
         elif self.active_tab == 'history':
@@ -1027,6 +1007,26 @@ class ContextMonitor:
             self.root.after(500, self.flash_warning)
     
     
+    def render_diagnostics_inline(self, parent):
+        """Delegated to ui_builder module"""
+        from ui_builder import render_diagnostics_inline
+        render_diagnostics_inline(self, parent)
+    
+    def render_token_stats_inline(self, parent):
+        """Delegated to ui_builder module"""
+        from ui_builder import render_token_stats_inline
+        render_token_stats_inline(self, parent)
+    
+    def render_history_inline(self, parent):
+        """Delegated to ui_builder module"""
+        from ui_builder import render_history_inline
+        render_history_inline(self, parent)
+    
+    def render_analytics_inline(self, parent):
+        """Delegated to ui_builder module"""
+        from ui_builder import render_analytics_inline
+        render_analytics_inline(self, parent)
+    
     def render_quota_inline(self, parent):
         """Delegated to ui_builder (Phase B: Quota)"""
         from ui_builder import render_quota_inline
@@ -1052,8 +1052,8 @@ class ContextMonitor:
             self.root.clipboard_append("No active session detected.")
             return
 
-        sid = self.current_session['id']
-        tokens = self.current_session.get('token_data', {})
+        sid = self.current_session.id
+        tokens = self.current_session.token_data or {}
         used = tokens.get('tokens_used', 0)
         limit = tokens.get('context_window', self._context_window)
         pct = (used / limit) * 100 if limit > 0 else 0
@@ -1147,6 +1147,18 @@ class ContextMonitor:
         """Delegated to dialogs module (Phase 4: V2.54)"""
         from dialogs import archive_old_sessions
         archive_old_sessions(self)
+    def compact_archive_store(self):
+        """Delegated to dialogs module"""
+        from dialogs import compact_archive_store
+        compact_archive_store(self)
+    def show_retention_dialog(self):
+        """Delegated to dialogs module"""
+        from dialogs import show_retention_dialog
+        show_retention_dialog(self)
+    def show_session_picker(self):
+        """Delegated to dialogs module"""
+        from dialogs import show_session_picker
+        show_session_picker(self)
     def restart_antigravity(self):
         """Restart Antigravity IDE"""
         if messagebox.askyesno("Restart Antigravity", 
@@ -1267,10 +1279,11 @@ class ContextMonitor:
         analytics = data_service.load_analytics()
         self._analytics_cache = analytics  # Keep local reference for compatibility
         return analytics
-    def save_analytics(self, tokens, project_name):
+    def save_analytics(self, tokens, project_name, session_id=None):
         """Track analytics using data_service (V2.46: Modularized)"""
         model_name = self.settings.get('model', 'Unknown')
-        analytics = data_service.save_analytics(tokens, self.last_tokens, project_name, model_name)
+        last_tokens = self.session_tracker.state(session_id or self.current_session.id).last_tokens
+        analytics = data_service.save_analytics(tokens, last_tokens, project_name, model_name)
         self._analytics_cache = analytics  # Keep local reference for compatibility
         
         # Check budget notification
@@ -1293,65 +1306,90 @@ class ContextMonitor:
             print(f"ALERTS: Daily budget 75% used ({daily_usage:,} / {budget:,} tokens)")
             self._last_notification_time = now
     
-    def check_context_alerts(self, percent, tokens_used):
-        """Check for context window usage alerts (handoff warnings)"""
-        now = time.time()
+    def check_context_alerts(self, percent, tokens_used, session_id=None):
+        """Check for context window usage alerts (handoff warnings), per session"""
+        if percent < 80:
+            return
         
-        # Only alert max once per 5 minutes to avoid spamming
-        if hasattr(self, '_last_context_alert_time') and now - self._last_context_alert_time < 300:
+        current_id = self.current_session.id if self.current_session else None
+        session_id = session_id or current_id
+        
+        # Only alert max once per 5 minutes per session to avoid spamming
+        if not self.session_tracker.should_alert(session_id, time.time(), 300):
             return
             
         context_window = self._context_window
         
-        if percent >= 80:
+        if session_id == current_id:
             # Force show widget so user sees the red status and copied handoff
             self.restore_from_tray()
-            
-            if percent >= 90:
-                print(f"ALERTS: Context window 90% full! ({tokens_used:,} / {context_window:,} tokens)")
-            else:
-                print(f"ALERTS: Context window 80% full ({tokens_used:,} / {context_window:,} tokens)")
-                
-            self._last_context_alert_time = now
-
-    def calculate_time_to_handoff(self):
-        """Estimate time until context limit based on recent token burn rate"""
-        if not self.current_session:
-            return None
-            
-        # Get recent history for rate calculation
-        history = self.load_history().get(self.current_session['id'], [])
-        if len(history) < 3:
-            return None
-        
-        # Use last 10 minutes (approx 60 samples at 10s interval) for smoother rate
-        recent = history[-60:]
-        if len(recent) < 2:
-            return None
+            where = ""
+        else:
+            where = f" in {self.session_tracker.state(session_id).project or session_id[:8]}"
         
-        # Calculate tokens per second
-        time_span = recent[-1]['ts'] - recent[0]['ts']
-        token_span = recent[-1]['tokens'] - recent[0]['tokens']
+        if percent >= 90:
+            print(f"ALERTS: Context window 90% full{where}! ({tokens_used:,} / {context_window:,} tokens)")
+        else:
+            print(f"ALERTS: Context window 80% full{where} ({tokens_used:,} / {context_window:,} tokens)")
+
+    def current_processes(self):
+        """Process rows from this pass's sample (sampled now if no pass has run yet)"""
+        if self.processes is None:
+            self.sample_processes()
+        return self.processes
+
+    def sample_processes(self):
+        """Sample the process table once per pass; feeds the memory trend and warns on projected leaks
+
+        CPU% is measured since the previous sample, so every view reads this
+        pass's rows instead of sampling again (which would shrink the interval).
+        """
+        self.processes = self.get_antigravity_processes()
+        try:
+            memory_trend.record(self.processes)
+        except Exception as e:
+            print(f"Memory trend error: {e}")
+            return
         
-        if time_span <= 0 or token_span <= 0:
+        now = time.time()
+        if now - getattr(self, '_last_memory_alert_time', 0) < MEMORY_ALERT_COOLDOWN:
+            return
+        alerts = memory_trend.check(self.thresholds)
+        if alerts:
+            a = alerts[0]
+            print(f"ALERTS: {a.label} memory rising {a.slope_mb_per_min:+.1f}MB/min - "
+                  f"{a.limit_mb}MB limit in ~{self.format_time_remaining(a.seconds_to_limit)} "
+                  f"({a.current_mb}MB now)")
+            self._last_memory_alert_time = now
+    
+    def estimate_time_to_handoff(self):
+        """Time until the 80% handoff point with a confidence interval (HandoffEstimate or None)"""
+        if not self.current_session:
             return None
         
-        rate_per_second = token_span / time_span
-        
-        # Calculate remaining tokens until 80% (handoff point)
-        context_window = self._context_window
-        current_tokens = recent[-1]['tokens']
-        handoff_threshold = context_window * 0.8
-        remaining = handoff_threshold - current_tokens
-        
-        if remaining <= 0:
-            return 0  # Already at/past handoff
-        
-        if rate_per_second <= 0:
-            return None  # No burn rate
+        sid = self.current_session.id
+        if not burn_rate_tracker.has_session(sid):
+            # First read for this session (e.g. after a switch): warm from history once
+            burn_rate_tracker.seed(sid, self.load_history().get(sid, []))
         
-        seconds_remaining = remaining / rate_per_second
-        return int(seconds_remaining)
+        handoff_threshold = self._context_window * 0.8
+        # The estimator only moves when save_history appends a sample for this session
+        return data_service.derived('handoff', data_service.version('history', sid),
+                                    lambda: burn_rate_tracker.estimate(sid, handoff_threshold),
+                                    sid, handoff_threshold)
+    
+    def recent_deltas(self, snapshot, count=5):
+        """Last non-zero history deltas of the snapshot's session, oldest first"""
+        sid = snapshot.session_id
+        def compute():
+            history = self.load_history().get(sid, [])
+            return [h['delta'] for h in history if h.get('delta', 0) != 0][-count:]
+        return data_service.derived('recent_deltas', data_service.version('history', sid), compute, sid, count)
+    
+    def calculate_time_to_handoff(self):
+        """Estimate time until context limit based on recent token burn rate"""
+        estimate = self.estimate_time_to_handoff()
+        return estimate.seconds if estimate else None
     
     def format_time_remaining(self, seconds):
         """Format seconds into human-readable time"""
@@ -1413,8 +1451,11 @@ class ContextMonitor:
             print(f"Exit error: {e}")
         finally:
             # Force cleanup and exit
+            self.retention_engine.stop()
             self._flush_history_cache()  # Save any pending history
             self._flush_analytics_cache()  # Save any pending analytics
+            quota_manager.flush_state()  # Save debounced quota window
+            calibrator.flush()  # Save bytes-per-token fits
             self._cleanup_processes()
             # Use os._exit to ensure all threads are terminated
             os._exit(0)
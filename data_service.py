@@ -1,13 +1,29 @@
 """
 Data Service for Context Monitor
 Handles all file I/O for history and analytics with caching and throttling.
+
+Each dataset carries a monotonically increasing version that moves only when
+its content changes: an append, a new analytics day, or a reload because the
+file was changed by someone else. Derived views (weekly and project
+summaries, handoff estimates, graphs) are memoized on that version, so a
+refresh with no new data costs a dict lookup instead of a recomputation.
 """
 import json
 import time
 # Path objects provided by config module
 from datetime import datetime
 
-from config import HISTORY_FILE, ANALYTICS_FILE, HISTORY_CACHE_TTL, ANALYTICS_SAVE_THROTTLE, MAX_HISTORY_POINTS
+from config import (HISTORY_FILE, ANALYTICS_FILE, HISTORY_CACHE_TTL, ANALYTICS_SAVE_THROTTLE,
+                    MAX_HISTORY_POINTS, DERIVED_CACHE_MAX)
+
+
+def _signature(path):
+    """(mtime_ns, size) of a file, or None if it doesn't exist."""
+    try:
+        st = path.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
 
 
 class DataService:
@@ -25,29 +41,96 @@ class DataService:
         
         # Analytics cache
         self._analytics_cache = None
+        self._analytics_dirty = False
         self._last_analytics_save = 0
+        
+        # On-disk signature of what each cache was loaded from or flushed to
+        self._history_signature = None
+        self._analytics_signature = None
+        
+        # Dataset versions: one clock shared by 'history', 'analytics' and
+        # the per-session parts of history ('history', session_id)
+        self._clock = 0
+        self.versions = {'history': 0, 'analytics': 0}
+        self._reloaded = {'history': 0, 'analytics': 0}
+        
+        # Memoized derived views: (name, params) -> (version, value)
+        self._derived = {}
+        self.stats = {'hits': 0, 'misses': 0, 'reloads': 0}
+    
+    # === VERSIONS ===
+    
+    def _bump(self, dataset, session_id=None, reload=False):
+        self._clock += 1
+        self.versions[dataset] = self._clock
+        if session_id is not None:
+            self.versions[(dataset, session_id)] = self._clock
+        if reload:
+            self._reloaded[dataset] = self._clock
+            self.stats['reloads'] += 1
+    
+    def version(self, dataset, session_id=None):
+        """Version of a dataset, or of one session's part of it."""
+        if session_id is None:
+            return self.versions[dataset]
+        return max(self.versions.get((dataset, session_id), 0), self._reloaded[dataset])
+    
+    def derived(self, name, version, compute, *params):
+        """`compute()` memoized on (name, params) until `version` moves.
+        
+        The result is shared between callers and must not be mutated.
+        """
+        key = (name, params)
+        entry = self._derived.get(key)
+        if entry is not None and entry[0] == version:
+            self.stats['hits'] += 1
+            return entry[1]
+        self.stats['misses'] += 1
+        if len(self._derived) >= DERIVED_CACHE_MAX:
+            self._derived.clear()
+        value = compute()
+        self._derived[key] = (version, value)
+        return value
+    
+    def describe(self) -> str:
+        s = self.stats
+        lookups = s['hits'] + s['misses']
+        rate = f"{s['hits'] / lookups:.0%}" if lookups else "—"
+        return (f"history v{self.versions['history']}, analytics v{self.versions['analytics']}, "
+                f"{len(self._derived)} views ({rate} hits), {s['reloads']} reloads")
     
     # === HISTORY ===
     
     def load_history(self, force_reload=False):
-        """Load history with caching."""
+        """Load history with caching; the file is re-read only if it changed on disk."""
         now = time.time()
         
         if not force_reload and self._history_cache is not None:
-            if now - self._history_cache_time < HISTORY_CACHE_TTL:
+            # Unflushed appends live only in the cache, never trade them for the file
+            if self._history_dirty or now - self._history_cache_time < HISTORY_CACHE_TTL:
+                return self._history_cache
+            self._history_cache_time = now
+            if _signature(self.history_file) == self._history_signature:
                 return self._history_cache
         
+        signature = _signature(self.history_file)
         try:
-            if self.history_file.exists():
+            if signature is not None:
                 with open(self.history_file, 'r') as f:
                     self._history_cache = json.load(f)
                     self._history_cache_time = now
+                    self._history_signature = signature
+                    self._history_dirty = False
+                    self._bump('history', reload=True)
                     return self._history_cache
         except Exception as e:
             print(f"History load error: {e}")
         
         self._history_cache = {}
         self._history_cache_time = now
+        self._history_signature = signature
+        self._history_dirty = False
+        self._bump('history', reload=True)
         return self._history_cache
     
     def save_history(self, session_id, tokens, last_tokens, throttle_seconds=2):
@@ -71,6 +154,7 @@ class DataService:
         
         self._history_cache = data
         self._history_dirty = True
+        self._bump('history', session_id)
         
         if now - self._last_history_save >= throttle_seconds:
             self._flush_history()
@@ -88,22 +172,32 @@ class DataService:
             with open(self.history_file, 'w') as f:
                 json.dump(self._history_cache, f)
             self._history_dirty = False
+            self._history_signature = _signature(self.history_file)
         except Exception as e:
             print(f"History flush error: {e}")
     
     # === ANALYTICS ===
     
     def load_analytics(self):
-        """Load persistent analytics data."""
+        """Load persistent analytics data; the file is re-read only if it changed on disk."""
+        signature = _signature(self.analytics_file)
+        if self._analytics_cache is not None:
+            if self._analytics_dirty or signature == self._analytics_signature:
+                return self._analytics_cache
+        
         try:
-            if self.analytics_file.exists():
+            if signature is not None:
                 with open(self.analytics_file, 'r') as f:
                     self._analytics_cache = json.load(f)
+                    self._analytics_signature = signature
+                    self._bump('analytics', reload=True)
                     return self._analytics_cache
         except Exception as e:
             print(f"Analytics load error: {e}")
         
         self._analytics_cache = {'daily': {}, 'projects': {}, 'models': {}}
+        self._analytics_signature = signature
+        self._bump('analytics', reload=True)
         return self._analytics_cache
     
     def save_analytics(self, tokens, last_tokens, project_name, model_name):
@@ -113,11 +207,13 @@ class DataService:
         today = datetime.now().strftime('%Y-%m-%d')
         
         # Daily tracking
-        if today not in analytics['daily']:
+        changed = today not in analytics['daily']
+        if changed:
             analytics['daily'][today] = {'total': 0, 'sessions': 0}
         
         delta = tokens - last_tokens if last_tokens > 0 else 0
         if delta > 0:
+            changed = True
             analytics['daily'][today]['total'] += delta
             
             # Project-level tracking
@@ -133,6 +229,9 @@ class DataService:
             analytics['models'][model_name]['total'] += delta
         
         self._analytics_cache = analytics
+        if changed:
+            self._analytics_dirty = True
+            self._bump('analytics')
         
         # Throttled disk write
         if now - self._last_analytics_save >= ANALYTICS_SAVE_THROTTLE:
@@ -156,13 +255,20 @@ class DataService:
             }
             with open(self.analytics_file, 'w') as f:
                 json.dump(save_data, f, indent=2)
+            self._analytics_dirty = False
+            self._analytics_signature = _signature(self.analytics_file)
         except Exception as e:
             print(f"Analytics flush error: {e}")
     
     def get_weekly_summary(self):
         """Get token usage for the past 7 days."""
-        from datetime import datetime, timedelta
         analytics = self.load_analytics()
+        today = datetime.now().strftime('%Y-%m-%d')
+        return self.derived('weekly', self.versions['analytics'],
+                            lambda: self._weekly_summary(analytics), today)
+    
+    def _weekly_summary(self, analytics):
+        from datetime import timedelta
         today = datetime.now()
         
         weekly = []
@@ -180,6 +286,10 @@ class DataService:
     def get_project_summary(self):
         """Get token usage by project (Top 10)."""
         analytics = self.load_analytics()
+        return self.derived('projects', self.versions['analytics'],
+                            lambda: self._project_summary(analytics))
+    
+    def _project_summary(self, analytics):
         projects = []
         for name, data in analytics.get('projects', {}).items():
             projects.append({
@@ -7,6 +7,11 @@ All dialogs receive the monitor instance to access state and methods.
 import tkinter as tk
 from tkinter import messagebox
 from datetime import datetime
+from functools import partial
+from config import TOKEN_INPUT_SHARE
+from token_estimator import ESTIMATORS
+from calibration import calibrator
+from data_service import data_service
 
 
 def show_history_dialog(monitor):
@@ -14,7 +19,7 @@ def show_history_dialog(monitor):
     if not monitor.current_session:
         return
         
-    sid = monitor.current_session['id']
+    sid = monitor.current_session.id
     data = monitor.load_history().get(sid, [])
     
     if not data:
@@ -34,9 +39,16 @@ def show_history_dialog(monitor):
     canvas = tk.Canvas(win, width=460, height=280, bg=monitor.colors['bg2'], highlightthickness=0)
     canvas.pack(padx=20, pady=10)
     
+    drawn = None
     def draw_graph():
-        canvas.delete('all')
+        nonlocal drawn
         current_data = monitor.load_history().get(sid, [])
+        # The 5s refresh only redraws when this session's history moved
+        key = (data_service.version('history', sid), monitor._context_window)
+        if key == drawn:
+            return
+        drawn = key
+        canvas.delete('all')
         if not current_data:
             return
         
@@ -118,7 +130,7 @@ def show_history_dialog(monitor):
 
 def show_diagnostics_dialog(monitor):
     """Show diagnostics popup with styled visual design"""
-    procs = monitor.get_antigravity_processes()
+    procs = monitor.current_processes()
     files = monitor.get_large_conversations()
     limits = monitor.thresholds
     
@@ -175,6 +187,23 @@ def show_diagnostics_dialog(monitor):
             font=('Segoe UI', 10), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
     tk.Label(info_frame, text=f"⚙️ Processes: {len(procs)}", 
             font=('Segoe UI', 10), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
+    attribution = monitor.project_resolver.explain(monitor.current_session.id) if monitor.current_session else None
+    if attribution:
+        tk.Label(info_frame, text=f"📁 Project: {attribution.describe()}", 
+                font=('Segoe UI', 10), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
+    resolver_stats = monitor.project_resolver.stats
+    tk.Label(info_frame, text=f"🗃️ Metadata cache: {monitor.session_metadata_cache.describe()}",
+            font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text2'],
+            wraplength=400, justify='left').pack(anchor='w')
+    tk.Label(info_frame, text=f"🔔 Views: {monitor.snapshot_bus.describe()}",
+            font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text2'],
+            wraplength=400, justify='left').pack(anchor='w')
+    tk.Label(info_frame, text=f"🧮 Data: {data_service.describe()}",
+            font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text2'],
+            wraplength=400, justify='left').pack(anchor='w')
+    tk.Label(info_frame, text=f"🗂️ Project cache: {len(monitor.project_name_cache)} entries, "
+                              f"{resolver_stats['hits']} hits, {resolver_stats['evictions']} evicted",
+            font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text2']).pack(anchor='w')
     
     if total_mem > limits['total_crit']:
         status_color, status_text = monitor.colors['red'], "🔴 CRITICAL"
@@ -226,18 +255,19 @@ def show_advanced_stats_dialog(monitor):
         messagebox.showinfo("Advanced Stats", "No active session found.")
         return
     
-    conv_file = monitor.conversations_dir / f"{monitor.current_session['id']}.pb"
+    conv_file = monitor.conversations_dir / f"{monitor.current_session.id}.pb"
     if not conv_file.exists():
         messagebox.showinfo("Advanced Stats", "Conversation file not found.")
         return
     
     file_size = conv_file.stat().st_size
-    context_window = monitor._context_window
-    tokens_used = monitor.current_session['estimated_tokens'] // 10
+    token_data = monitor.current_session.token_data or {}
+    # Same calibrated reading (and size fallback) the monitor records
+    tokens_used, context_window, _ = monitor.session_reading(monitor.current_session)
     tokens_left = max(0, context_window - tokens_used)
     percent_used = min(100, round((tokens_used / context_window) * 100))
-    estimated_input = int(tokens_used * 0.4)
-    estimated_output = int(tokens_used * 0.6)
+    estimated_input = int(tokens_used * TOKEN_INPUT_SHARE)
+    estimated_output = tokens_used - estimated_input
     
     win = tk.Toplevel(monitor.root)
     win.title("📊 Advanced Token Statistics")
@@ -314,6 +344,19 @@ def show_advanced_stats_dialog(monitor):
             font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
     tk.Label(info_frame, text=f"Context Window: {context_window:,} tokens", 
             font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
+    estimator = ESTIMATORS.get(token_data.get('method'))
+    if estimator:
+        cost = token_data.get('cost_ms_per_mb')
+        cost_text = f" ({cost:.1f} ms/MB)" if cost is not None else ""
+        tk.Label(info_frame, text=f"Estimator: {estimator.label}{cost_text}",
+                font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
+        tk.Label(info_frame, text=f"Text Payload: {token_data.get('payload_bytes', 0) / 1024 / 1024:.2f} MB",
+                font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
+    fit = calibrator.fits.get(monitor.settings.get('model'))
+    if fit and fit.samples:
+        tk.Label(info_frame, text=f"Calibrated: {fit.bytes_per_token:.2f} bytes/token "
+                                  f"({fit.samples} samples, {fit.rejected} rejected)",
+                font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w')
 
 
 # ==== ANALYTICS DASHBOARD (Extracted from context_monitor.pyw - Phase 3) ====
@@ -390,6 +433,10 @@ def show_analytics_dashboard(monitor):
     dashboard_refs['ttf_label'] = tk.Label(ttf_frame, text="—",
             font=('Segoe UI', 16, 'bold'), bg=monitor.colors['bg2'], fg=monitor.colors['text'])
     dashboard_refs['ttf_label'].pack(side='right')
+    
+    dashboard_refs['ttf_range_label'] = tk.Label(ttf_frame, text="",
+            font=('Segoe UI', 8), bg=monitor.colors['bg2'], fg=monitor.colors['muted'])
+    dashboard_refs['ttf_range_label'].pack(side='right', padx=(0, 8))
 
     # 2. TODAY'S USAGE
     today_frame = tk.Frame(main_frame, bg=monitor.colors['bg2'], padx=15, pady=10)
@@ -636,28 +683,32 @@ def show_analytics_dashboard(monitor):
     
     model_var.trace('w', on_model_change)
 
-    # Start update loop
-    update_dashboard_stats(monitor, win, dashboard_refs)
+    # Updated from each refresh pass while the window is visible (shares the pass's metrics)
+    if monitor.snapshot_bus.latest:
+        update_dashboard_stats(monitor, dashboard_refs, monitor.snapshot_bus.latest)
+    monitor.snapshot_bus.subscribe(partial(update_dashboard_stats, monitor, dashboard_refs), win,
+                                   fresh=monitor.snapshot_bus.latest is not None)
 
 
-def update_dashboard_stats(monitor, win, dashboard_refs):
+def update_dashboard_stats(monitor, dashboard_refs, snap):
     """Update dashboard statistics flicker-free"""
     import time
     from datetime import timedelta
     
-    if not win.winfo_exists():
-        return
-        
     try:
-        analytics = monitor.load_analytics()
+        analytics = snap.metric('analytics')
         
         # --- 0. UPDATE TREND GRAPH ---
-        if monitor.current_session:
-            history = monitor.load_history().get(monitor.current_session['id'], [])
+        # Redrawn when the session's history moves (or once a minute, as points age out)
+        canvas = dashboard_refs['trend_canvas']
+        trend_key = (snap.session_id, data_service.version('history', snap.session_id),
+                     canvas.winfo_width(), int(time.time() // 60))
+        if snap.session_id and trend_key != dashboard_refs.get('trend_key'):
+            dashboard_refs['trend_key'] = trend_key
+            history = monitor.load_history().get(snap.session_id, [])
             cutoff = time.time() - 3600
             recent = [h for h in history if h['ts'] > cutoff]
             
-            canvas = dashboard_refs['trend_canvas']
             canvas.delete('all')
             
             if len(recent) > 1:
@@ -680,7 +731,8 @@ def update_dashboard_stats(monitor, win, dashboard_refs):
                     canvas.create_oval(points[-1][0]-3, points[-1][1]-3, points[-1][0]+3, points[-1][1]+3, fill=monitor.colors['green'], outline='')
         
         # --- 1. UPDATE TIME TO HANDOFF ---
-        seconds_remaining = monitor.calculate_time_to_handoff()
+        estimate = snap.metric('handoff')
+        seconds_remaining = estimate.seconds if estimate else None
         time_str = monitor.format_time_remaining(seconds_remaining)
         
         time_color = monitor.colors['green']
@@ -690,6 +742,13 @@ def update_dashboard_stats(monitor, win, dashboard_refs):
         
         dashboard_refs['ttf_label'].config(text=time_str, fg=time_color)
         
+        range_text = ""
+        if estimate and estimate.seconds > 0:
+            low_str = monitor.format_time_remaining(estimate.seconds_low)
+            high_str = monitor.format_time_remaining(estimate.seconds_high) if estimate.seconds_high is not None else "∞"
+            range_text = f"({low_str} – {high_str})"
+        dashboard_refs['ttf_range_label'].config(text=range_text)
+        
         # --- 2. UPDATE TODAY'S USAGE ---
         today = datetime.now().strftime('%Y-%m-%d')
         today_tokens = analytics['daily'].get(today, {}).get('total', 0)
@@ -721,7 +780,7 @@ def update_dashboard_stats(monitor, win, dashboard_refs):
         dashboard_refs['reset_label'].config(text=f"🔄 Daily Stats Reset in: {h_val}h {m_val}m (Midnight UTC)")
 
         # --- 3. UPDATE WEEKLY CHART ---
-        weekly = monitor.get_weekly_summary()
+        weekly = snap.metric('weekly')
         weekly_rev = list(reversed(weekly))
         max_tokens = max((d['tokens'] for d in weekly), default=1)
         
@@ -740,7 +799,7 @@ def update_dashboard_stats(monitor, win, dashboard_refs):
                 slot['val'].config(text="")
 
         # --- 4. UPDATE PROJECT LIST ---
-        projects = monitor.get_project_summary()
+        projects = snap.metric('projects')
         total_proj = sum(p['tokens'] for p in projects)
         
         for i, slot in enumerate(dashboard_refs['proj_slots']):
@@ -771,7 +830,7 @@ def update_dashboard_stats(monitor, win, dashboard_refs):
                 running_pct += pct
         
         # --- 6. UPDATE SYSTEM DIAGNOSTICS ---
-        procs = monitor.get_antigravity_processes()
+        procs = snap.metric('processes')
         total_mem = sum(p.get('Mem', 0) for p in procs)
         limits = monitor.thresholds
         
@@ -821,19 +880,21 @@ def update_dashboard_stats(monitor, win, dashboard_refs):
             else:
                 slot['row'].pack_forget()
 
-        # Schedule next update
-        win.after(1000, lambda: update_dashboard_stats(monitor, win, dashboard_refs))
-        
     except Exception as e:
         print(f"Dashboard update error: {e}")
 
 # ==== MAINTENANCE DIALOGS (Extracted from context_monitor.pyw - Phase 4) ====
 from tkinter import messagebox, filedialog
-import csv
-import gzip
-import shutil
+import threading
 from datetime import datetime
 from utils import get_large_conversations
+from archiver import ArchiveJob, CODECS, find_archive_candidates
+from chunk_store import collect_garbage, dedup_stats
+from retention import RetentionPolicy, format_report, plan
+from history_export import export_history
+from session_index import session_index
+from widgets import VirtualList
+from config import ARCHIVE_DEFAULT_CODEC, ARCHIVE_MIN_AGE_DAYS
 
 def cleanup_old_conversations(monitor):
     """Delete conversation files older than 7 days and larger than 5MB"""
@@ -849,7 +910,7 @@ def cleanup_old_conversations(monitor):
     
     if messagebox.askyesno("Cleanup Old Conversations", msg):
         deleted = 0
-        current_id = monitor.current_session['id'] if monitor.current_session else None
+        current_id = monitor.current_session.id if monitor.current_session else None
         for f in files:
             if current_id and current_id in str(f['path']):
                 continue  # Skip current session
@@ -861,110 +922,342 @@ def cleanup_old_conversations(monitor):
         messagebox.showinfo("Cleanup Complete", f"Deleted {deleted} files.")
 
 def archive_old_sessions(monitor):
-    """Compress old session files using gzip to save disk space"""
-    # Find sessions older than 3 days that aren't already compressed
-    cutoff = datetime.now().timestamp() - (3 * 24 * 60 * 60)  # 3 days ago
-    current_id = monitor.current_session['id'] if monitor.current_session else None
-    
-    to_compress = []
-    total_size = 0
-    
-    for f in monitor.conversations_dir.glob('*.pb'):
-        if '.tmp' in f.name:
-            continue
-        if current_id and current_id in f.stem:
-            continue  # Skip current session
-        
-        stat = f.stat()
-        if stat.st_mtime < cutoff and stat.st_size > 100000:  # Older than 3 days, > 100KB
-            to_compress.append({
-                'path': f,
-                'size_mb': round(stat.st_size / 1024 / 1024, 2),
-                'age_days': int((datetime.now().timestamp() - stat.st_mtime) / 86400)
-            })
-            total_size += stat.st_size
+    """Compress old session files in the background with a selectable codec"""
+    current_id = monitor.current_session.id if monitor.current_session else None
+    to_compress = find_archive_candidates(monitor.conversations_dir, exclude_ids=[current_id])
     
     if not to_compress:
-        messagebox.showinfo("Archive", "No old sessions to compress!\n(Sessions must be >3 days old)")
+        messagebox.showinfo("Archive", f"No old sessions to compress!\n(Sessions must be >{ARCHIVE_MIN_AGE_DAYS} days old)")
         return
     
-    msg = f"Found {len(to_compress)} old sessions ({total_size/1024/1024:.1f} MB total):\n\n"
+    total_size = sum(f['size'] for f in to_compress)
+    
+    win = tk.Toplevel(monitor.root)
+    win.title("📦 Archive Old Sessions")
+    win.geometry("420x330")
+    win.configure(bg=monitor.colors['bg'])
+    win.attributes('-topmost', True)
+    
+    content = tk.Frame(win, bg=monitor.colors['bg'], padx=15, pady=12)
+    content.pack(fill='both', expand=True)
+    
+    msg = f"Found {len(to_compress)} old sessions ({total_size/1024/1024:.1f} MB total):\n"
     for f in to_compress[:5]:
         msg += f"• {f['path'].stem[:16]}... ({f['size_mb']}MB, {f['age_days']}d old)\n"
     if len(to_compress) > 5:
         msg += f"... and {len(to_compress) - 5} more\n"
-    msg += f"\nCompress these to save ~70% disk space?"
+    tk.Label(content, text=msg, justify='left', font=('Segoe UI', 9),
+            bg=monitor.colors['bg'], fg=monitor.colors['text']).pack(anchor='w')
+    
+    # Codec / level selection
+    opts = tk.Frame(content, bg=monitor.colors['bg'])
+    opts.pack(fill='x', pady=(8, 4))
+    tk.Label(opts, text="Codec:", font=('Segoe UI', 9),
+            bg=monitor.colors['bg'], fg=monitor.colors['text2']).pack(side='left')
+    codec_var = tk.StringVar(value=ARCHIVE_DEFAULT_CODEC if ARCHIVE_DEFAULT_CODEC in CODECS else 'gzip')
+    codec_menu = tk.OptionMenu(opts, codec_var, *CODECS.keys())
+    codec_menu.config(bg=monitor.colors['bg3'], fg=monitor.colors['text'],
+                     activebackground=monitor.colors['blue'], activeforeground='white',
+                     highlightthickness=0, font=('Segoe UI', 9))
+    codec_menu.pack(side='left', padx=6)
+    
+    tk.Label(opts, text="Level:", font=('Segoe UI', 9),
+            bg=monitor.colors['bg'], fg=monitor.colors['text2']).pack(side='left', padx=(10, 0))
+    level_scale = tk.Scale(opts, orient='horizontal', length=140, showvalue=True,
+                          bg=monitor.colors['bg'], fg=monitor.colors['text'],
+                          highlightthickness=0, troughcolor=monitor.colors['bg3'])
+    level_scale.pack(side='left', padx=6)
+    
+    def on_codec_change(*args):
+        codec = CODECS[codec_var.get()]
+        level_scale.config(from_=codec.levels.start, to=codec.levels.stop - 1)
+        level_scale.set(codec.default_level)
+    codec_var.trace_add('write', on_codec_change)
+    on_codec_change()
+    
+    # Progress
+    bar_bg = tk.Frame(content, bg=monitor.colors['bg3'], height=14)
+    bar_bg.pack(fill='x', pady=(10, 4))
+    bar_fill = tk.Frame(bar_bg, bg=monitor.colors['blue'])
+    status_label = tk.Label(content, text="", font=('Segoe UI', 9),
+                           bg=monitor.colors['bg'], fg=monitor.colors['muted'])
+    status_label.pack(anchor='w')
+    
+    buttons = tk.Frame(content, bg=monitor.colors['bg'])
+    buttons.pack(fill='x', pady=(10, 0))
+    state = {'job': None}
+    
+    def poll():
+        job = state['job']
+        if job is None or not win.winfo_exists():
+            return
+        p = job.progress
+        bar_fill.place(relx=0, rely=0, relwidth=min(1.0, p.fraction), relheight=1)
+        if not p.finished:
+            status_label.config(text=f"Compressing... {p.done_files}/{p.total_files} files, "
+                                     f"{p.done_bytes/1024/1024:.1f}/{p.total_bytes/1024/1024:.1f} MB")
+            win.after(200, poll)
+            return
+        verb = "Cancelled after" if p.cancelled else "Compressed"
+        text = f"{verb} {p.done_files} sessions, saved {p.saved_bytes/1024/1024:.1f} MB"
+        if p.failed:
+            text += f" ({p.failed} failed)"
+        status_label.config(text=text, fg=monitor.colors['yellow'] if (p.failed or p.cancelled) else monitor.colors['green'])
+        action_btn.config(text="Close")
+    
+    def start():
+        if state['job'] is not None:
+            return
+        codec_menu.config(state='disabled')
+        level_scale.config(state='disabled')
+        start_btn.pack_forget()
+        state['job'] = ArchiveJob([f['path'] for f in to_compress], codec=codec_var.get(),
+                                  level=level_scale.get()).start()
+        poll()
+    
+    def cancel_or_close():
+        job = state['job']
+        if job is not None and not job.progress.finished:
+            job.cancel()
+            status_label.config(text="Cancelling...")
+            return
+        win.destroy()
     
-    if messagebox.askyesno("Archive Old Sessions", msg):
-        compressed = 0
-        saved_bytes = 0
-        
-        for f in to_compress:
+    start_btn = monitor.create_button(buttons, "▶ Compress", start)
+    start_btn.pack(side='left')
+    action_btn = monitor.create_button(buttons, "Cancel", cancel_or_close)
+    action_btn.pack(side='right')
+    
+    def on_close():
+        job = state['job']
+        if job is not None and not job.progress.finished:
+            job.cancel()  # Keep originals intact; finished files stay archived
+        win.destroy()
+    win.protocol("WM_DELETE_WINDOW", on_close)
+
+def compact_archive_store(monitor):
+    """Report dedup savings and remove chunks no archived session references"""
+    stats = dedup_stats(monitor.conversations_dir)
+    if not stats['sessions'] and not stats['chunks']:
+        messagebox.showinfo("Archive Store", "No deduplicated archives yet.\n(Choose the 'dedup' codec when archiving)")
+        return
+    
+    logical_mb = stats['logical_bytes'] / 1024 / 1024
+    stored_mb = stats['stored_bytes'] / 1024 / 1024
+    ratio = (stats['logical_bytes'] / stats['stored_bytes']) if stats['stored_bytes'] else 0
+    msg = (f"{stats['sessions']} archived sessions: {logical_mb:.1f} MB stored as "
+           f"{stats['chunks']:,} chunks ({stored_mb:.1f} MB, {ratio:.1f}x)\n\n"
+           f"Remove chunks no longer referenced by any session?")
+    if not messagebox.askyesno("Compact Archive Store", msg):
+        return
+    
+    def run():
+        result = collect_garbage(monitor.conversations_dir)
+        def report():
+            if result['live'] is None:
+                messagebox.showwarning("Archive Store", "Skipped: an archive manifest could not be read.")
+            else:
+                messagebox.showinfo("Archive Store", f"Removed {result['removed']:,} chunks, "
+                                    f"freed {result['freed_bytes']/1024/1024:.1f} MB")
+        monitor.root.after(0, report)
+    threading.Thread(target=run, daemon=True).start()
+
+def show_retention_dialog(monitor):
+    """Edit the retention policy and preview what it would do (dry run)"""
+    policy = monitor.retention_policy()
+    
+    win = tk.Toplevel(monitor.root)
+    win.title("🧹 Retention Policy")
+    win.geometry("560x520")
+    win.configure(bg=monitor.colors['bg'])
+    win.attributes('-topmost', True)
+    
+    content = tk.Frame(win, bg=monitor.colors['bg'], padx=15, pady=12)
+    content.pack(fill='both', expand=True)
+    
+    # Rule fields (blank = rule disabled)
+    form = tk.Frame(content, bg=monitor.colors['bg'])
+    form.pack(fill='x')
+    rule_fields = [
+        ('archive_after_days', "Archive after (days)"),
+        ('delete_after_days', "Delete after (days)"),
+        ('max_session_mb', "Delete if larger than (MB)"),
+        ('disk_budget_mb', "Total disk budget (MB)"),
+        ('keep_per_project', "Keep newest per project"),
+        ('min_idle_hours', "Never delete if touched within (hours)"),
+    ]
+    entries = {}
+    for row, (key, label) in enumerate(rule_fields):
+        tk.Label(form, text=label, font=('Segoe UI', 9), bg=monitor.colors['bg'],
+                fg=monitor.colors['text2']).grid(row=row, column=0, sticky='w', pady=1)
+        value = getattr(policy, key)
+        var = tk.StringVar(value='' if value is None else f"{value:g}")
+        tk.Entry(form, textvariable=var, width=10, bg=monitor.colors['bg3'], fg=monitor.colors['text'],
+                insertbackground=monitor.colors['text'], relief='flat').grid(row=row, column=1, padx=8, pady=1)
+        entries[key] = var
+    
+    codec_var = tk.StringVar(value=policy.codec if policy.codec in CODECS else 'gzip')
+    tk.Label(form, text="Archive codec", font=('Segoe UI', 9), bg=monitor.colors['bg'],
+            fg=monitor.colors['text2']).grid(row=len(rule_fields), column=0, sticky='w', pady=1)
+    codec_menu = tk.OptionMenu(form, codec_var, *CODECS.keys())
+    codec_menu.config(bg=monitor.colors['bg3'], fg=monitor.colors['text'], highlightthickness=0,
+                     activebackground=monitor.colors['blue'], font=('Segoe UI', 9))
+    codec_menu.grid(row=len(rule_fields), column=1, sticky='w', padx=8)
+    
+    enabled_var = tk.BooleanVar(value=policy.enabled)
+    tk.Checkbutton(content, text="Apply automatically in the background", variable=enabled_var,
+                  bg=monitor.colors['bg'], fg=monitor.colors['text'], selectcolor=monitor.colors['bg3'],
+                  activebackground=monitor.colors['bg'], font=('Segoe UI', 9)).pack(anchor='w', pady=(6, 0))
+    
+    last = monitor.retention_engine.last_run
+    if last:
+        tk.Label(content, text=f"Last run {datetime.fromtimestamp(last['time']).strftime('%H:%M')}: "
+                              f"deleted {last['deleted']}, archived {last['archived']}, "
+                              f"{last['pending']} pending", font=('Segoe UI', 8),
+                bg=monitor.colors['bg'], fg=monitor.colors['muted']).pack(anchor='w')
+    
+    report = tk.Text(content, height=14, font=('Consolas', 8), bg=monitor.colors['bg2'],
+                    fg=monitor.colors['text'], relief='flat', wrap='none')
+    report.pack(fill='both', expand=True, pady=(8, 8))
+    
+    def read_policy():
+        data = {'enabled': enabled_var.get(), 'codec': codec_var.get(),
+                'archive_min_size': policy.archive_min_size}
+        for key, var in entries.items():
+            text = var.get().strip()
+            if not text:
+                data[key] = 0 if key in ('keep_per_project', 'min_idle_hours') else None
+                continue
             try:
-                orig_path = f['path']
-                gz_path = orig_path.with_suffix('.pb.gz')
-                
-                # Compress the file
-                with open(orig_path, 'rb') as f_in:
-                    with gzip.open(gz_path, 'wb', compresslevel=6) as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                
-                # Calculate savings
-                orig_size = orig_path.stat().st_size
-                new_size = gz_path.stat().st_size
-                saved_bytes += orig_size - new_size
-                
-                # Delete original
-                orig_path.unlink()
-                compressed += 1
-                
-            except Exception as e:
-                print(f"Error compressing {f['path']}: {e}")
-        
-        saved_mb = saved_bytes / 1024 / 1024
-        messagebox.showinfo("Archive Complete", 
-                          f"Compressed {compressed} sessions\nSaved {saved_mb:.1f} MB of disk space!")
+                data[key] = int(text) if key == 'keep_per_project' else float(text)
+            except ValueError:
+                raise ValueError(f"Invalid number for '{dict(rule_fields)[key]}': {text}")
+        return RetentionPolicy.from_dict(data)
+    
+    def preview():
+        try:
+            new_policy = read_policy()
+        except ValueError as e:
+            messagebox.showerror("Retention Policy", str(e), parent=win)
+            return None
+        sessions = monitor.all_sessions()
+        actions = plan(sessions, new_policy, monitor.active_session_ids(),
+                       project_of=monitor.session_project)
+        report.delete('1.0', 'end')
+        report.insert('1.0', format_report(actions, sessions, new_policy))
+        return new_policy
+    
+    def save():
+        new_policy = preview()
+        if new_policy is None:
+            return
+        monitor.settings['retention'] = new_policy.to_dict()
+        monitor.save_settings()
+        if new_policy.enabled:
+            monitor.retention_engine.request_pass()
+        win.destroy()
+    
+    buttons = tk.Frame(content, bg=monitor.colors['bg'])
+    buttons.pack(fill='x')
+    monitor.create_button(buttons, "🔍 Preview", preview).pack(side='left')
+    monitor.create_button(buttons, "💾 Save", save).pack(side='left', padx=6)
+    monitor.create_button(buttons, "Close", win.destroy).pack(side='right')
+    preview()
 
 def export_history_csv(monitor):
-    """Export history to CSV via dialog"""
+    """Export history to CSV/JSONL (optionally gzipped) via dialog"""
     try:
-        # Get all history data
         history = monitor.load_history()
-        analytics = monitor.load_analytics()
-        
-        # Flatten data for CSV
-        rows = []
-        for session_id, points in history.items():
-            proj_name = monitor.project_name_cache.get(session_id, "Unknown")
-            for p in points:
-                rows.append({
-                    'timestamp': datetime.fromtimestamp(p['ts']).strftime('%Y-%m-%d %H:%M:%S'),
-                    'session_id': session_id,
-                    'project': proj_name,
-                    'tokens': p['tokens'],
-                    'delta': p.get('delta', 0)
-                })
-        
-        if not rows:
+        if not any(history.values()):
             messagebox.showinfo("Export", "No history data to export.")
             return
-
-        # Sort by time
-        rows.sort(key=lambda x: x['timestamp'], reverse=True)
         
         # Save dialog
         filename = filedialog.asksaveasfilename(
             defaultextension=".csv",
-            filetypes=[("CSV Files", "*.csv")],
+            filetypes=[("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl"),
+                       ("Gzipped CSV", "*.csv.gz"), ("Gzipped JSON Lines", "*.jsonl.gz")],
             initialfile=f"context_history_{datetime.now().strftime('%Y%m%d')}.csv"
         )
         
         if filename:
-            with open(filename, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=['timestamp', 'session_id', 'project', 'tokens', 'delta'])
-                writer.writeheader()
-                writer.writerows(rows)
-            messagebox.showinfo("Export Successful", f"Saved {len(rows)} records to\n{filename}")
+            # Streamed newest-first straight to disk (no flattened copy in memory)
+            count = export_history(history, filename, project_of=monitor.project_name_cache.get)
+            messagebox.showinfo("Export Successful", f"Saved {count} records to\n{filename}")
             
     except Exception as e:
-        messagebox.showerror("Export Error", f"Failed to export CSV:\n{e}")
+        messagebox.showerror("Export Error", f"Failed to export history:\n{e}")
+
+
+# ==== SESSION PICKER ====
+
+def show_session_picker(monitor):
+    """Search every session by id, project or first message and switch to it"""
+    sessions = monitor.all_sessions()
+    by_id = {s.id: s for s in sessions}
+    current_id = monitor.current_session.id if monitor.current_session else None
+    state = {'results': [], 'version': -1, 'query': None, 'after': None}
+    
+    win = tk.Toplevel(monitor.root)
+    win.title("🔎 Switch Session")
+    win.geometry("520x560")
+    win.configure(bg=monitor.colors['bg'])
+    win.attributes('-topmost', True)
+    
+    content = tk.Frame(win, bg=monitor.colors['bg'], padx=12, pady=10)
+    content.pack(fill='both', expand=True)
+    
+    query_var = tk.StringVar()
+    entry = tk.Entry(content, textvariable=query_var, font=('Segoe UI', 11), bg=monitor.colors['bg3'],
+                    fg=monitor.colors['text'], insertbackground=monitor.colors['text'], relief='flat')
+    entry.pack(fill='x', ipady=4)
+    count_label = tk.Label(content, text="Indexing…", font=('Segoe UI', 8),
+                          bg=monitor.colors['bg'], fg=monitor.colors['muted'])
+    count_label.pack(anchor='w', pady=(4, 6))
+    
+    def row(index):
+        sid = state['results'][index]
+        s = by_id.get(sid)
+        project = monitor.session_project(s) if s else None
+        title = session_index.titles.get(sid) or sid
+        when = datetime.fromtimestamp(s.modified).strftime('%Y-%m-%d %H:%M') if s else ''
+        size = f"{s.size / 1024 / 1024:.1f} MB" if s else ''
+        check = "✓ " if sid == current_id else ""
+        color = monitor.colors['green'] if sid == current_id else monitor.colors['text']
+        return (f"{check}{title[:70]}", f"{project or 'Unknown project'} • {when} • {size} • {sid[:8]}", color)
+    
+    def choose(index):
+        sid = state['results'][index]
+        win.destroy()
+        monitor.switch_session(sid)
+    
+    listing = VirtualList(content, monitor.colors, row, choose)
+    listing.pack(fill='both', expand=True)
+    
+    def refresh():
+        """Re-run the query when it or the index changed (polled, so typing never blocks)"""
+        if not win.winfo_exists():
+            return
+        query = query_var.get()
+        if len(session_index) and (query != state['query'] or session_index.version != state['version']):
+            new_query = query != state['query']
+            state['query'], state['version'] = query, session_index.version
+            state['results'] = session_index.search(query)
+            listing.set_count(len(state['results']), reset=new_query)
+            count_label.config(text=f"{len(state['results']):,} of {len(session_index):,} sessions")
+        state['after'] = win.after(120, refresh)
+    
+    def build():
+        session_index.update(sessions, monitor.project_name_cache)
+        session_index.load_titles_async(sessions)
+    
+    threading.Thread(target=build, daemon=True).start()
+    
+    entry.bind('<Down>', lambda e: listing.move_selection(1))
+    entry.bind('<Up>', lambda e: listing.move_selection(-1))
+    entry.bind('<Next>', lambda e: listing.move_selection(listing.visible_rows))
+    entry.bind('<Prior>', lambda e: listing.move_selection(-listing.visible_rows))
+    entry.bind('<Return>', lambda e: listing.activate())
+    win.bind('<Escape>', lambda e: win.destroy())
+    entry.focus_set()
+    refresh()
@@ -0,0 +1,151 @@
+"""
+History Export
+Streaming export of token history to CSV or JSONL (optionally gzipped).
+
+Each session's points are already stored in time order, so instead of
+flattening everything into one list and sorting it, the per-session
+iterators are combined with a k-way `heapq.merge` and rows are written as
+they are produced. Memory use is one pending point per session regardless of
+how much history is exported.
+
+Usage:
+    python history_export.py out.csv
+    python history_export.py out.jsonl.gz --since 2025-01-01 --projects-file projects.json --project my-repo
+"""
+import argparse
+import csv
+import gzip
+import heapq
+import json
+import sys
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+FIELDS = ['timestamp', 'session_id', 'project', 'tokens', 'delta']
+FORMATS = ('csv', 'jsonl')
+UNKNOWN_PROJECT = "Unknown"
+
+
+def _ordered(points: List[dict], newest_first: bool) -> Iterable[dict]:
+    """Points in export order; only a session that is out of order gets sorted."""
+    if any(points[i]['ts'] > points[i + 1]['ts'] for i in range(len(points) - 1)):
+        points = sorted(points, key=lambda p: p['ts'])
+    return reversed(points) if newest_first else points
+
+
+def _session_rows(session_id, points, project, start, end, newest_first) -> Iterator[tuple]:
+    for p in _ordered(points, newest_first):
+        ts = p['ts']
+        if (start is not None and ts < start) or (end is not None and ts >= end):
+            continue
+        yield ts, session_id, project, p['tokens'], p.get('delta', 0)
+
+
+def iter_history_rows(history: Dict[str, List[dict]],
+                      project_of: Optional[Callable[[str], Optional[str]]] = None,
+                      start: Optional[float] = None, end: Optional[float] = None,
+                      projects: Optional[Iterable[str]] = None,
+                      newest_first=True) -> Iterator[tuple]:
+    """Merged (ts, session_id, project, tokens, delta) rows across all sessions."""
+    project_of = project_of or (lambda sid: None)
+    wanted = {p.lower() for p in projects} if projects else None
+    streams = []
+    for session_id, points in history.items():
+        if not points:
+            continue
+        project = project_of(session_id) or UNKNOWN_PROJECT
+        if wanted is not None and project.lower() not in wanted:
+            continue
+        streams.append(_session_rows(session_id, points, project, start, end, newest_first))
+    return heapq.merge(*streams, key=lambda row: row[0], reverse=newest_first)
+
+
+def _open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def detect_format(path) -> str:
+    name = str(path).lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def write_rows(rows: Iterable[tuple], f, fmt='csv') -> int:
+    """Write merged rows to an open text file; returns the row count."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+    for ts, session_id, project, tokens, delta in rows:
+        timestamp = datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S')
+        if fmt == 'csv':
+            writer.writerow((timestamp, session_id, project, tokens, delta))
+        else:
+            f.write(json.dumps({'timestamp': timestamp, 'ts': ts, 'session_id': session_id,
+                                'project': project, 'tokens': tokens, 'delta': delta}) + '\n')
+        count += 1
+    return count
+
+
+def export_history(history, path, fmt=None, compress=None, **filters) -> int:
+    """Stream `history` to `path`. Format and gzip follow the extension unless given."""
+    fmt = fmt or detect_format(path)
+    compress = str(path).lower().endswith('.gz') if compress is None else compress
+    with _open_output(path, compress) as f:
+        return write_rows(iter_history_rows(history, **filters), f, fmt)
+
+
+# ==== CLI ====
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date/time: {value}")
+
+
+def main(argv=None):
+    from data_service import data_service
+
+    parser = argparse.ArgumentParser(description="Export Context Monitor token history.")
+    parser.add_argument('output', help="Output file ('-' for stdout); .jsonl and .gz are detected")
+    parser.add_argument('--format', choices=FORMATS, help="Override the format implied by the extension")
+    parser.add_argument('--gzip', action='store_true', help="Compress the output")
+    parser.add_argument('--since', type=_parse_date, help="Only points at or after this time (ISO)")
+    parser.add_argument('--until', type=_parse_date, help="Only points before this time (ISO)")
+    parser.add_argument('--project', action='append', help="Only these projects (repeatable)")
+    parser.add_argument('--projects-file', help="JSON map of session id -> project name")
+    parser.add_argument('--history', help="History file to read (default: the monitor's)")
+    parser.add_argument('--oldest-first', action='store_true', help="Chronological order")
+    args = parser.parse_args(argv)
+    if args.project and not args.projects_file:
+        # History points don't record a project: without a map every row is "Unknown Project"
+        parser.error("--project needs --projects-file (history points don't store their project)")
+
+    project_map = {}
+    if args.projects_file:
+        with open(args.projects_file, 'r') as f:
+            project_map = json.load(f)
+    filters = {'project_of': project_map.get, 'start': args.since, 'end': args.until,
+               'projects': args.project, 'newest_first': not args.oldest_first}
+
+    if args.history:
+        with open(args.history, 'r') as f:
+            history = json.load(f)
+    else:
+        history = data_service.load_history()
+    if args.output == '-':
+        count = write_rows(iter_history_rows(history, **filters), sys.stdout, args.format or 'csv')
+    else:
+        count = export_history(history, args.output, args.format, args.gzip or None, **filters)
+    print(f"[Export] Wrote {count} records", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
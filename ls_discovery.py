@@ -0,0 +1,291 @@
+"""
+Language Server Discovery
+Finds the Antigravity language server (pid, listening port, CSRF token).
+
+Discovery runs on a background thread so the UI never waits on it. The last
+good connection info is persisted and, after a failure, re-validated cheaply
+(pid still alive + one probe) before falling back to a full rediscovery with
+exponential backoff.
+
+Platform backends:
+- Linux: reads /proc/*/cmdline and /proc/net/tcp{,6} directly (no subprocesses;
+  the procfs readers are shared with the process sampler)
+- Windows: wmic + netstat
+"""
+import ctypes
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from config import LS_DISCOVERY_FILE, DISCOVERY_BACKOFF_MIN, DISCOVERY_BACKOFF_MAX
+from procfs import PROC_ROOT, iter_pids, read_argv, read_stat, select_backend, socket_inodes
+
+
+@dataclass
+class ProcessInfo:
+    """Antigravity process connection info."""
+    extension_port: int
+    connect_port: int
+    csrf_token: str
+    pid: int = 0
+
+
+@dataclass
+class ServerCandidate:
+    """A language_server process whose command line carries connection args."""
+    pid: int
+    extension_port: int
+    csrf_token: str
+
+
+_EXT_PORT_RE = re.compile(r'--extension_server_port[\s=]+(\d+)')
+_CSRF_RE = re.compile(r'--csrf_token[\s=]+([a-fA-F0-9-]+)')
+
+
+def parse_server_args(cmdline: str):
+    """Return (extension_port, csrf_token) from a command line, or None."""
+    ext_port_match = _EXT_PORT_RE.search(cmdline)
+    csrf_match = _CSRF_RE.search(cmdline)
+    if ext_port_match and csrf_match:
+        return int(ext_port_match.group(1)), csrf_match.group(1)
+    return None
+
+
+# ==== PLATFORM BACKENDS ====
+
+class LinuxProcBackend:
+    """Subprocess-free discovery using procfs."""
+
+    TCP_LISTEN = '0A'
+
+    def __init__(self, proc_root=PROC_ROOT):
+        self.proc_root = Path(proc_root)
+
+    def find_candidates(self) -> List[ServerCandidate]:
+        candidates = []
+        for pid, proc_dir in iter_pids(self.proc_root):
+            try:
+                argv = read_argv(proc_dir)
+            except OSError:
+                continue  # Process exited or not ours
+            if not argv or b'language_server' not in os.path.basename(argv[0]):
+                continue
+            parsed = parse_server_args(b' '.join(argv).decode('utf-8', errors='ignore'))
+            if parsed:
+                candidates.append(ServerCandidate(pid, *parsed))
+        return candidates
+
+    def listening_ports(self, pid: int) -> List[int]:
+        inodes = socket_inodes(self.proc_root / str(pid))
+        if not inodes:
+            return []
+        ports = set()
+        for table in ('tcp', 'tcp6'):
+            try:
+                with open(self.proc_root / 'net' / table, 'r') as f:
+                    next(f, None)  # Header
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) < 10 or fields[3] != self.TCP_LISTEN:
+                            continue
+                        if fields[9] in inodes:
+                            ports.add(int(fields[1].rsplit(':', 1)[1], 16))
+            except OSError:
+                continue
+        return sorted(ports)
+
+    def pid_alive(self, pid: int) -> bool:
+        try:
+            return read_stat(self.proc_root / str(pid)).state not in ('Z', 'X')
+        except (OSError, ValueError, IndexError):
+            return False
+
+
+class WindowsBackend:
+    """wmic/netstat based discovery (the original detection path)."""
+
+    def find_candidates(self) -> List[ServerCandidate]:
+        cmd = 'wmic process where "name like \'%language_server%\'" get CommandLine,ProcessId /FORMAT:CSV'
+        result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=10)
+        candidates = []
+        for line in (result.stdout or '').splitlines():
+            if 'language_server' not in line.lower():
+                continue
+            parsed = parse_server_args(line)
+            pid_match = re.search(r',(\d+)$', line.strip())
+            if parsed:
+                candidates.append(ServerCandidate(int(pid_match.group(1)) if pid_match else 0, *parsed))
+        return candidates
+
+    def listening_ports(self, pid: int) -> List[int]:
+        cmd = f'netstat -ano | findstr ":{pid}" | findstr LISTENING'
+        result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=5)
+
+        ports = set()
+        for line in result.stdout.splitlines():
+            match = re.search(r':(\d+)\s+', line)
+            if match:
+                port = int(match.group(1))
+                if 10000 < port < 65535:  # Reasonable port range
+                    ports.add(port)
+
+        if not ports:
+            # Fallback: try netstat with PID at end
+            cmd = f'netstat -ano | findstr {pid}'
+            result = subprocess.run(cmd, capture_output=True, text=True, shell=True, timeout=5)
+            for line in result.stdout.splitlines():
+                if 'LISTENING' in line:
+                    match = re.search(r'127\.0\.0\.1:(\d+)', line)
+                    if match:
+                        ports.add(int(match.group(1)))
+        return sorted(ports)
+
+    def pid_alive(self, pid: int) -> bool:
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            return code.value == STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+
+
+def get_backend():
+    """Discovery backend for this platform (None if unsupported)."""
+    return select_backend(WindowsBackend, LinuxProcBackend)
+
+
+# ==== BACKGROUND SERVICE ====
+
+class LanguageServerDiscovery:
+    """Keeps a validated ProcessInfo available without blocking callers."""
+
+    def __init__(self, rediscover: Callable[[], Optional[ProcessInfo]],
+                 probe: Callable[[int, str], bool], backend=None, cache_file=LS_DISCOVERY_FILE):
+        self._rediscover = rediscover
+        self._probe = probe
+        self.backend = backend
+        self.cache_file = Path(cache_file) if cache_file else None
+
+        self._info: Optional[ProcessInfo] = self._load_cache()
+        self._last_known = self._info
+        self._suspect = False
+        self._backoff = DISCOVERY_BACKOFF_MIN
+        self._next_attempt = 0.0
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    # === PUBLIC API ===
+
+    def current(self) -> Optional[ProcessInfo]:
+        """Last known-good info (never blocks). Starts discovery if needed."""
+        with self._lock:
+            info = self._info if not self._suspect else None
+        if info is None:
+            self.request_refresh()
+        return info
+
+    @property
+    def last_known(self) -> Optional[ProcessInfo]:
+        """Most recent good info, even if currently suspect (used as a probe hint)."""
+        return self._last_known
+
+    def set(self, info: Optional[ProcessInfo], persist=False):
+        with self._lock:
+            self._info = info
+            self._suspect = False
+            if info:
+                self._last_known = info
+        if persist and info:
+            self._save_cache(info)
+
+    def report_failure(self):
+        """A request against the current info failed: re-validate in the background."""
+        with self._lock:
+            self._suspect = True
+        self.request_refresh()
+
+    def request_refresh(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="LSDiscovery", daemon=True)
+            self._thread.start()
+        self._wake.set()
+
+    # === WORKER ===
+
+    def _run(self):
+        while True:
+            wait = max(0.0, self._next_attempt - time.time())
+            self._wake.wait(timeout=wait if self._needs_work() else None)
+            self._wake.clear()
+            if not self._needs_work() or time.time() < self._next_attempt:
+                continue
+            self._discover_once()
+
+    def _needs_work(self):
+        with self._lock:
+            return self._info is None or self._suspect
+
+    def _discover_once(self):
+        with self._lock:
+            cached = self._info
+
+        info = cached if (cached and self._validate(cached)) else None
+        if info is None:
+            try:
+                info = self._rediscover()
+            except Exception as e:
+                print(f"[Discovery] Error: {e}")
+                info = None
+
+        if info:
+            self._backoff = DISCOVERY_BACKOFF_MIN
+            self._next_attempt = 0.0
+            self.set(info, persist=info is not cached)
+        else:
+            with self._lock:
+                self._info = None
+                self._suspect = False
+            self._next_attempt = time.time() + self._backoff
+            self._backoff = min(DISCOVERY_BACKOFF_MAX, self._backoff * 2)
+
+    def _validate(self, info: ProcessInfo) -> bool:
+        """Cheap check: process still alive and one probe answers."""
+        if info.pid and self.backend is not None:
+            try:
+                if not self.backend.pid_alive(info.pid):
+                    return False
+            except Exception:
+                pass  # Can't tell; let the probe decide
+        return self._probe(info.connect_port, info.csrf_token)
+
+    # === PERSISTENCE ===
+
+    def _load_cache(self) -> Optional[ProcessInfo]:
+        try:
+            if self.cache_file and self.cache_file.exists():
+                with open(self.cache_file, 'r') as f:
+                    return ProcessInfo(**json.load(f))
+        except Exception as e:
+            print(f"[Discovery] Ignoring cached server info: {e}")
+        return None
+
+    def _save_cache(self, info: ProcessInfo):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.cache_file, 'w') as f:
+                json.dump(asdict(info), f)
+        except Exception as e:
+            print(f"[Discovery] Could not persist server info: {e}")
@@ -0,0 +1,168 @@
+"""
+Memory Trend Tracker
+Bounded per-process memory time series with leak-trend detection.
+
+Every poll feeds the sampled processes into a ring buffer per (pid, type) plus
+one for the total. Each series keeps running sums so the least-squares slope
+(MB/s) over the window updates in O(1), and the fitted line is projected
+forward to estimate when proc_crit / total_crit will be reached.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import (MEMORY_TREND_SAMPLES, MEMORY_TREND_MIN_SAMPLES, MEMORY_TREND_MIN_SPAN,
+                    MEMORY_LEAK_HORIZON)
+
+TOTAL_KEY = ('total', 'Total')
+
+
+@dataclass
+class LeakAlert:
+    """A series projected to cross its critical limit within the horizon."""
+    key: Tuple[str, str]
+    label: str
+    current_mb: float
+    limit_mb: int
+    slope_mb_per_min: float
+    seconds_to_limit: int
+
+
+class MemorySeries:
+    """Ring buffer of (ts, mb) with an O(1) rolling linear regression."""
+
+    __slots__ = ('points', 'origin', '_n', '_st', '_sy', '_stt', '_sty')
+
+    def __init__(self, maxlen=MEMORY_TREND_SAMPLES):
+        self.points = deque(maxlen=maxlen)
+        self.origin = None  # Times are stored relative to this for precision
+        self._n = 0
+        self._st = self._sy = self._stt = self._sty = 0.0
+
+    def add(self, ts, mb):
+        if self.origin is None:
+            self.origin = ts
+        if self.points and ts <= self.points[-1][0]:
+            return  # Duplicate/out-of-order poll
+        if len(self.points) == self.points.maxlen:
+            self._accumulate(*self.points[0], sign=-1)
+        self.points.append((ts, mb))
+        self._accumulate(ts, mb, sign=1)
+
+    def _accumulate(self, ts, mb, sign):
+        t = ts - self.origin
+        self._n += sign
+        self._st += sign * t
+        self._sy += sign * mb
+        self._stt += sign * t * t
+        self._sty += sign * t * mb
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def span(self):
+        return self.points[-1][0] - self.points[0][0] if self.points else 0
+
+    @property
+    def latest(self):
+        return self.points[-1][1] if self.points else 0
+
+    def slope(self) -> Optional[float]:
+        """Least-squares slope in MB/second (None with fewer than 2 points)."""
+        n = self._n
+        if n < 2:
+            return None
+        denom = n * self._stt - self._st * self._st
+        if denom <= 1e-9:
+            return None
+        return (n * self._sty - self._st * self._sy) / denom
+
+    def fitted_latest(self) -> float:
+        """Regression value at the newest sample (less noisy than the raw reading)."""
+        slope = self.slope()
+        if slope is None:
+            return self.latest
+        intercept = (self._sy - slope * self._st) / self._n
+        return intercept + slope * (self.points[-1][0] - self.origin)
+
+    def time_to(self, limit_mb) -> Optional[float]:
+        """Projected seconds until the series reaches `limit_mb` (None if not rising)."""
+        slope = self.slope()
+        if slope is None or slope <= 0:
+            return None
+        current = max(self.latest, self.fitted_latest())
+        if current >= limit_mb:
+            return 0.0
+        return (limit_mb - current) / slope
+
+    def values(self, width=None) -> List[float]:
+        """MB values oldest first, downsampled (bucket max) to at most `width` points."""
+        vals = [mb for _, mb in self.points]
+        if not width or len(vals) <= width:
+            return vals
+        step = len(vals) / width
+        return [max(vals[int(i * step):max(int((i + 1) * step), int(i * step) + 1)])
+                for i in range(width)]
+
+
+class MemoryTrendTracker:
+    """Per-process and total memory series fed from process_sampler rows."""
+
+    def __init__(self, maxlen=MEMORY_TREND_SAMPLES, min_samples=MEMORY_TREND_MIN_SAMPLES,
+                 min_span=MEMORY_TREND_MIN_SPAN, horizon=MEMORY_LEAK_HORIZON):
+        self.maxlen = maxlen
+        self.min_samples = min_samples
+        self.min_span = min_span
+        self.horizon = horizon
+        self.series: Dict[Tuple[str, str], MemorySeries] = {}
+
+    def record(self, procs: Iterable[dict], now=None):
+        """Add one poll's worth of samples ({'Id', 'Type', 'Mem'} rows)."""
+        now = time.time() if now is None else now
+        seen = {TOTAL_KEY}
+        total = 0
+        for p in procs:
+            key = (str(p.get('Id')), p.get('Type', 'Process'))
+            seen.add(key)
+            total += p.get('Mem', 0)
+            self._series(key).add(now, p.get('Mem', 0))
+        self._series(TOTAL_KEY).add(now, total)
+
+        # Exited processes take their history with them
+        for key in [k for k in self.series if k not in seen]:
+            del self.series[key]
+
+    def _series(self, key) -> MemorySeries:
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = MemorySeries(self.maxlen)
+        return series
+
+    def trend(self, key) -> Optional[float]:
+        """Slope in MB/minute once the series is long enough to trust."""
+        series = self.series.get(key)
+        if not series or len(series) < self.min_samples or series.span < self.min_span:
+            return None
+        slope = series.slope()
+        return slope * 60 if slope is not None else None
+
+    def check(self, thresholds) -> List[LeakAlert]:
+        """Series projected to hit proc_crit/total_crit within the horizon, soonest first."""
+        alerts = []
+        for key, series in self.series.items():
+            limit = thresholds['total_crit'] if key == TOTAL_KEY else thresholds['proc_crit']
+            slope_per_min = self.trend(key)
+            if slope_per_min is None or slope_per_min <= 0:
+                continue
+            eta = series.time_to(limit)
+            if eta is not None and eta < self.horizon:
+                label = "All processes" if key == TOTAL_KEY else f"{key[1]} (pid {key[0]})"
+                alerts.append(LeakAlert(key, label, series.latest, limit,
+                                        slope_per_min, int(eta)))
+        return sorted(alerts, key=lambda a: a.seconds_to_limit)
+
+
+# Singleton instance
+memory_trend = MemoryTrendTracker()
@@ -30,6 +30,8 @@ def build_context_menu(monitor, event):
     
     maint_menu.add_command(label="  🧹  Clean Old Conversations", command=monitor.cleanup_old_conversations)
     maint_menu.add_command(label="  📦  Archive Old Sessions", command=monitor.archive_old_sessions)
+    maint_menu.add_command(label="  🗜️  Compact Archive Store", command=monitor.compact_archive_store)
+    maint_menu.add_command(label="  📋  Retention Policy...", command=monitor.show_retention_dialog)
     maint_menu.add_separator()
     maint_menu.add_command(label="  🔄  Restart Antigravity", command=monitor.restart_antigravity)
     
@@ -58,6 +60,24 @@ def build_context_menu(monitor, event):
     
     settings_menu.add_cascade(label="⏱️ Refresh Speed", menu=speed_menu)
 
+    # Parallel session tracking window
+    window_menu = tk.Menu(settings_menu, tearoff=0,
+                         bg=monitor.colors['bg2'], fg=monitor.colors['text'],
+                         activebackground=monitor.colors['blue'], activeforeground='white')
+
+    windows = [
+        ("Current session only", 0),
+        ("Active in last 5 min", 300),
+        ("Active in last 15 min (default)", 900),
+        ("Active in last hour", 3600),
+    ]
+
+    for label, seconds in windows:
+        check = "✓ " if monitor.session_tracker.window == seconds else "  "
+        window_menu.add_command(label=f"{check}{label}", command=partial(monitor.set_session_window, seconds))
+
+    settings_menu.add_cascade(label="🔀 Track Parallel Sessions", menu=window_menu)
+
 
     # Quota Tier
     quota_menu = tk.Menu(settings_menu, tearoff=0,
@@ -109,7 +129,7 @@ def build_context_menu(monitor, event):
                           bg=monitor.colors['bg2'], fg=monitor.colors['text'],
                           activebackground=monitor.colors['blue'], activeforeground='white')
     
-    current_id = monitor.current_session['id'] if monitor.current_session else None
+    current_id = monitor.current_session.id if monitor.current_session else None
     sessions = monitor.sessions_cache[:15]
     
     # Group by project
@@ -117,8 +137,8 @@ def build_context_menu(monitor, event):
     unknown_sessions = []
     
     for s in sessions:
-        if s['id'] in monitor.project_name_cache:
-            p_name = monitor.project_name_cache[s['id']]
+        if s.id in monitor.project_name_cache:
+            p_name = monitor.project_name_cache[s.id]
             if p_name not in known_projects: known_projects[p_name] = []
             known_projects[p_name].append(s)
         else:
@@ -132,10 +152,10 @@ def build_context_menu(monitor, event):
         
         for s in proj_sessions[:3]:
             if shown >= 10: break
-            check = "✓ " if s['id'] == current_id else "    "
-            mod_time = datetime.fromtimestamp(s['modified']).strftime("%H:%M")
+            check = "✓ " if s.id == current_id else "    "
+            mod_time = datetime.fromtimestamp(s.modified).strftime("%H:%M")
             sessions_menu.add_command(label=f"{check}{mod_time}", 
-                                    command=lambda sid=s['id']: monitor.switch_session(sid))
+                                    command=lambda sid=s.id: monitor.switch_session(sid))
             shown += 1
         sessions_menu.add_separator()
             
@@ -143,13 +163,16 @@ def build_context_menu(monitor, event):
         sessions_menu.add_command(label="📋 Other Sessions", state='disabled')
         for s in unknown_sessions[:5]:
             if shown >= 10: break
-            check = "✓ " if s['id'] == current_id else "    "
-            short_id = s['id'][:8]
-            mod_time = datetime.fromtimestamp(s['modified']).strftime("%H:%M")
+            check = "✓ " if s.id == current_id else "    "
+            short_id = s.id[:8]
+            mod_time = datetime.fromtimestamp(s.modified).strftime("%H:%M")
             sessions_menu.add_command(label=f"{check}{mod_time} • {short_id}…", 
-                                    command=lambda sid=s['id']: monitor.switch_session(sid))
+                                    command=lambda sid=s.id: monitor.switch_session(sid))
             shown += 1
         
+    sessions_menu.add_separator()
+    sessions_menu.add_command(label="🔎 Search All Sessions... (S)", command=monitor.show_session_picker)
+    
     menu.add_cascade(label="  🔀  Switch Session", menu=sessions_menu)
     menu.add_separator()
     
@@ -0,0 +1,110 @@
+"""
+Session Metadata Cache
+Bounded LRU of resolved per-session metadata (token estimate + project).
+
+Entries are `__slots__` records rather than nested dicts: a cached session
+costs a few hundred bytes instead of two dicts. The cache holds at most
+METADATA_CACHE_MAX sessions (least recently used are evicted) and is
+told explicitly by the directory scanner when a session disappears, so a
+long-running widget no longer keeps metadata for every session that ever
+existed.
+"""
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from config import METADATA_CACHE_MAX
+
+
+class SessionMeta:
+    """Resolved metadata for one session file version (mtime, size)."""
+    __slots__ = ('mtime', 'size', 'tokens_used', 'context_window', 'method', 'payload_bytes',
+                 'cost_ms_per_mb', 'file_project', 'project_name')
+
+    def __init__(self, mtime, size, token_data: dict, project_name=None):
+        self.mtime = mtime
+        self.size = size
+        self.tokens_used = token_data.get('tokens_used', 0)
+        self.context_window = token_data.get('context_window', 0)
+        self.method = token_data.get('method')
+        self.payload_bytes = token_data.get('payload_bytes')
+        self.cost_ms_per_mb = token_data.get('cost_ms_per_mb')
+        self.file_project = token_data.get('project_name')  # GitHub/<name> match in the file head
+        self.project_name = project_name
+
+    @property
+    def token_data(self) -> dict:
+        """The extract_pb_tokens-style dict consumers expect."""
+        return {
+            'tokens_used': self.tokens_used,
+            'context_window': self.context_window,
+            'tokens_remaining': self.context_window - self.tokens_used,
+            'project_name': self.file_project,
+            'method': self.method,
+            'payload_bytes': self.payload_bytes,
+            'cost_ms_per_mb': self.cost_ms_per_mb,
+        }
+
+    def matches(self, mtime, size) -> bool:
+        return self.mtime == mtime and self.size == size
+
+
+class MetadataCache:
+    """LRU of SessionMeta keyed by session id, with hit/miss/eviction counters."""
+
+    def __init__(self, max_entries=METADATA_CACHE_MAX):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, SessionMeta]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'invalidations': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, session_id):
+        return session_id in self._entries
+
+    def get(self, session_id, mtime, size) -> Optional[SessionMeta]:
+        """Entry for this exact file version (counts a hit or miss)."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if not entry.matches(mtime, size):
+                self.stats['stale'] += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.stats['hits'] += 1
+            return entry
+
+    def peek(self, session_id) -> Optional[SessionMeta]:
+        """Latest entry regardless of file version (no counters, no LRU bump)."""
+        return self._entries.get(session_id)
+
+    def put(self, session_id, entry: SessionMeta):
+        with self._lock:
+            self._entries[session_id] = entry
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, session_ids: Iterable[str]):
+        """Drop entries for sessions that were deleted, archived or renamed."""
+        with self._lock:
+            for sid in session_ids:
+                if self._entries.pop(sid, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def describe(self) -> str:
+        s = self.stats
+        lookups = s['hits'] + s['misses'] + s['stale']
+        rate = f"{s['hits'] / lookups:.0%}" if lookups else "—"
+        return (f"{len(self._entries)}/{self.max_entries} entries, {rate} hits "
+                f"({s['misses']} miss, {s['stale']} stale), {s['evictions']} evicted, "
+                f"{s['invalidations']} invalidated")
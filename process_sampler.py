@@ -0,0 +1,236 @@
+"""
+Process Sampler
+Subprocess-free memory/CPU sampling of Antigravity processes for diagnostics.
+
+Backends read OS process tables directly (procfs on Linux, via the readers
+shared with language server discovery; toolhelp/psapi via ctypes on Windows),
+so one pass costs microseconds instead of a process spawn.
+CPU% is derived from the change in user+system time between two samples, and
+each process is classified (renderer, extension host, language server...)
+from its command line, which is read once per process lifetime.
+"""
+import ctypes
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from procfs import PROC_ROOT, iter_pids, read_cmdline, read_rss_pages, read_stat, select_backend
+
+# (pid, start_time) identifies a process across pid reuse
+ProcKey = Tuple[int, int]
+
+
+def classify_process(cmdline: str) -> str:
+    """Map an Electron/language-server command line to a display type."""
+    lowered = cmdline.lower()
+    if 'language_server' in lowered:
+        return 'Language Server'
+    if '--type=' not in lowered:
+        return 'Main'
+    if '--type=renderer' in lowered:
+        return 'Renderer'
+    if '--type=extensionhost' in lowered or 'node.mojom.nodeservice' in lowered:
+        return 'Extension Host'
+    if '--type=gpu-process' in lowered:
+        return 'GPU'
+    if '--type=utility' in lowered:
+        return 'Utility'
+    if '--type=crashpad-handler' in lowered:
+        return 'Crashpad'
+    return 'Process'
+
+
+def _is_antigravity(exe_name: str) -> bool:
+    name = exe_name.lower()
+    return 'antigravity' in name or name.startswith('language_server')
+
+
+# ==== PLATFORM BACKENDS ====
+
+class LinuxSamplerBackend:
+    """Reads /proc/<pid>/{stat,statm,cmdline}."""
+
+    # Unrelated pids are skipped between full rescans (catches pid reuse)
+    FULL_RESCAN_EVERY = 10
+
+    def __init__(self, proc_root=PROC_ROOT, clk_tck=None, page_size=None):
+        self.proc_root = proc_root
+        self.clk_tck = clk_tck or os.sysconf('SC_CLK_TCK')
+        self.page_size = page_size or os.sysconf('SC_PAGE_SIZE')
+        self._ignored = set()
+        self._passes = 0
+
+    def list_processes(self) -> List[Tuple[ProcKey, float, int]]:
+        """Return [((pid, start), cpu_seconds, rss_bytes), ...] for matching processes."""
+        self._passes += 1
+        if self._passes % self.FULL_RESCAN_EVERY == 0:
+            self._ignored.clear()
+        out = []
+        for pid, proc_dir in iter_pids(self.proc_root, skip=self._ignored):
+            try:
+                stat = read_stat(proc_dir)
+                if not _is_antigravity(stat.comm):
+                    self._ignored.add(pid)
+                    continue
+                cpu_ticks, start = stat.cpu_ticks, stat.start
+                rss_pages = read_rss_pages(proc_dir)
+            except (OSError, ValueError, IndexError):
+                continue  # Exited mid-read or not ours
+            out.append(((pid, start), cpu_ticks / self.clk_tck, rss_pages * self.page_size))
+        return out
+
+    def cmdline(self, pid: int) -> str:
+        return read_cmdline(os.path.join(self.proc_root, str(pid)))
+
+
+class WindowsSamplerBackend:
+    """Toolhelp snapshot + GetProcessTimes/GetProcessMemoryInfo via ctypes."""
+
+    TH32CS_SNAPPROCESS = 0x2
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    ProcessCommandLineInformation = 60
+    STATUS_INFO_LENGTH_MISMATCH = 0xC0000004
+
+    def __init__(self):
+        from ctypes import wintypes
+
+        class PROCESSENTRY32W(ctypes.Structure):
+            _fields_ = [('dwSize', wintypes.DWORD), ('cntUsage', wintypes.DWORD),
+                        ('th32ProcessID', wintypes.DWORD), ('th32DefaultHeapID', ctypes.c_void_p),
+                        ('th32ModuleID', wintypes.DWORD), ('cntThreads', wintypes.DWORD),
+                        ('th32ParentProcessID', wintypes.DWORD), ('pcPriClassBase', ctypes.c_long),
+                        ('dwFlags', wintypes.DWORD), ('szExeFile', ctypes.c_wchar * 260)]
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        self._entry_type = PROCESSENTRY32W
+        self._mem_type = PROCESS_MEMORY_COUNTERS
+        self._kernel32 = ctypes.windll.kernel32
+        self._psapi = ctypes.windll.psapi
+        self._ntdll = ctypes.windll.ntdll
+        self._kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+        self._kernel32.OpenProcess.restype = wintypes.HANDLE
+
+    def list_processes(self) -> List[Tuple[ProcKey, float, int]]:
+        k32 = self._kernel32
+        snapshot = k32.CreateToolhelp32Snapshot(self.TH32CS_SNAPPROCESS, 0)
+        if not snapshot or snapshot == ctypes.c_void_p(-1).value:
+            return []
+        out = []
+        try:
+            entry = self._entry_type()
+            entry.dwSize = ctypes.sizeof(entry)
+            ok = k32.Process32FirstW(snapshot, ctypes.byref(entry))
+            while ok:
+                if _is_antigravity(entry.szExeFile):
+                    sample = self._read(entry.th32ProcessID)
+                    if sample:
+                        out.append(sample)
+                ok = k32.Process32NextW(snapshot, ctypes.byref(entry))
+        finally:
+            k32.CloseHandle(snapshot)
+        return out
+
+    def _read(self, pid):
+        handle = self._kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            creation, exit_, kernel, user = (ctypes.c_ulonglong() for _ in range(4))
+            if not self._kernel32.GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exit_),
+                                                  ctypes.byref(kernel), ctypes.byref(user)):
+                return None
+            counters = self._mem_type()
+            counters.cb = ctypes.sizeof(counters)
+            self._psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+            # FILETIME units are 100ns
+            cpu_seconds = (kernel.value + user.value) / 10_000_000
+            return (pid, creation.value), cpu_seconds, counters.WorkingSetSize
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+    def cmdline(self, pid: int) -> str:
+        """Command line via NtQueryInformationProcess (Windows 8.1+)."""
+        handle = self._kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return ''
+        try:
+            size = ctypes.c_ulong(4096)
+            for _ in range(3):
+                buf = ctypes.create_string_buffer(size.value)
+                status = self._ntdll.NtQueryInformationProcess(
+                    handle, self.ProcessCommandLineInformation, buf, size, ctypes.byref(size))
+                if status & 0xFFFFFFFF != self.STATUS_INFO_LENGTH_MISMATCH:
+                    break
+            if status != 0:
+                return ''
+            # Buffer starts with a UNICODE_STRING {USHORT Length; USHORT Max; PWSTR Buffer}
+            length = ctypes.c_ushort.from_buffer(buf).value
+            ptr = ctypes.c_void_p.from_buffer(buf, ctypes.sizeof(ctypes.c_void_p)).value
+            return ctypes.wstring_at(ptr, length // 2) if ptr else ''
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+
+def get_backend():
+    """Sampler backend for this platform (None if unsupported)."""
+    return select_backend(WindowsSamplerBackend, LinuxSamplerBackend)
+
+
+# ==== SAMPLER ====
+
+class ProcessSampler:
+    """Samples Antigravity processes; CPU% is the delta since the previous sample."""
+
+    def __init__(self, backend=None, cpu_count=None):
+        self.backend = backend
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self._prev: Dict[ProcKey, Tuple[float, float]] = {}  # key -> (cpu_seconds, wall)
+        self._types: Dict[ProcKey, str] = {}
+
+    def sample(self, now: Optional[float] = None) -> List[dict]:
+        """One pass over the process table: [{'Id', 'Type', 'Mem', 'CPU'}, ...] by memory."""
+        if self.backend is None:
+            return []
+        now = time.monotonic() if now is None else now
+        try:
+            rows = self.backend.list_processes()
+        except Exception as e:
+            print(f"[ProcessSampler] Error sampling processes: {e}")
+            return []
+
+        data, seen = [], {}
+        for key, cpu_seconds, rss_bytes in rows:
+            prev = self._prev.get(key)
+            cpu = 0.0
+            if prev and now > prev[1]:
+                # Task Manager style: percent of total machine capacity
+                cpu = max(0.0, (cpu_seconds - prev[0]) / (now - prev[1]) * 100 / self.cpu_count)
+            seen[key] = (cpu_seconds, now)
+
+            ptype = self._types.get(key)
+            if ptype is None:
+                ptype = self._types[key] = classify_process(self.backend.cmdline(key[0]))
+
+            data.append({
+                'Id': str(key[0]),
+                'Type': ptype,
+                'Mem': rss_bytes // (1024 * 1024),
+                'CPU': round(cpu, 1)
+            })
+
+        # Forget exited processes
+        self._prev = seen
+        self._types = {k: v for k, v in self._types.items() if k in seen}
+        data.sort(key=lambda p: p['Mem'], reverse=True)
+        return data
+
+
+# Singleton instance
+process_sampler = ProcessSampler(get_backend())
@@ -0,0 +1,98 @@
+"""
+Procfs Helpers
+Shared /proc readers for the process sampler and language server discovery.
+
+Both read the Linux process table directly instead of spawning ps/netstat;
+the parsing lives here once so the two backends can't drift apart. Readers
+raise OSError (process exited) or ValueError/IndexError (unexpected format)
+for the caller to skip that process.
+"""
+import os
+import platform
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+PROC_ROOT = '/proc'
+
+
+class ProcStat:
+    """/proc/<pid>/stat; numeric fields are only converted when read."""
+    __slots__ = ('comm', 'fields')
+
+    def __init__(self, data: bytes):
+        # comm is parenthesized and may contain spaces or ')'
+        lpar, rpar = data.index(b'('), data.rindex(b')')
+        self.comm = data[lpar + 1:rpar].decode('utf-8', 'ignore')
+        self.fields = data[rpar + 2:].split()  # fields[0] is stat field 3 (state)
+
+    @property
+    def state(self) -> str:
+        return self.fields[0].decode()
+
+    @property
+    def cpu_ticks(self) -> int:
+        """utime + stime (fields 14 and 15), in clock ticks."""
+        return int(self.fields[11]) + int(self.fields[12])
+
+    @property
+    def start(self) -> int:
+        """starttime (field 22): with the pid, identifies a process across pid reuse."""
+        return int(self.fields[19])
+
+
+def iter_pids(proc_root=PROC_ROOT, skip=()) -> Iterator[Tuple[int, str]]:
+    """(pid, /proc/<pid> path) for every process, except pids in `skip`."""
+    for entry in os.scandir(proc_root):
+        if entry.name.isdigit():
+            pid = int(entry.name)
+            if pid not in skip:
+                yield pid, entry.path
+
+
+def read_stat(proc_dir) -> ProcStat:
+    with open(os.path.join(proc_dir, 'stat'), 'rb') as f:
+        return ProcStat(f.read())
+
+
+def read_rss_pages(proc_dir) -> int:
+    """Resident set size in pages (second field of statm)."""
+    with open(os.path.join(proc_dir, 'statm'), 'rb') as f:
+        return int(f.read().split()[1])
+
+
+def read_argv(proc_dir) -> List[bytes]:
+    with open(os.path.join(proc_dir, 'cmdline'), 'rb') as f:
+        return f.read().split(b'\0')
+
+
+def read_cmdline(proc_dir) -> str:
+    """Command line as one space-separated string ('' if unreadable)."""
+    try:
+        return b' '.join(read_argv(proc_dir)).decode('utf-8', 'ignore').strip()
+    except OSError:
+        return ''
+
+
+def socket_inodes(proc_dir) -> Set[str]:
+    """Inodes of the sockets a process holds open (from its fd symlinks)."""
+    inodes = set()
+    try:
+        for fd in os.scandir(os.path.join(proc_dir, 'fd')):
+            try:
+                target = os.readlink(fd.path)
+            except OSError:
+                continue
+            if target.startswith('socket:['):
+                inodes.add(target[8:-1])
+    except OSError:
+        pass
+    return inodes
+
+
+def select_backend(windows: Callable[[], object], linux: Callable[[], object]) -> Optional[object]:
+    """Backend for this platform: `windows()`, `linux()` where /proc exists, else None."""
+    system = platform.system()
+    if system == "Windows":
+        return windows()
+    if system == "Linux" and os.path.isdir(PROC_ROOT):
+        return linux()
+    return None
@@ -0,0 +1,164 @@
+"""
+Project Resolver
+Cached session -> project attribution with a record of how it was decided.
+
+Strategies, strongest first:
+- session_path:   the session id itself contains a folder (legacy ids)
+- file_content:   the project whose workspace paths the conversation file
+                  mentions most (workspace_index), or GitHub/<project>
+- vscode_window:  the foreground VS Code / Antigravity window title
+- recent_folder:  the most recently modified folder under the GitHub dir
+
+A session-path attribution never changes; a file-content one is kept until
+the metadata scan reports a different project. Window and folder attributions
+are re-checked at most every VSCODE_CACHE_TTL seconds. The folder scan (one
+stat per project directory) is reused until the GitHub dir's mtime changes, with PROJECT_SCAN_TTL as a
+backstop because edits inside a project don't touch the parent's mtime.
+A warm lookup is a dict hit. At most METADATA_CACHE_MAX sessions are kept
+(least recently used are evicted).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from config import GITHUB_DIR, VSCODE_CACHE_TTL, PROJECT_SCAN_TTL, METADATA_CACHE_MAX
+from utils import get_active_vscode_project, get_recently_modified_project
+
+UNKNOWN_PROJECT = "Unknown Project"
+
+SOURCE_LABELS = {
+    'session_path': "session path",
+    'file_content': "conversation file",
+    'vscode_window': "active window",
+    'recent_folder': "recently modified folder",
+    'unknown': "no match",
+}
+
+
+@dataclass
+class Attribution:
+    """How a session's project was decided."""
+    project: str
+    source: str  # key of SOURCE_LABELS
+    resolved_at: float
+    skip_vscode: bool = False
+
+    def describe(self):
+        return f"{self.project} (via {SOURCE_LABELS.get(self.source, self.source)})"
+
+
+class ProjectResolver:
+    """Per-session project cache; `names` doubles as the monitor's project_name_cache."""
+
+    def __init__(self, github_path=GITHUB_DIR,
+                 window_fn: Callable[[], Optional[str]] = get_active_vscode_project,
+                 scan_fn: Callable[[Path], Optional[str]] = get_recently_modified_project,
+                 clock: Callable[[], float] = time.time, max_entries=METADATA_CACHE_MAX):
+        self.github_path = Path(github_path) if github_path else None
+        self.window_fn = window_fn
+        self.scan_fn = scan_fn
+        self.clock = clock
+        self.max_entries = max_entries
+        self.attributions: "OrderedDict[str, Attribution]" = OrderedDict()  # LRU order
+        self.names: Dict[str, str] = {}
+        self.timestamps: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._window = (None, float('-inf'))  # (title project, checked at)
+        self._scan = (None, None, float('-inf'))  # (project, parent mtime, scanned at)
+        self.stats = {'hits': 0, 'window_checks': 0, 'folder_scans': 0, 'evictions': 0}
+
+    def resolve(self, session_id, skip_vscode=False, content_hint=None) -> str:
+        return self.attribute(session_id, skip_vscode, content_hint).project
+
+    def attribute(self, session_id, skip_vscode=False, content_hint=None) -> Attribution:
+        now = self.clock()
+        with self._lock:
+            cached = self.attributions.get(session_id)
+            if cached and self._still_valid(cached, skip_vscode, content_hint, now):
+                self.stats['hits'] += 1
+                self.attributions.move_to_end(session_id)
+                return cached
+            attribution = self._decide(session_id, skip_vscode, content_hint, now)
+            if not cached or (cached.project, cached.source) != (attribution.project, attribution.source):
+                print(f"[Project] {session_id[:8]}: {attribution.describe()}")
+            self.attributions[session_id] = attribution
+            self.attributions.move_to_end(session_id)
+            self.names[session_id] = attribution.project
+            self.timestamps[session_id] = now
+            while len(self.attributions) > self.max_entries:
+                evicted, _ = self.attributions.popitem(last=False)
+                self.names.pop(evicted, None)
+                self.timestamps.pop(evicted, None)
+                self.stats['evictions'] += 1
+            return attribution
+
+    def explain(self, session_id) -> Optional[Attribution]:
+        return self.attributions.get(session_id)
+
+    def invalidate(self, session_id=None):
+        """Forget one session's attribution (or all, plus the window/folder caches)."""
+        with self._lock:
+            if session_id is None:
+                self.attributions.clear()
+                self.names.clear()
+                self.timestamps.clear()
+                self._window = (None, float('-inf'))
+                self._scan = (None, None, float('-inf'))
+                return
+            self.attributions.pop(session_id, None)
+            self.names.pop(session_id, None)
+            self.timestamps.pop(session_id, None)
+
+    def _still_valid(self, cached, skip_vscode, content_hint, now):
+        if cached.source == 'session_path':
+            return True
+        if cached.source == 'file_content':
+            return not content_hint or content_hint == cached.project  # Content scores can shift as a session grows
+        if content_hint:
+            return False  # A file-content match now outranks the weaker guess
+        if cached.skip_vscode != skip_vscode:
+            return False
+        return now - cached.resolved_at < VSCODE_CACHE_TTL
+
+    def _decide(self, session_id, skip_vscode, content_hint, now) -> Attribution:
+        if '\\' in session_id or '/' in session_id:
+            return Attribution(Path(session_id).parent.name, 'session_path', now, skip_vscode)
+        if content_hint:
+            return Attribution(content_hint, 'file_content', now, skip_vscode)
+        if not skip_vscode:
+            project = self._window_project(now)
+            if project:
+                return Attribution(project, 'vscode_window', now, skip_vscode)
+        project = self._recent_folder(now)
+        if project:
+            return Attribution(project, 'recent_folder', now, skip_vscode)
+        return Attribution(UNKNOWN_PROJECT, 'unknown', now, skip_vscode)
+
+    def _window_project(self, now):
+        project, checked = self._window
+        if now - checked >= VSCODE_CACHE_TTL:
+            self.stats['window_checks'] += 1
+            project = self.window_fn()
+            self._window = (project, now)
+        return project
+
+    def _recent_folder(self, now):
+        if not self.github_path:
+            return None
+        try:
+            mtime = os.stat(self.github_path).st_mtime
+        except OSError:
+            return None
+        project, scanned_mtime, scanned_at = self._scan
+        if mtime != scanned_mtime or now - scanned_at >= PROJECT_SCAN_TTL:
+            self.stats['folder_scans'] += 1
+            project = self.scan_fn(self.github_path)
+            self._scan = (project, mtime, now)
+        return project
+
+
+project_resolver = ProjectResolver()
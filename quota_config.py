@@ -33,9 +33,22 @@ USAGE_COSTS = {
     "standard": 1,
     "agentic": 5
 }
+QUOTA_SAVE_THROTTLE = 30  # seconds - debounce quota_state.json rewrites
+
+# === API QUOTA CACHE ===
+QUOTA_API_TTL = 60  # seconds - snapshot age before a background refresh starts
+QUOTA_REFRESH_JITTER = 0.1  # +/- fraction of the TTL so refreshes don't align
+QUOTA_ERROR_BACKOFF_MIN = 5  # seconds - retry delay after a failed refresh
+QUOTA_ERROR_BACKOFF_MAX = 300
 
 # === AGENT LOGGING CONFIG ===
 AUDIT_LOG_FILE = Path.home() / '.gemini' / 'antigravity' / 'audit_log.jsonl'
+AUDIT_FLUSH_EVERY = 64  # records - flush when this many are buffered
+AUDIT_FLUSH_INTERVAL_MS = 500  # ms - max time a record waits in the buffer
+AUDIT_FSYNC = False  # fsync after every batch (slower, survives power loss)
+AUDIT_ROTATE_MAX_BYTES = 32 * 1024 * 1024  # rotate when the active log exceeds this
+AUDIT_ROTATE_DAILY = True  # also rotate at the first write of a new day
+AUDIT_HISTOGRAM_BUCKET = 3600  # seconds - granularity of the indexed action histogram
 
 ACTION_TYPES = [
     "model_inference",
@@ -5,11 +5,15 @@ Now integrates with Antigravity API for real quota data.
 """
 import time
 import json
-from collections import deque
+import atexit
+import random
+import threading
 from pathlib import Path
 from typing import Optional, Dict, Any, List
-from quota_config import TIERS, DEFAULT_TIER, USAGE_COSTS
+from quota_config import (TIERS, DEFAULT_TIER, USAGE_COSTS, QUOTA_SAVE_THROTTLE, QUOTA_API_TTL,
+                          QUOTA_REFRESH_JITTER, QUOTA_ERROR_BACKOFF_MIN, QUOTA_ERROR_BACKOFF_MAX)
 from quota_tracker import emit_usage_log, tracked_action, emit_task_summary
+from usage_window import UsageWindow
 
 QUOTA_FILE = Path.home() / '.gemini' / 'antigravity' / 'quota_state.json'
 
@@ -25,21 +29,33 @@ except ImportError:
 class QuotaManager:
     def __init__(self):
         self.tier_id = DEFAULT_TIER
-        self.usage_history = deque() # List of timestamps [t1, t2, ...]
+        self.usage_history = UsageWindow() # Run-length buckets [(ts, count), ...]
         self.flow_credits_used = 0
         self.last_flow_reset = time.time()
         
-        # API-based quota cache
+        # Debounced persistence (avoid rewriting state on every add_usage)
+        self._state_dirty = False
+        self._last_state_save = 0
+        
+        # API-based quota cache (stale-while-revalidate, refreshed in the background)
         self._api_cache: Optional[QuotaSnapshot] = None
         self._api_cache_time = 0
-        self._api_cache_ttl = 60  # Cache for 60 seconds
+        self._api_cache_ttl = QUOTA_API_TTL
+        self._api_stale = False  # Set by add_usage: serve, but refresh soon
+        self._usage_generation = 0  # Bumped by add_usage; a fetch only clears stale if unchanged since it began
+        self._api_refresh_due = 0  # Jittered expiry of the current snapshot
+        self._api_retry_at = 0  # Error backoff
+        self._api_backoff = QUOTA_ERROR_BACKOFF_MIN
+        self._api_refreshing = False
+        self._api_lock = threading.Lock()
         
         self.load_state()
+        atexit.register(self.flush_state)
 
     def set_tier(self, tier_id):
         if tier_id in TIERS:
             self.tier_id = tier_id
-            self.save_state()
+            self.save_state(force=True)
 
     def get_config(self):
         return TIERS.get(self.tier_id, TIERS[DEFAULT_TIER])
@@ -53,10 +69,10 @@ class QuotaManager:
         """
         cost = manual_count if manual_count is not None else USAGE_COSTS.get(usage_type, 1)
         
-        # 1. Update Legacy Rolling Window
+        # 1. Update Rolling Window (one bucket per call, not one entry per unit)
         now = time.time()
-        for _ in range(cost):
-            self.usage_history.append(now)
+        self.usage_history.append(now, cost)
+        self.usage_history.prune(now, self.get_config()['window_seconds'])
         
         # 2. Emit Structured Agent Log (if meta provided)
         if agent_meta:
@@ -71,8 +87,10 @@ class QuotaManager:
                 artifacts_produced=agent_meta.get('artifacts_produced', 0)
             )
         
-        # 3. Invalidate API cache (force refresh on next get_status)
-        self._api_cache = None
+        # 3. Mark API cache stale (keeps serving it while a refresh runs)
+        with self._api_lock:
+            self._usage_generation += 1
+            self._api_stale = True
             
         self.save_state()
 
@@ -96,30 +114,56 @@ class QuotaManager:
             self.last_flow_reset = now
 
     def get_api_quota(self, force_refresh=False) -> Optional[QuotaSnapshot]:
-        """Fetch quota from Antigravity API with caching."""
+        """Return the cached API snapshot immediately; refresh it in the background if stale."""
         if not HAS_API:
             return None
         
         now = time.time()
-        
-        # Check cache
-        if not force_refresh and self._api_cache and (now - self._api_cache_time) < self._api_cache_ttl:
-            return self._api_cache
-        
-        # Fetch from API
+        if force_refresh or self._api_stale or now >= self._api_refresh_due:
+            self._start_api_refresh(now)
+        return self._api_cache
+    
+    @property
+    def api_data_age(self) -> Optional[float]:
+        """Seconds since the cached snapshot was fetched (None if never)."""
+        return time.time() - self._api_cache_time if self._api_cache else None
+    
+    def _start_api_refresh(self, now):
+        """Start a single in-flight refresh (respects error backoff)."""
+        with self._api_lock:
+            if self._api_refreshing or now < self._api_retry_at:
+                return
+            self._api_refreshing = True
+            generation = self._usage_generation
+        threading.Thread(target=self._refresh_api, args=(generation,), name="QuotaRefresh", daemon=True).start()
+    
+    def _refresh_api(self, generation):
         try:
             snapshot = antigravity_api.fetch_quota()
+        except Exception as e:
+            print(f"[QuotaManager] API fetch error: {e}")
+            snapshot = None
+        
+        now = time.time()
+        with self._api_lock:
             if snapshot:
                 self._api_cache = snapshot
                 self._api_cache_time = now
-            return snapshot
-        except Exception as e:
-            print(f"[QuotaManager] API fetch error: {e}")
-            return self._api_cache  # Return stale cache if available
+                # Usage added while the fetch ran may not be in this snapshot
+                self._api_stale = self._usage_generation != generation
+                jitter = random.uniform(-QUOTA_REFRESH_JITTER, QUOTA_REFRESH_JITTER)
+                self._api_refresh_due = now + self._api_cache_ttl * (1 + jitter)
+                self._api_backoff = QUOTA_ERROR_BACKOFF_MIN
+                self._api_retry_at = 0
+            else:
+                # Keep serving the old snapshot; try again later
+                self._api_retry_at = now + self._api_backoff * random.uniform(1.0, 1.5)
+                self._api_backoff = min(QUOTA_ERROR_BACKOFF_MAX, self._api_backoff * 2)
+            self._api_refreshing = False
     
-    def get_model_quotas(self) -> List[Dict[str, Any]]:
+    def get_model_quotas(self, snapshot=None) -> List[Dict[str, Any]]:
         """Get quota info for all models."""
-        snapshot = self.get_api_quota()
+        snapshot = snapshot or self.get_api_quota()
         if not snapshot:
             return []
         
@@ -134,9 +178,9 @@ class QuotaManager:
             for m in snapshot.models
         ]
     
-    def get_prompt_credits(self) -> Optional[Dict[str, Any]]:
+    def get_prompt_credits(self, snapshot=None) -> Optional[Dict[str, Any]]:
         """Get prompt credits info."""
-        snapshot = self.get_api_quota()
+        snapshot = snapshot or self.get_api_quota()
         if not snapshot or not snapshot.prompt_credits:
             return None
         
@@ -149,8 +193,8 @@ class QuotaManager:
         }
 
     def get_status(self):
-        """Calculate quota status - now uses API when available."""
-        # Try API first
+        """Calculate quota status - now uses API when available. Never blocks on the API."""
+        # Try API first (cached snapshot; refresh happens in the background)
         api_snapshot = self.get_api_quota()
         
         if api_snapshot and api_snapshot.models:
@@ -162,8 +206,6 @@ class QuotaManager:
                     primary = m
                     break
             
-            prompt_credits = api_snapshot.prompt_credits
-            
             return {
                 "tier": "API",
                 "source": "antigravity_api",
@@ -175,8 +217,10 @@ class QuotaManager:
                 "next_reset_formatted": primary.time_until_reset_formatted,
                 "primary_model": primary.label,
                 "is_exhausted": primary.is_exhausted,
-                "all_models": self.get_model_quotas(),
-                "prompt_credits": self.get_prompt_credits(),
+                "all_models": self.get_model_quotas(api_snapshot),
+                "prompt_credits": self.get_prompt_credits(api_snapshot),
+                "data_age_seconds": int(time.time() - self._api_cache_time),
+                "is_stale": self._api_stale or time.time() >= self._api_refresh_due,
                 # Legacy fields
                 "flow_used": self.flow_credits_used,
                 "flow_limit": 500,
@@ -190,17 +234,13 @@ class QuotaManager:
         capacity = config['limit']
         
         # 1. Prune old history
-        while self.usage_history and (now - self.usage_history[0] > window):
-            self.usage_history.popleft()
+        self.usage_history.prune(now, window)
             
-        used = len(self.usage_history)
+        used = self.usage_history.used
         remaining = max(0, capacity - used)
         
         # 2. Calculate time to next recovery
-        recover_in = 0
-        if used >= capacity and self.usage_history:
-            oldest = self.usage_history[0]
-            recover_in = max(0, (oldest + window) - now)
+        recover_in = self.usage_history.time_to_recover(now, window, capacity)
             
         # 3. Flow/Whisk Status
         flow_limit = config['ancillary_limit']
@@ -216,20 +256,36 @@ class QuotaManager:
             "next_reset_seconds": recover_in,
             "flow_used": self.flow_credits_used,
             "flow_limit": flow_limit,
-            "flow_remaining": flow_remaining
+            "flow_remaining": flow_remaining,
+            "data_age_seconds": 0,  # Computed locally, always current
+            "is_stale": False
         }
 
-    def save_state(self):
+    def save_state(self, force=False):
+        """Mark state dirty and write it at most once per QUOTA_SAVE_THROTTLE."""
+        self._state_dirty = True
+        now = time.time()
+        if force or now - self._last_state_save >= QUOTA_SAVE_THROTTLE:
+            self.flush_state()
+            self._last_state_save = now
+
+    def flush_state(self):
+        """Write pending state to disk (also called at exit)."""
+        if not self._state_dirty:
+            return
         try:
             QUOTA_FILE.parent.mkdir(parents=True, exist_ok=True)
             data = {
                 "tier_id": self.tier_id,
-                "usage_history": list(self.usage_history),
+                "usage_buckets": self.usage_history.buckets(),
                 "flow_credits_used": self.flow_credits_used,
                 "last_flow_reset": self.last_flow_reset
             }
-            with open(QUOTA_FILE, 'w') as f:
+            tmp_file = QUOTA_FILE.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
                 json.dump(data, f)
+            tmp_file.replace(QUOTA_FILE)
+            self._state_dirty = False
         except Exception as e:
             print(f"Error saving quota state: {e}")
 
@@ -239,7 +295,12 @@ class QuotaManager:
                 with open(QUOTA_FILE, 'r') as f:
                     data = json.load(f)
                     self.tier_id = data.get("tier_id", DEFAULT_TIER)
-                    self.usage_history = deque(data.get("usage_history", []))
+                    if "usage_buckets" in data:
+                        self.usage_history = UsageWindow(data["usage_buckets"])
+                    else:
+                        # Legacy format: one timestamp per unit
+                        self.usage_history = UsageWindow()
+                        self.usage_history.extend(data.get("usage_history", []))
                     self.flow_credits_used = data.get("flow_credits_used", 0)
                     self.last_flow_reset = data.get("last_flow_reset", time.time())
         except Exception as e:
@@ -3,10 +3,10 @@ Quota Tracker
 Implements the mandatory structured usage logging for Antigravity Agents.
 """
 from datetime import datetime, timezone
-import json
-from pathlib import Path
 from typing import Optional, Dict, Any, Callable
-from quota_config import AUDIT_LOG_FILE, ACTION_TYPES
+from quota_config import ACTION_TYPES
+from audit_writer import audit_writer
+from audit_query import audit_index
 
 def emit_usage_log(
     agent_id: str,
@@ -38,16 +38,8 @@ def emit_usage_log(
     }
 
     try:
-        # Ensure directory exists
-        AUDIT_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Append to JSONL file
-        with open(AUDIT_LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(log_entry) + '\n')
-            
-        # Optional: Print to stdout for immediate visibility
-        # print(json.dumps(log_entry, indent=2))
-        
+        # Buffered append; the background writer batches the disk I/O
+        audit_writer.write(log_entry)
     except Exception as e:
         print(f"CRITICAL: Failed to write usage log: {e}")
 
@@ -74,24 +66,41 @@ def tracked_action(action_fn: Callable, *, usage_meta: Dict[str, Any]):
         return result
         
     except Exception as e:
-        # If failure, log it
+        # If failure, log it and make sure it reaches disk before we propagate
         emit_usage_log(
             success=False,
             **usage_meta
         )
+        audit_writer.flush()
         raise e
 
 def emit_task_summary(
     task_id: str,
-    total_actions: int,
-    model_calls: int,
-    high_cost_actions: int,
-    artifacts_created: int,
-    suspected_rate_limit_events: int
+    total_actions: Optional[int] = None,
+    model_calls: Optional[int] = None,
+    high_cost_actions: Optional[int] = None,
+    artifacts_created: Optional[int] = None,
+    suspected_rate_limit_events: Optional[int] = None
 ):
     """
     Emits the final task summary report.
+    Counts left as None are computed from the indexed audit log.
     """
+    counts = (total_actions, model_calls, high_cost_actions,
+              artifacts_created, suspected_rate_limit_events)
+    if any(c is None for c in counts):
+        try:
+            computed = audit_index.task_summary(task_id)
+        except Exception as e:
+            print(f"WARNING: Could not compute task summary from audit log: {e}")
+            computed = {}
+        total_actions = computed.get('total_actions', 0) if total_actions is None else total_actions
+        model_calls = computed.get('model_calls', 0) if model_calls is None else model_calls
+        high_cost_actions = computed.get('high_cost_actions', 0) if high_cost_actions is None else high_cost_actions
+        artifacts_created = computed.get('artifacts_created', 0) if artifacts_created is None else artifacts_created
+        if suspected_rate_limit_events is None:
+            suspected_rate_limit_events = computed.get('suspected_rate_limit_events', 0)
+
     summary = {
         "type": "TASK_USAGE_SUMMARY",
         "task_id": task_id,
@@ -104,7 +113,7 @@ def emit_task_summary(
     }
     
     try:
-        with open(AUDIT_LOG_FILE, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(summary) + '\n')
+        audit_writer.write(summary)
+        audit_writer.flush()  # End of task: persist everything now
     except Exception as e:
         print(f"CRITICAL: Failed to write task summary: {e}")
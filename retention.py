@@ -0,0 +1,281 @@
+"""
+Retention Policy Engine
+Declarative rules for which conversation files to archive or delete.
+
+A `RetentionPolicy` combines four kinds of rule:
+- age:      archive sessions idle for N days, delete after M days
+- size:     delete single sessions larger than a limit
+- budget:   delete the oldest sessions until the total fits a disk budget
+- per-project: always keep the N most recent sessions of every project
+
+`plan()` evaluates the policy against the monitor's session index (no disk
+scan) and returns the actions it would take - this is the dry-run report.
+`RetentionEngine` runs the same plan in a low-priority background thread,
+re-planning only when the index changes and spending at most an I/O budget
+per pass. The active session is never touched, and every file is re-checked
+just before it is archived or deleted.
+"""
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from archiver import ArchiveJob, CODECS
+from chunk_store import collect_garbage
+from config import (ARCHIVE_DEFAULT_CODEC, ARCHIVE_MIN_AGE_DAYS, ARCHIVE_MIN_SIZE,
+                    RETENTION_INTERVAL, RETENTION_IO_BUDGET_MB, RETENTION_RATE_LIMIT_MB,
+                    RETENTION_MIN_IDLE_HOURS)
+from session_scanner import SessionRecord
+
+UNKNOWN_PROJECT = 'Unknown'
+
+
+@dataclass
+class RetentionPolicy:
+    """Retention rules; None disables a rule. Stored under settings['retention']."""
+    enabled: bool = False  # Run in the background (dry-run report is always available)
+    archive_after_days: Optional[float] = ARCHIVE_MIN_AGE_DAYS
+    archive_min_size: int = ARCHIVE_MIN_SIZE
+    codec: str = ARCHIVE_DEFAULT_CODEC
+    delete_after_days: Optional[float] = None
+    max_session_mb: Optional[float] = None
+    disk_budget_mb: Optional[float] = None
+    keep_per_project: int = 3
+    min_idle_hours: float = RETENTION_MIN_IDLE_HOURS
+
+    @classmethod
+    def from_dict(cls, data) -> 'RetentionPolicy':
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in known})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def describe(self) -> List[str]:
+        rules = []
+        if self.archive_after_days is not None:
+            rules.append(f"Archive ({self.codec}) after {self.archive_after_days:g} days "
+                         f"if larger than {self.archive_min_size / 1024:.0f} KB")
+        if self.delete_after_days is not None:
+            rules.append(f"Delete after {self.delete_after_days:g} days")
+        if self.max_session_mb is not None:
+            rules.append(f"Delete sessions larger than {self.max_session_mb:g} MB")
+        if self.disk_budget_mb is not None:
+            rules.append(f"Keep total size under {self.disk_budget_mb:g} MB (oldest deleted first)")
+        if self.keep_per_project:
+            rules.append(f"Always keep the {self.keep_per_project} newest sessions per project")
+        return rules or ["No rules enabled"]
+
+
+@dataclass
+class RetentionAction:
+    session_id: str
+    path: Path
+    action: str  # 'archive' | 'delete'
+    reason: str  # 'age' | 'size' | 'budget'
+    size: int
+    modified: float
+    project: str
+
+
+def plan(sessions: Iterable[SessionRecord], policy: RetentionPolicy, active_ids=(), now=None,
+         project_of: Optional[Callable[[SessionRecord], Optional[str]]] = None) -> List[RetentionAction]:
+    """Actions the policy requires for a session index (records from the session scanner)."""
+    now = time.time() if now is None else now
+    project_of = project_of or (lambda s: s.project_name)
+    active = {sid for sid in active_ids if sid}
+    sessions = sorted(sessions, key=lambda s: s.modified, reverse=True)
+    idle_cutoff = now - policy.min_idle_hours * 3600
+
+    # Keep-N-per-project: newest first, so the first N seen per project are protected
+    protected = set()
+    seen = defaultdict(int)
+    for s in sessions:
+        project = project_of(s) or UNKNOWN_PROJECT
+        if seen[project] < policy.keep_per_project:
+            protected.add(s.id)
+        seen[project] += 1
+
+    def deletable(s):
+        return s.id not in active and s.id not in protected and s.modified < idle_cutoff
+
+    def action(s, kind, reason):
+        return RetentionAction(s.id, Path(s.pb_path), kind, reason, s.size,
+                               s.modified, project_of(s) or UNKNOWN_PROJECT)
+
+    actions = []
+    deleted = set()
+    for s in sessions:
+        if not deletable(s):
+            continue
+        age_days = (now - s.modified) / 86400
+        if policy.delete_after_days is not None and age_days > policy.delete_after_days:
+            actions.append(action(s, 'delete', 'age'))
+            deleted.add(s.id)
+        elif policy.max_session_mb is not None and s.size > policy.max_session_mb * 1024 * 1024:
+            actions.append(action(s, 'delete', 'size'))
+            deleted.add(s.id)
+
+    if policy.disk_budget_mb is not None:
+        budget = policy.disk_budget_mb * 1024 * 1024
+        total = sum(s.size for s in sessions if s.id not in deleted)
+        for s in reversed(sessions):  # Oldest first
+            if total <= budget:
+                break
+            if s.id in deleted or not deletable(s):
+                continue
+            actions.append(action(s, 'delete', 'budget'))
+            deleted.add(s.id)
+            total -= s.size
+
+    if policy.archive_after_days is not None and policy.codec in CODECS:
+        archive_cutoff = now - policy.archive_after_days * 86400
+        for s in sessions:
+            if (s.id in deleted or s.id in active or s.compressed
+                    or s.modified >= archive_cutoff or s.size <= policy.archive_min_size):
+                continue
+            actions.append(action(s, 'archive', 'age'))
+    return actions
+
+
+def format_report(actions: List[RetentionAction], sessions: Iterable[SessionRecord], policy: RetentionPolicy) -> str:
+    """Human-readable dry-run report."""
+    sessions = list(sessions)
+    total = sum(s.size for s in sessions)
+    deletes = [a for a in actions if a.action == 'delete']
+    archives = [a for a in actions if a.action == 'archive']
+    freed = sum(a.size for a in deletes)
+
+    lines = ["Policy:"] + [f"  • {rule}" for rule in policy.describe()]
+    lines.append("")
+    lines.append(f"{len(sessions)} sessions, {total / 1024 / 1024:.1f} MB on disk")
+    lines.append(f"Would delete {len(deletes)} sessions ({freed / 1024 / 1024:.1f} MB) "
+                 f"and archive {len(archives)} ({sum(a.size for a in archives) / 1024 / 1024:.1f} MB)")
+    for title, group in (("Delete", deletes), ("Archive", archives)):
+        if not group:
+            continue
+        lines.append("")
+        lines.append(f"{title}:")
+        for a in group:
+            age = (time.time() - a.modified) / 86400
+            lines.append(f"  {a.session_id[:12]}…  {a.size / 1024 / 1024:7.1f} MB  {age:5.0f}d  "
+                         f"{a.project[:20]:<20} [{a.reason}]")
+    return "\n".join(lines)
+
+
+# ==== BACKGROUND ENGINE ====
+
+class RetentionEngine:
+    """Applies the retention policy incrementally from a background thread."""
+
+    def __init__(self, index_fn: Callable[[], List[SessionRecord]], active_fn: Callable[[], Iterable[str]],
+                 policy_fn: Callable[[], RetentionPolicy],
+                 project_of: Optional[Callable[[SessionRecord], Optional[str]]] = None,
+                 interval=RETENTION_INTERVAL, io_budget_mb=RETENTION_IO_BUDGET_MB,
+                 rate_limit_mb=RETENTION_RATE_LIMIT_MB):
+        self.index_fn = index_fn
+        self.active_fn = active_fn
+        self.policy_fn = policy_fn
+        self.project_of = project_of
+        self.interval = interval
+        self.io_budget = io_budget_mb * 1024 * 1024
+        self.rate_limit_mb = rate_limit_mb
+        self.last_run = None  # {'time', 'deleted', 'archived', 'freed_bytes', 'pending'}
+        self._pending = deque()
+        self._signature = None
+        self._job = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="RetentionEngine", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._job is not None:
+            self._job.cancel()
+
+    def request_pass(self):
+        """Run a pass now instead of waiting for the interval."""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.policy_fn().enabled:
+                    self.run_pass()
+            except Exception as e:
+                print(f"[Retention] Pass failed: {e}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def run_pass(self, now=None) -> dict:
+        """Re-plan if the index changed, then act on pending actions within the I/O budget."""
+        policy = self.policy_fn()
+        sessions = list(self.index_fn())
+        signature = (hash(tuple((s.id, s.size, s.modified) for s in sessions)),
+                     tuple(sorted(policy.to_dict().items())))
+        if signature != self._signature:
+            active = list(self.active_fn())
+            self._pending = deque(plan(sessions, policy, active, now, self.project_of))
+            self._signature = signature
+
+        spent = 0
+        deleted, to_archive, touched_dedup = [], [], False
+        while self._pending and spent < self.io_budget and not self._stop.is_set():
+            action = self._pending.popleft()
+            if not self._still_valid(action, policy, now):
+                continue
+            spent += action.size
+            if action.action == 'delete':
+                try:
+                    action.path.unlink()
+                    deleted.append(action)
+                    touched_dedup |= action.path.name.endswith('.pb.dedup')
+                except OSError as e:
+                    print(f"[Retention] Could not delete {action.path.name}: {e}")
+            else:
+                to_archive.append(action)
+
+        archived = 0
+        if to_archive and not self._stop.is_set():
+            self._job = ArchiveJob([a.path for a in to_archive], codec=policy.codec, workers=1,
+                                   rate_limit_mb=self.rate_limit_mb, low_priority=True).start()
+            progress = self._job.wait()
+            archived = progress.done_files
+            self._job = None
+
+        if touched_dedup:
+            collect_garbage(Path(deleted[0].path).parent)
+
+        freed = sum(a.size for a in deleted)
+        self.last_run = {'time': time.time(), 'deleted': len(deleted), 'archived': archived,
+                         'freed_bytes': freed, 'pending': len(self._pending)}
+        if deleted or archived:
+            print(f"[Retention] Deleted {len(deleted)} sessions ({freed / 1024 / 1024:.1f} MB), "
+                  f"archived {archived}, {len(self._pending)} actions pending")
+        return self.last_run
+
+    def _still_valid(self, action, policy, now=None):
+        """Re-check right before acting: unchanged on disk, not active, still idle."""
+        if action.session_id in set(self.active_fn()):
+            return False
+        try:
+            stat = os.stat(action.path)
+        except OSError:
+            return False
+        if stat.st_size != action.size or stat.st_mtime != action.modified:
+            return False  # Written since it was planned; the next plan decides
+        now = time.time() if now is None else now
+        if action.action == 'delete' and stat.st_mtime >= now - policy.min_idle_hours * 3600:
+            return False
+        return True
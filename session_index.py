@@ -0,0 +1,239 @@
+"""
+Session Index
+Search index over every conversation for the session picker.
+
+Each session is indexed by its id, project name and first user message
+(title). A query term matches a session if one of its whitespace-separated
+words contains the term (terms of 3+ characters, found through trigrams),
+a word starts with it (1-2 characters), or its id starts with it. All terms
+must match. Updates only touch sessions whose text changed, so re-syncing
+with the directory scan is cheap.
+
+Titles need a read of each file's head, so they are extracted on a
+background thread and persisted to SESSION_TITLES_FILE; a session's title
+never changes once written. Titles of sessions that leave the scan are
+dropped, so the file tracks the directory rather than every session ever seen.
+"""
+import json
+import re
+import sys
+import threading
+from bisect import bisect_left
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from archiver import open_session_file
+from config import SESSION_TITLES_FILE, SESSION_TITLE_SCAN_BYTES, SESSION_TITLE_MAX_CHARS
+from session_scanner import SessionRecord
+from token_estimator import extract_text
+
+_MESSAGE_LIKE = re.compile(rb'[A-Za-z][A-Za-z\']+(?:[ ,.?!:;-]+[A-Za-z][A-Za-z\']*){3,}')
+
+
+def read_title(path, scan_bytes=SESSION_TITLE_SCAN_BYTES, max_chars=SESSION_TITLE_MAX_CHARS) -> str:
+    """First prose-looking text run in a conversation file (its first user message)."""
+    try:
+        with open_session_file(path) as f:
+            head = f.read(scan_bytes)
+    except (OSError, EOFError, ValueError):
+        return ""
+    for line in extract_text(head).split(b'\n'):
+        m = _MESSAGE_LIKE.search(line)  # Skips a printable length/tag byte in front of the text
+        if m:
+            text = ' '.join(line[m.start():].decode('utf-8', errors='ignore').split())
+            return text[:max_chars]
+    return ""
+
+
+def _grams(word: str):
+    """Vocabulary keys for a word: its trigrams plus 1-2 char prefixes."""
+    keys = {word[i:i + 3] for i in range(len(word) - 2)}
+    keys.add('^' + word[:1])
+    keys.add('^' + word[:2])
+    return keys
+
+
+class SessionIndex:
+    """Incremental two-level index: trigram/prefix -> words -> sessions.
+
+    Indexing the vocabulary rather than every document keeps memory
+    proportional to distinct words plus word occurrences (a 50k-session
+    directory shares most of its vocabulary). Session ids are matched by
+    prefix with a bisect over the sorted ids instead.
+    """
+
+    def __init__(self, titles_file=SESSION_TITLES_FILE):
+        self.titles_file = Path(titles_file)
+        self.titles: Dict[str, str] = self._load_titles()
+        self._words: Dict[str, tuple] = {}  # sid -> indexed words
+        self._projects: Dict[str, Optional[str]] = {}
+        self._stale = set()  # sids whose title arrived after they were indexed
+        self._word_sessions: Dict[str, set] = {}
+        self._gram_words: Dict[str, set] = {}
+        self._modified: Dict[str, float] = {}
+        self._order: List[str] = []  # All sids, newest first
+        self._ids: List[tuple] = []  # (lower-case sid, sid), sorted for prefix lookups
+        self._lock = threading.RLock()
+        self._title_thread = None
+        self._titles_dirty = False  # Titles pruned since the last save
+        self.version = 0  # Bumped whenever search results may change
+
+    def __len__(self):
+        return len(self._order)
+
+    # --- Building ---
+
+    def update(self, sessions, projects: Dict[str, str]):
+        """Sync with a directory scan (`sessions` newest first) and known project names."""
+        with self._lock:
+            order = [s.id for s in sessions]
+            for s in sessions:
+                self._modified[s.id] = s.modified
+                self._set(s.id, s.project_name or projects.get(s.id))
+            if order != self._order:
+                current = set(order)
+                for sid in [sid for sid in self._words if sid not in current]:
+                    self._remove(sid)
+                    self._modified.pop(sid, None)
+                # Deleted sessions' titles would otherwise be persisted forever
+                gone = [sid for sid in self.titles if sid not in current]
+                for sid in gone:
+                    del self.titles[sid]
+                self._titles_dirty = self._titles_dirty or bool(gone)
+                self._order = order
+                self._ids = sorted((sid.lower(), sid) for sid in order)
+                self.version += 1
+
+    def _set(self, sid, project):
+        if sid in self._words and self._projects.get(sid) == project and sid not in self._stale:
+            return
+        self._stale.discard(sid)
+        # Interned words in a tuple: most memory is per-session word lists
+        words = tuple(dict.fromkeys(map(sys.intern, ' '.join(filter(None, (project, self.titles.get(sid)))).lower().split())))
+        if sid in self._words and self._words[sid] == words:
+            self._projects[sid] = project
+            return
+        self._remove(sid)
+        self._words[sid] = words
+        self._projects[sid] = project
+        for word in words:
+            sessions = self._word_sessions.get(word)
+            if sessions is None:
+                sessions = self._word_sessions[word] = set()
+                for key in _grams(word):
+                    self._gram_words.setdefault(key, set()).add(word)
+            sessions.add(sid)
+        self.version += 1
+
+    def _remove(self, sid):
+        self._projects.pop(sid, None)
+        words = self._words.pop(sid, None)
+        if words is None:
+            return
+        for word in words:
+            sessions = self._word_sessions.get(word)
+            if sessions is None:
+                continue
+            sessions.discard(sid)
+            if not sessions:
+                del self._word_sessions[word]
+                for key in _grams(word):
+                    vocab = self._gram_words.get(key)
+                    if vocab:
+                        vocab.discard(word)
+                        if not vocab:
+                            del self._gram_words[key]
+        self.version += 1
+
+    # --- Querying ---
+
+    def _matches(self, term: str) -> set:
+        """Sessions with a word containing `term` (prefix for 1-2 chars) or an id starting with it."""
+        if len(term) >= 3:
+            postings = sorted((self._gram_words.get(term[i:i + 3], set()) for i in range(len(term) - 2)), key=len)
+            words = set.intersection(*postings)
+            if len(term) > 3:
+                words = {w for w in words if term in w}
+        else:
+            words = self._gram_words.get('^' + term, set())
+        sessions = set()
+        for word in words:
+            sessions |= self._word_sessions[word]
+        start = bisect_left(self._ids, (term,))
+        for lower, sid in islice(self._ids, start, None):
+            if not lower.startswith(term):
+                break
+            sessions.add(sid)
+        return sessions
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """Session ids matching every term of `query`, newest first."""
+        terms = query.lower().split()
+        with self._lock:
+            if not terms:
+                return self._order[:limit] if limit else list(self._order)
+            candidates = None
+            for term in sorted(terms, key=len, reverse=True):  # Most selective first
+                matched = self._matches(term)
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+            if len(candidates) * 8 > len(self._order):
+                ranked = [sid for sid in self._order if sid in candidates]  # Already newest first
+            else:
+                modified = self._modified
+                ranked = sorted(candidates, key=lambda sid: modified.get(sid, 0), reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    # --- Titles ---
+
+    def load_titles_async(self, sessions, paths: Callable[[SessionRecord], Path] = lambda s: s.pb_path,
+                          on_batch: Optional[Callable[[], None]] = None, batch=200):
+        """Extract missing titles on a background thread (newest sessions first)."""
+        if self._title_thread and self._title_thread.is_alive():
+            return
+        missing = [s for s in sessions if s.id not in self.titles]
+        if not missing and not self._titles_dirty:
+            return
+
+        def work():
+            for i, s in enumerate(missing, 1):
+                title = read_title(paths(s))
+                with self._lock:
+                    self.titles[s.id] = title
+                    if s.id in self._words:
+                        self._stale.add(s.id)
+                        self._set(s.id, self._projects.get(s.id))
+                if on_batch and (i % batch == 0 or i == len(missing)):
+                    on_batch()
+            self.save_titles()
+
+        self._title_thread = threading.Thread(target=work, daemon=True)
+        self._title_thread.start()
+
+    def _load_titles(self):
+        try:
+            with open(self.titles_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[Picker] Could not load session titles: {e}")
+            return {}
+
+    def save_titles(self):
+        with self._lock:
+            data = dict(self.titles)
+            self._titles_dirty = False
+        try:
+            self.titles_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.titles_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            tmp_file.replace(self.titles_file)
+        except Exception as e:
+            print(f"[Picker] Could not save session titles: {e}")
+
+
+session_index = SessionIndex()
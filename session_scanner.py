@@ -0,0 +1,250 @@
+"""
+Session Scanner
+Keeps the conversations directory listing between polls, so a refresh costs
+O(changed + k) instead of building and sorting every session on every poll.
+
+A directory's mtime only changes when a file is created, deleted or renamed;
+appends to an existing conversation leave it alone. An unchanged directory is
+therefore not listed again: only the SESSION_SCAN_TOP_K most recent sessions
+(plus pinned ones, e.g. the selected session) are re-stat'ed, since those are
+the ones being written to. A full listing still runs every
+SESSION_FULL_SCAN_INTERVAL seconds to catch writes to older sessions.
+
+The full newest-first order is only built when something asks for it (the
+picker, retention) and is then kept up to date with bisect; until then the
+top k come from heapq.nlargest.
+
+Each conversation is one SessionRecord (``__slots__``, interned id, Path
+built on first use) kept in a registry for the lifetime of the file and
+updated in place when its stat values change. Known file names are looked
+up without parsing, so a steady-state poll allocates next to nothing.
+"""
+import heapq
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from itertools import chain
+from operator import attrgetter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from archiver import split_session_name
+from config import SESSION_SCAN_TOP_K, SESSION_FULL_SCAN_INTERVAL
+
+_by_modified = attrgetter('modified')
+
+
+class SessionRecord:
+    """One conversation file. Mutated in place; `token_data`/`project_name` are filled on demand."""
+    __slots__ = ('id', 'size', 'modified', 'inode', 'compressed', 'token_data', 'project_name',
+                 '_directory', '_name', '_path', '_seen')
+
+    def __init__(self, sid, size=0, modified=0.0, path=None, compressed=False, project_name=None):
+        self.id = sys.intern(sid)
+        self.size = size
+        self.modified = modified
+        self.inode = 0  # 0 where the platform doesn't report it (scandir on Windows)
+        self.compressed = compressed
+        self.token_data = None
+        self.project_name = project_name
+        self._directory = self._name = None
+        self._path = Path(path) if path is not None else None
+        self._seen = 0
+
+    @classmethod
+    def from_entry(cls, sid, directory, name, stat, compressed):
+        record = cls(sid, stat.st_size, stat.st_mtime, compressed=compressed)
+        record._directory, record._name, record.inode = directory, name, stat.st_ino
+        return record
+
+    @property
+    def pb_path(self) -> Path:
+        if self._path is None:
+            self._path = Path(self._directory, self._name)
+        return self._path
+
+    @property
+    def estimated_tokens(self) -> int:
+        return self.size // 4
+
+    @property
+    def key(self):
+        """Sort key for newest-first order."""
+        return (-self.modified, self.id)
+
+    def refresh(self, stat):
+        """Apply new stat values of the changed file; its resolved metadata is now stale."""
+        self.size = stat.st_size
+        self.modified = stat.st_mtime
+        self.token_data = None
+        self.project_name = None
+
+    def __repr__(self):
+        return f"SessionRecord({self.id!r}, size={self.size}, modified={self.modified})"
+
+
+class SessionScanner:
+    """Incremental, mtime-ordered registry of the conversations directory."""
+
+    def __init__(self, directory, top_k=SESSION_SCAN_TOP_K, full_scan_interval=SESSION_FULL_SCAN_INTERVAL,
+                 clock=time.time):
+        self.directory = Path(directory)
+        self._directory = str(self.directory)
+        self.top_k = top_k
+        self.full_scan_interval = full_scan_interval
+        self.clock = clock
+        self.records: Dict[str, SessionRecord] = {}  # sid -> record, stable while the file exists
+        self._by_name: Dict[str, SessionRecord] = {}
+        self.top: List[SessionRecord] = []  # Newest first
+        self.removed: Dict[str, Path] = {}  # Changes found by the last scan: sid -> previous path
+        self.moved: Dict[str, Path] = {}
+        self._keys: Optional[List[tuple]] = None  # Sorted (-modified, sid); None until needed
+        self._ordered: Optional[List[SessionRecord]] = None
+        self._dir_mtime = None
+        self._last_full = float('-inf')
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.stats = {'full_scans': 0, 'short_circuits': 0}
+
+    def scan(self, pinned=()) -> List[SessionRecord]:
+        """Refresh and return the top k sessions, newest first."""
+        with self._lock:
+            self.removed.clear()
+            self.moved.clear()
+            try:
+                dir_mtime = os.stat(self._directory).st_mtime_ns
+            except OSError:
+                self.removed.update((sid, r.pb_path) for sid, r in self.records.items())
+                self.records, self._by_name, self.top, self._keys, self._ordered = {}, {}, [], None, None
+                self._dir_mtime = None
+                return self.top
+            now = self.clock()
+            if dir_mtime == self._dir_mtime and now - self._last_full < self.full_scan_interval:
+                if self._restat(pinned):
+                    return self.top
+                # A hot file vanished without a visible directory change (coarse mtime): list again
+            self._full_scan()
+            self._dir_mtime = dir_mtime
+            self._last_full = now
+            return self.top
+
+    def sessions(self) -> List[SessionRecord]:
+        """Every session, newest first."""
+        with self._lock:
+            if self._ordered is None:
+                if self._keys is None:
+                    self._keys = sorted(r.key for r in self.records.values())
+                records = self.records
+                self._ordered = [records[sid] for _, sid in self._keys]
+            return self._ordered
+
+    # --- Internals (called with the lock held) ---
+
+    def _restat(self, pinned) -> bool:
+        """Re-stat the hot sessions only; False if one of them disappeared."""
+        self.stats['short_circuits'] += 1
+        records = self.records
+        hot = self.top
+        changed = {}
+        for record in chain(hot, (records[sid] for sid in pinned if sid in records)):
+            try:
+                stat = os.stat(record.pb_path)
+            except OSError:
+                return False
+            if record.inode and stat.st_ino and stat.st_ino != record.inode:
+                return False  # Replaced under the same name
+            if stat.st_mtime != record.modified or stat.st_size != record.size:
+                changed[record.id] = (record.key, record)
+                record.refresh(stat)
+        if changed:
+            self._reorder([key for key, _ in changed.values()], [r for _, r in changed.values()])
+            self._refresh_top({r.id: r for r in hot + [r for _, r in changed.values()]}.values())
+        return True
+
+    def _full_scan(self):
+        self.stats['full_scans'] += 1
+        self._generation += 1
+        generation = self._generation
+        by_name = self._by_name
+        old_keys, fresh = [], []
+        found = {}  # Files without a record under their name: sid -> (name, compressed, stat)
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                name = entry.name
+                record = by_name.get(name)
+                if record is not None:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    if record.inode and stat.st_ino and stat.st_ino != record.inode:
+                        found[record.id] = (name, record.compressed, stat)  # Replaced under the same name
+                        continue
+                    record._seen = generation
+                    if stat.st_mtime != record.modified or stat.st_size != record.size:
+                        old_keys.append(record.key)
+                        record.refresh(stat)
+                        fresh.append(record)
+                    continue
+                parsed = split_session_name(name)
+                if not parsed or '.tmp' in name or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                sid = parsed[0]
+                if sid in found and found[sid][2].st_mtime >= stat.st_mtime:
+                    continue  # Keep the newest copy while a file is being (de)compressed
+                found[sid] = (name, parsed[1] != '.pb', stat)
+
+        for sid, (name, compressed, stat) in found.items():
+            previous = self.records.get(sid)
+            if previous is not None:
+                if previous._seen == generation and previous.modified >= stat.st_mtime:
+                    continue
+                self.moved[sid] = previous.pb_path
+                self._drop(previous)
+                old_keys.append(previous.key)
+            record = SessionRecord.from_entry(sid, self._directory, name, stat, compressed)
+            record._seen = generation
+            self.records[record.id] = by_name[name] = record
+            fresh.append(record)
+        for record in [r for r in self.records.values() if r._seen != generation]:
+            self._drop(record)
+            self.removed[record.id] = record.pb_path
+            old_keys.append(record.key)
+        if old_keys or fresh:
+            self._reorder(old_keys, fresh)
+            self._refresh_top()
+
+    def _drop(self, record):
+        del self.records[record.id]
+        if self._by_name.get(record._name) is record:
+            del self._by_name[record._name]
+
+    def _reorder(self, old_keys, records):
+        """Move changed sessions in the full order (or drop it if most of it changed)."""
+        self._ordered = None
+        keys = self._keys
+        if keys is None:
+            return
+        if (len(old_keys) + len(records)) * 4 > len(keys):
+            self._keys = None  # Cheaper to sort again when it's next needed
+            return
+        for key in old_keys:
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        for record in records:
+            insort(keys, record.key)
+
+    def _refresh_top(self, candidates=None):
+        if self._keys is not None:
+            records = self.records
+            self.top = [records[sid] for _, sid in self._keys[:self.top_k]]
+        else:
+            pool = self.records.values() if candidates is None else candidates
+            self.top = heapq.nlargest(self.top_k, pool, key=_by_modified)
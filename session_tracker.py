@@ -0,0 +1,95 @@
+"""
+Session Tracker
+Per-session state for every conversation that is being written to, so
+parallel agent sessions all get history, analytics and handoff alerts.
+
+Each refresh pass reuses the monitor's single directory scan (sessions
+sorted newest first). Only sessions modified within the tracking window are
+sampled, at most MULTI_SESSION_MAX of them; selection stops at the first
+older session, so a pass costs O(active sessions), not O(all sessions).
+Token counts for every session, current or background, come from the same
+incremental metadata pipeline (a sample only reads bytes appended since the
+previous one). The quota API describes only the foreground session, so it
+drives the gauge but is never recorded: sessions trade the current role
+between passes and would otherwise flip between two token sources.
+"""
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import MULTI_SESSION_WINDOW, MULTI_SESSION_MAX
+
+
+@dataclass
+class SessionState:
+    """Last recorded reading for one session."""
+    session_id: str
+    last_tokens: int = 0  # Tokens at the previous history sample (delta base)
+    source: Optional[str] = None  # What last_tokens was measured with ('estimate', 'size', ...)
+    percent: int = 0
+    project: Optional[str] = None
+    modified: float = 0.0
+    last_alert: float = 0.0
+
+
+class SessionTracker:
+    """Selects the active sessions for a pass and keeps their per-session state."""
+
+    def __init__(self, window=MULTI_SESSION_WINDOW, max_sessions=MULTI_SESSION_MAX):
+        self.window = window
+        self.max_sessions = max_sessions
+        self.states: Dict[str, SessionState] = {}
+        self.active: List[str] = []  # Current session first, then newest first
+
+    def state(self, session_id) -> SessionState:
+        state = self.states.get(session_id)
+        if state is None:
+            state = self.states[session_id] = SessionState(session_id)
+        return state
+
+    def delta_base(self, session_id, source) -> int:
+        """Tokens at the previous sample, or 0 when that sample came from another source.
+
+        Counts from different sources (file estimate, size fallback) are not
+        comparable, so a source change starts a new delta series instead of
+        recording the difference between them as usage.
+        """
+        state = self.state(session_id)
+        if state.source != source:
+            state.source = source
+            state.last_tokens = 0
+        return state.last_tokens
+
+    def select(self, sessions, current_id, now=None) -> list:
+        """Background sessions to sample this pass (`sessions` must be sorted newest first)."""
+        now = time.time() if now is None else now
+        cutoff = now - self.window
+        picked = []
+        if self.window > 0:
+            for session in sessions:
+                if session.modified < cutoff or len(picked) >= self.max_sessions - 1:
+                    break
+                if session.id != current_id:
+                    picked.append(session)
+        self.active = [current_id] + [s.id for s in picked]
+        return picked
+
+    def record(self, session, percent, project=None):
+        """Update the display state after a session was sampled."""
+        state = self.state(session.id)
+        state.percent = percent
+        state.project = project or state.project
+        state.modified = session.modified
+        return state
+
+    def should_alert(self, session_id, now, cooldown) -> bool:
+        """Per-session alert throttle."""
+        state = self.state(session_id)
+        if now - state.last_alert < cooldown:
+            return False
+        state.last_alert = now
+        return True
+
+    def snapshot(self) -> List[SessionState]:
+        """States of the sessions sampled in the last pass (current first)."""
+        return [self.states[sid] for sid in self.active if sid in self.states]
@@ -0,0 +1,113 @@
+"""
+Snapshot Bus
+Publish/subscribe link between the refresh pass and the views.
+
+load_session publishes one Snapshot per pass instead of pushing values into
+whichever widgets happen to exist. A view subscribes with the widget it
+draws into and is only called while that widget is viewable, so a hidden
+tab, an iconified dialog or the widgets of another display mode cost
+nothing. A view that is mapped again catches up from the latest snapshot;
+a subscription ends when its widget is destroyed.
+
+Derived values (time to handoff, recent deltas, process list, analytics
+summaries) are registered once as metrics and computed lazily: at most once
+per snapshot, and only when a visible view asks for them.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass
+class Snapshot:
+    """The current session after one refresh pass."""
+    session_id: str
+    project: str
+    percent: int
+    tokens_used: int
+    tokens_left: int
+    context_window: int
+    delta: int
+    timestamp: float = field(default_factory=time.time)
+    _metrics: Dict[str, Callable[['Snapshot'], Any]] = field(default_factory=dict, repr=False, compare=False)
+    _values: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    def metric(self, name):
+        """Derived value, computed on first use and shared by every view of this snapshot."""
+        if name not in self._values:
+            self._values[name] = self._metrics[name](self)
+        return self._values[name]
+
+
+class _Subscription:
+    __slots__ = ('callback', 'widget', 'seen')
+
+    def __init__(self, callback, widget, seen):
+        self.callback = callback
+        self.widget = widget
+        self.seen = seen  # Last snapshot delivered (or rendered from)
+
+
+class SnapshotBus:
+    """Delivers snapshots to the views that are currently visible."""
+
+    def __init__(self):
+        self.latest: Optional[Snapshot] = None
+        self._metrics: Dict[str, Callable[[Snapshot], Any]] = {}
+        self._subscriptions: List[_Subscription] = []
+        self.stats = {'published': 0, 'delivered': 0, 'skipped': 0, 'computed': 0}
+
+    def register_metric(self, name, fn: Callable[[Snapshot], Any]):
+        def compute(snapshot):
+            self.stats['computed'] += 1
+            return fn(snapshot)
+        self._metrics[name] = compute
+
+    def subscribe(self, callback: Callable[[Snapshot], None], widget=None, fresh=False) -> Callable[[], None]:
+        """Call `callback(snapshot)` on every publish; with `widget`, only while it is viewable.
+
+        `fresh` means the view was just rendered from current state, so it
+        doesn't need the latest snapshot when it is first mapped.
+        Returns a function that ends the subscription.
+        """
+        sub = _Subscription(callback, widget, self.latest if fresh else None)
+        self._subscriptions.append(sub)
+        if widget is not None:
+            widget.bind('<Map>', lambda e: self._catch_up(sub) if e.widget is widget else None, add='+')
+        return lambda: self._unsubscribe(sub)
+
+    def publish(self, snapshot: Snapshot):
+        snapshot._metrics = self._metrics
+        self.latest = snapshot
+        self.stats['published'] += 1
+        for sub in list(self._subscriptions):
+            self._deliver(sub, snapshot)
+
+    def _catch_up(self, sub):
+        if self.latest is not None and sub.seen is not self.latest:
+            self._deliver(sub, self.latest)
+
+    def _deliver(self, sub, snapshot):
+        widget = sub.widget
+        if widget is not None:
+            if not widget.winfo_exists():
+                self._unsubscribe(sub)
+                return
+            if not widget.winfo_viewable():
+                self.stats['skipped'] += 1
+                return
+        sub.seen = snapshot
+        self.stats['delivered'] += 1
+        try:
+            sub.callback(snapshot)
+        except Exception as e:
+            print(f"[Bus] View update failed: {e}")
+
+    def _unsubscribe(self, sub):
+        if sub in self._subscriptions:
+            self._subscriptions.remove(sub)
+
+    def describe(self) -> str:
+        s = self.stats
+        return (f"{len(self._subscriptions)} views, {s['delivered']} updates, "
+                f"{s['skipped']} skipped while hidden, {s['computed']} metrics computed")
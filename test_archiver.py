@@ -0,0 +1,76 @@
+"""
+Test Script for Session Archiver
+Verifies parallel compression with every available codec, verification
+before deletion, and cancellation mid-run.
+"""
+import os
+import time
+from archiver import (ArchiveJob, CODECS, find_archive_candidates, open_session_file,
+                      split_session_name)
+
+
+def _make_sessions(directory, count=3, size=300_000, age_days=5):
+    old = time.time() - age_days * 86400
+    paths = []
+    for i in range(count):
+        path = directory / f"session-{i}.pb"
+        # Compressible but not trivial
+        path.write_bytes((f"turn {i} ".encode() + os.urandom(16).hex().encode()) * (size // 40))
+        os.utime(path, (old, old))
+        paths.append(path)
+    return paths
+
+
+def test_candidates_skip_recent_and_current(tmp_path):
+    _make_sessions(tmp_path, count=2)
+    recent = tmp_path / "recent.pb"
+    recent.write_bytes(b"x" * 200_000)
+
+    found = {c['path'].name for c in find_archive_candidates(tmp_path, exclude_ids=['session-1'])}
+    assert found == {'session-0.pb'}
+
+
+def test_archive_every_codec(tmp_path):
+    for codec in CODECS:
+        directory = tmp_path / codec
+        directory.mkdir()
+        paths = _make_sessions(directory)
+        originals = {p.name: (p.read_bytes(), p.stat().st_mtime) for p in paths}
+
+        progress = ArchiveJob(paths, codec=codec, workers=2, rate_limit_mb=0).start().wait(60)
+        assert progress.finished and progress.done_files == 3 and progress.failed == 0
+        assert progress.done_bytes == progress.total_bytes
+        assert progress.saved_bytes > 0
+
+        for name, (data, mtime) in originals.items():
+            assert not (directory / name).exists()
+            archived = directory / (name[:-3] + CODECS[codec].suffix)
+            assert split_session_name(archived.name) == (name[:-3], CODECS[codec].suffix)
+            with open_session_file(archived) as f:
+                assert f.read() == data
+            assert abs(archived.stat().st_mtime - mtime) < 1
+        assert not list(directory.glob('*.tmp'))
+
+
+def test_cancel_keeps_originals(tmp_path):
+    paths = _make_sessions(tmp_path, count=2, size=2_000_000)
+    job = ArchiveJob(paths, codec='gzip', workers=2, rate_limit_mb=0.2, chunk_size=64 * 1024).start()
+    time.sleep(0.5)
+    job.cancel()
+    progress = job.wait(30)
+
+    assert progress.finished and progress.cancelled
+    assert progress.done_files == 0
+    assert all(r['status'] == 'cancelled' for r in progress.results)
+    assert all(p.exists() for p in paths)
+    assert not list(tmp_path.glob('*.gz')) and not list(tmp_path.glob('*.tmp'))
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_candidates_skip_recent_and_current, test_archive_every_codec,
+                 test_cancel_keeps_originals):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Archiver tests passed!")
@@ -0,0 +1,67 @@
+"""
+Test Script for Audit Query Engine
+Verifies incremental indexing, summaries and lookups across rotated segments.
+"""
+import json
+from datetime import datetime, timezone
+from audit_writer import AuditLogWriter, list_audit_segments
+from audit_query import AuditIndex
+
+
+def _record(task, agent, action, ts, cost='low', success=True, artifacts=0):
+    return {
+        "type": "USAGE_LOG",
+        "agent_id": agent,
+        "task_id": task,
+        "action_type": action,
+        "model_used": None,
+        "estimated_token_cost": cost,
+        "timestamp_utc": datetime.fromtimestamp(ts, timezone.utc).isoformat().replace('+00:00', 'Z'),
+        "success": success,
+        "artifacts_produced": artifacts,
+    }
+
+
+def test_incremental_summaries_across_rotation(tmp_path):
+    log = tmp_path / 'audit_log.jsonl'
+    writer = AuditLogWriter(path=log, flush_every=1, flush_interval_ms=60_000,
+                            max_bytes=1500, rotate_daily=False)
+    base = 1_700_000_000
+    
+    for i in range(10):
+        writer.write(_record('task_a', 'agent_1', 'model_inference', base + i * 60,
+                             cost='high' if i % 3 == 0 else 'low', success=(i != 4)))
+        writer.flush()
+    
+    index = AuditIndex(log_path=log)
+    summary = index.refresh().task_summary('task_a', refresh=False)
+    assert summary['total_actions'] == 10
+    assert summary['model_calls'] == 10
+    assert summary['high_cost_actions'] == 4
+    assert summary['suspected_rate_limit_events'] == 1
+    
+    # More records, forcing rotation; the index must not double count
+    for i in range(10):
+        writer.write(_record('task_b', 'agent_2', 'code_edit', base + 7200 + i * 60, artifacts=1))
+        writer.flush()
+    writer.write({"type": "TASK_USAGE_SUMMARY", "task_id": "task_b"})
+    writer.close()
+    assert list_audit_segments(log), "Expected the log to have rotated"
+    
+    # A fresh index instance reloads the sidecar and continues from the saved offsets
+    index = AuditIndex(log_path=log)
+    assert index.task_summary('task_a')['total_actions'] == 10
+    b = index.task_summary('task_b')
+    assert b['total_actions'] == 10 and b['artifacts_created'] == 10 and b['model_calls'] == 0
+    assert index.agent_summary('agent_2')['total_actions'] == 10
+    
+    records = list(index.iter_records(task_id='task_a'))
+    assert len(records) == 10 and all(r['task_id'] == 'task_a' for r in records)
+    
+    recent = list(index.iter_records(since=base + 7200))
+    assert len(recent) == 10 and all(r['task_id'] == 'task_b' for r in recent)
+    
+    hist = index.histogram(bucket_seconds=86400)
+    assert sum(h['total'] for h in hist) == 20
+    
+    assert json.loads(index.index_path.read_text())['version'] == 1
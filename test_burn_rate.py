@@ -0,0 +1,75 @@
+"""
+Test Script for Burn Rate Estimator
+Verifies steady-rate estimation, confidence bounds and session resets.
+"""
+from burn_rate import BurnRateEstimator, BurnRateTracker
+
+
+def test_steady_rate():
+    est = BurnRateEstimator(half_life=300)
+    # 100 tokens/s, sampled every 10s
+    for i in range(30):
+        est.update(i * 10, 10_000 + i * 1000)
+    
+    assert abs(est.rate - 100) < 1e-6, f"Expected 100 tok/s, got {est.rate}"
+    
+    result = est.time_to(est.last_tokens + 60_000)
+    assert result.seconds == 600
+    # Constant rate -> zero variance -> tight interval
+    assert result.seconds_low == result.seconds_high == 600
+
+
+def test_noisy_rate_has_interval():
+    est = BurnRateEstimator(half_life=300)
+    tokens = 0
+    for i in range(60):
+        tokens += 2000 if i % 2 else 0  # Bursty: 100 tok/s on average
+        est.update(i * 10, tokens)
+    
+    result = est.time_to(tokens + 100_000)
+    assert result.seconds_low < result.seconds < result.seconds_high
+
+
+def test_negative_delta_resets():
+    est = BurnRateEstimator()
+    for i in range(10):
+        est.update(i * 10, 50_000 + i * 500)
+    
+    # New session: token count drops
+    est.update(100, 1_000)
+    assert est.samples == 0
+    assert est.time_to(800_000) is None
+    
+    est.update(110, 2_000)
+    est.update(120, 3_000)
+    assert abs(est.rate - 100) < 1e-6
+
+
+def test_past_threshold_and_idle():
+    est = BurnRateEstimator()
+    for i in range(5):
+        est.update(i * 10, 500_000)
+    assert est.time_to(400_000).seconds == 0
+    assert est.time_to(800_000) is None, "No burn -> no estimate"
+
+
+def test_tracker_seed_matches_updates():
+    points = [{'ts': i * 10, 'tokens': i * 300} for i in range(20)]
+    seeded = BurnRateTracker()
+    seeded.seed('s1', points)
+    
+    live = BurnRateTracker()
+    for p in points:
+        live.update('s1', p['ts'], p['tokens'])
+    
+    assert seeded.estimate('s1', 100_000) == live.estimate('s1', 100_000)
+    assert live.estimate('missing', 100_000) is None
+
+
+if __name__ == "__main__":
+    test_steady_rate()
+    test_noisy_rate_has_interval()
+    test_negative_delta_resets()
+    test_past_threshold_and_idle()
+    test_tracker_seed_matches_updates()
+    print("✅ Burn rate tests passed!")
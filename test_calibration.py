@@ -0,0 +1,61 @@
+"""
+Test Script for Bytes-per-Token Calibration
+Verifies that the RLS fit converges on noisy, rounded API readings, rejects
+outliers, restarts pairs on resets, and survives a save/load round trip.
+"""
+import random
+
+from calibration import Calibrator, ModelFit
+
+
+def _feed(cal, rnd, bpt=3.2, window=200_000, steps=200, session='s1', glitches=()):
+    payload, percent = 10_000, 0.0
+    for step in range(steps):
+        grow = rnd.randint(2_000, 12_000)
+        payload += grow
+        percent += grow / bpt / window * 100
+        reported = round(percent)  # The API reports whole percentages
+        if step in glitches:
+            reported += 30  # Another session's usage bleeding into the quota
+        cal.observe('Gemini 3 Flash', session, payload, reported, window)
+
+
+def test_converges_and_rejects_outliers(tmp_path):
+    cal = Calibrator(path=tmp_path / 'cal.json')
+    _feed(cal, random.Random(1), glitches=(120,))
+    fit = cal.fits['Gemini 3 Flash']
+    assert abs(fit.bytes_per_token - 3.2) < 0.25
+    assert fit.rejected >= 1
+    assert cal.estimate_tokens('Gemini 3 Flash', 320_000) == int(320_000 / fit.bytes_per_token)
+    assert cal.bytes_per_token('Other Model') is None
+
+
+def test_pairs_restart_on_reset(tmp_path):
+    cal = Calibrator(path=tmp_path / 'cal.json')
+    assert cal.observe('M', 's1', 1_000, 10, 100_000) is None  # First reading anchors
+    assert cal.observe('M', 's1', 1_500, 10.2, 100_000) is None  # Too small to pair
+    assert cal.observe('M', 's1', 15_000, 14, 100_000) is True
+    assert cal.observe('M', 's1', 9_500, 0, 100_000) is None  # Quota reset
+    assert cal.observe('M', 's2', 99_000, 50, 100_000) is None  # Session switch
+    assert cal.fits['M'].samples == 1
+
+
+def test_persistence(tmp_path):
+    path = tmp_path / 'cal.json'
+    cal = Calibrator(path=path)
+    _feed(cal, random.Random(2), bpt=4.5)
+    cal.flush()
+    loaded = Calibrator(path=path)
+    assert abs(loaded.bytes_per_token('Gemini 3 Flash') - cal.bytes_per_token('Gemini 3 Flash')) < 1e-9
+
+    rebuilt = ModelFit.from_dict(ModelFit(theta=0.5, samples=3).to_dict())
+    assert rebuilt.theta == 0.5 and rebuilt.samples == 3
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_converges_and_rejects_outliers, test_pairs_restart_on_reset, test_persistence):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Calibration tests passed!")
@@ -0,0 +1,163 @@
+"""
+Test Script for Chunk Store
+Verifies content-defined chunking stability, cross-session dedup,
+pack-file storage, streaming restore and mark-and-sweep GC.
+"""
+import hashlib
+import io
+import json
+import os
+import random
+import zlib
+
+from archiver import ArchiveJob, open_session_file
+from chunk_store import (CHUNK_STORE_DIRNAME, Chunker, ChunkStore, _find_cut_bytewise, _masks,
+                         collect_garbage, dedup_stats, find_cut, iter_chunks, store_for)
+from config import CHUNK_MIN_SIZE, CHUNK_AVG_SIZE, CHUNK_MAX_SIZE
+
+
+def _blob(seed, size):
+    return random.Random(seed).randbytes(size)
+
+
+def test_chunk_boundaries_survive_insertions():
+    shared = _blob(1, 400_000)
+    a = list(iter_chunks(io.BytesIO(shared)))
+    b = list(iter_chunks(io.BytesIO(b"prefix inserted before" + shared)))
+
+    assert b"".join(a) == shared
+    assert all(CHUNK_MIN_SIZE <= len(c) <= CHUNK_MAX_SIZE for c in a[:-1])
+    # Content-defined: after the first boundary the chunk streams resynchronise
+    assert len(set(a) & set(b)) >= len(a) - 2
+
+
+def test_block_scan_matches_bytewise_scan():
+    data = _blob(6, 2_000_000) + bytes(200_000) + b"ab" * 100_000
+    mask_s, mask_l = _masks(CHUNK_AVG_SIZE)
+    rng = random.Random(7)
+    for _ in range(300):
+        start = rng.randrange(len(data))
+        window = data[start:start + rng.choice((100, CHUNK_MIN_SIZE + 1, 5000, CHUNK_MAX_SIZE))]
+        n = min(len(window), CHUNK_MAX_SIZE)
+        expected = n if n <= CHUNK_MIN_SIZE else _find_cut_bytewise(
+            window, n, CHUNK_MIN_SIZE, min(CHUNK_AVG_SIZE, n), mask_s, mask_l)
+        assert find_cut(window) == expected
+
+
+def test_chunker_independent_of_feed_size():
+    data = _blob(2, 300_000)
+    chunker = Chunker()
+    pieces = []
+    for i in range(0, len(data), 777):
+        pieces += chunker.feed(data[i:i + 777])
+    pieces += chunker.finish()
+    assert b"".join(pieces) == data
+    reference = Chunker()
+    ref = reference.feed(data) + reference.finish()
+    assert pieces == ref
+
+
+def _make_sessions(directory):
+    system_prompt = _blob(3, 250_000)
+    old = 1_000_000_000
+    paths = []
+    for i in range(3):
+        path = directory / f"s{i}.pb"
+        path.write_bytes(_blob(10 + i, 1000 * (i + 1)) + system_prompt + _blob(20 + i, 30_000))
+        os.utime(path, (old, old))
+        paths.append(path)
+    return paths
+
+
+def test_dedup_archive_roundtrip_and_gc(tmp_path):
+    paths = _make_sessions(tmp_path)
+    originals = {p.name: p.read_bytes() for p in paths}
+
+    progress = ArchiveJob(paths, codec='dedup', workers=2, rate_limit_mb=0).start().wait(60)
+    assert progress.done_files == 3 and progress.failed == 0
+
+    for name, data in originals.items():
+        with open_session_file(tmp_path / (name + '.dedup')) as f:
+            assert f.read() == data
+
+    assert len(list((tmp_path / CHUNK_STORE_DIRNAME).iterdir())) == 6  # A pack + index per session
+
+    # Concurrent writers may both store a shared chunk; compaction keeps one copy,
+    # so the shared region ends up stored once: far less than 3 copies of it
+    assert collect_garbage(tmp_path, grace=0)['live'] > 0
+    stats = dedup_stats(tmp_path)
+    assert stats['sessions'] == 3
+    assert stats['logical_bytes'] == sum(len(d) for d in originals.values())
+    assert stats['stored_bytes'] < 250_000 * 1.5 + 3 * 40_000
+
+    # Deleting one session orphans only its unique chunks
+    (tmp_path / 's0.pb.dedup').unlink()
+    result = collect_garbage(tmp_path, grace=0)
+    assert result['removed'] > 0
+    after = dedup_stats(tmp_path)
+    assert after['stored_bytes'] == stats['stored_bytes'] - result['freed_bytes']
+    assert collect_garbage(tmp_path, grace=0)['removed'] == 0
+    for name in ('s1.pb', 's2.pb'):
+        with open_session_file(tmp_path / (name + '.dedup')) as f:
+            assert f.read() == originals[name]
+
+    # Grace period protects freshly written chunks
+    store = ChunkStore(tmp_path / CHUNK_STORE_DIRNAME)
+    store.put(b"orphan chunk being written")
+    store.close()
+    assert collect_garbage(tmp_path, grace=3600)['removed'] == 0
+
+
+def test_corrupt_chunk_detected(tmp_path):
+    path = tmp_path / 'x.pb'
+    path.write_bytes(_blob(5, 50_000))
+    os.utime(path, (1, 1))
+    ArchiveJob([path], codec='dedup', rate_limit_mb=0).start().wait(60)
+
+    pack = next((tmp_path / CHUNK_STORE_DIRNAME).glob('*.pack'))
+    data = bytearray(pack.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    pack.write_bytes(data)
+    try:
+        with open_session_file(tmp_path / 'x.pb.dedup') as f:
+            f.read()
+        assert False, "corruption should be detected"
+    except ValueError:
+        pass
+
+
+def test_reads_and_collects_loose_chunks(tmp_path):
+    # Chunks stored one file each by older versions
+    store_dir = tmp_path / CHUNK_STORE_DIRNAME
+    data = _blob(8, 5000)
+    chunk_id = hashlib.sha256(data).hexdigest()
+    (store_dir / chunk_id[:2]).mkdir(parents=True)
+    (store_dir / chunk_id[:2] / chunk_id).write_bytes(zlib.compress(data))
+    manifest = tmp_path / 'old.pb.dedup'
+    manifest.write_text(json.dumps({'version': 1, 'size': len(data),
+                                    'sha256': hashlib.sha256(data).hexdigest(),
+                                    'chunks': [[chunk_id, len(data)]]}))
+    with open_session_file(manifest) as f:
+        assert f.read() == data
+
+    store = store_for(manifest)
+    assert store.put(data) == chunk_id  # Found loose: not stored again
+    store.close()
+    assert not list(store_dir.glob('*.pack'))
+
+    manifest.unlink()
+    assert collect_garbage(tmp_path, grace=0)['removed'] == 1
+    assert not (store_dir / chunk_id[:2] / chunk_id).exists()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_chunk_boundaries_survive_insertions()
+    test_block_scan_matches_bytewise_scan()
+    test_chunker_independent_of_feed_size()
+    for test in (test_dedup_archive_roundtrip_and_gc, test_corrupt_chunk_detected,
+                 test_reads_and_collects_loose_chunks):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Chunk store tests passed!")
@@ -0,0 +1,112 @@
+"""
+Test Script for Data Service
+Verifies dataset versions, memoized derived views, and that the history and
+analytics files are only re-read when they change on disk.
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+from data_service import DataService
+
+
+def _service(tmp_path):
+    service = DataService()
+    service.history_file = tmp_path / 'history.json'
+    service.analytics_file = tmp_path / 'analytics.json'
+    return service
+
+
+def _touch_later(path, data):
+    """Rewrite a file as another process would, with a newer mtime."""
+    path.write_text(json.dumps(data))
+    later = time.time() + 10
+    os.utime(path, (later, later))
+
+
+def test_versions_move_only_with_new_data(tmp_path):
+    service = _service(tmp_path)
+    service.load_history()
+    start = service.version('history')
+    assert service.load_history() is service.load_history()
+    assert service.version('history') == start
+
+    service.save_history('a', 100, 0, throttle_seconds=0)
+    a1 = service.version('history', 'a')
+    assert service.version('history') > start and a1 > start
+    service.save_history('b', 50, 0, throttle_seconds=0)
+    assert service.version('history', 'a') == a1  # Other sessions don't move 'a'
+    assert service.version('history', 'b') > a1
+
+    service.save_analytics(100, 0, 'proj', 'model')  # New day
+    v = service.version('analytics')
+    service.save_analytics(100, 100, 'proj', 'model')  # No delta
+    assert service.version('analytics') == v
+    service.save_analytics(150, 100, 'proj', 'model')
+    assert service.version('analytics') > v
+
+
+def test_derived_views_are_memoized(tmp_path):
+    service = _service(tmp_path)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert service.derived('view', 1, compute, 'p') == 1
+    assert service.derived('view', 1, compute, 'p') == 1
+    assert service.derived('view', 1, compute, 'q') == 2  # Different params
+    assert service.derived('view', 2, compute, 'p') == 3  # Version moved
+    assert service.stats['hits'] == 1 and service.stats['misses'] == 3
+
+
+def test_summaries_follow_analytics(tmp_path):
+    service = _service(tmp_path)
+    service.save_analytics(100, 0, 'alpha', 'm')
+    service.save_analytics(400, 100, 'alpha', 'm')
+    service.save_analytics(250, 200, 'beta', 'm')
+    weekly = service.get_weekly_summary()
+    assert len(weekly) == 7 and weekly[0]['date'] == datetime.now().strftime('%Y-%m-%d')
+    assert weekly[0]['tokens'] == 350
+    assert service.get_project_summary() == [{'name': 'alpha', 'tokens': 300}, {'name': 'beta', 'tokens': 50}]
+
+    hits = service.stats['hits']
+    assert service.get_weekly_summary() is weekly
+    assert service.stats['hits'] == hits + 1
+
+    service.save_analytics(300, 250, 'beta', 'm')
+    assert service.get_project_summary()[1] == {'name': 'beta', 'tokens': 100}
+
+
+def test_unflushed_data_survives_and_outside_changes_reload(tmp_path):
+    service = _service(tmp_path)
+    service.save_history('a', 100, 0, throttle_seconds=0)  # Flushed
+    service.save_history('a', 120, 100, throttle_seconds=3600)  # Pending
+    service._history_cache_time = 0  # Past the TTL
+    assert len(service.load_history()['a']) == 2
+
+    service._flush_history()
+    service._history_cache_time = 0
+    v = service.version('history')
+    service.load_history()
+    assert service.version('history') == v and service.stats['reloads'] == 1  # Unchanged file: no reload
+
+    _touch_later(service.history_file, {'a': [], 'c': [{'ts': 1, 'tokens': 5, 'delta': 0}]})
+    service._history_cache_time = 0
+    assert 'c' in service.load_history()
+    assert service.version('history', 'a') > v
+
+    service.save_analytics(100, 0, 'p', 'm')
+    service.save_analytics(200, 100, 'p', 'm')  # Throttled: only in the cache
+    assert service.load_analytics()['projects']['p']['total'] == 100
+    service._flush_analytics()
+    _touch_later(service.analytics_file, {'daily': {}, 'projects': {'z': {'total': 1}}, 'models': {}})
+    assert 'z' in service.load_analytics()['projects']
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_versions_move_only_with_new_data, test_derived_views_are_memoized,
+                 test_summaries_follow_analytics, test_unflushed_data_survives_and_outside_changes_reload):
+        with tempfile.TemporaryDirectory() as d:
+            test(Path(d))
+    print("✅ Data service tests passed!")
@@ -0,0 +1,111 @@
+"""
+Test Script for Language Server Discovery
+Verifies the /proc backend against a fake procfs tree and the
+validate-then-rediscover flow of the background service.
+"""
+import os
+import threading
+import time
+from ls_discovery import LinuxProcBackend, LanguageServerDiscovery, ProcessInfo
+
+CSRF = "0f1e2d3c-aaaa-bbbb-cccc-123456789abc"
+
+
+def _make_proc(root, pid=4242, state='S', port=0xA1B2, inode='5555'):
+    proc = root / str(pid)
+    (proc / 'fd').mkdir(parents=True)
+    argv = [b'/opt/antigravity/language_server_linux_x64', b'--extension_server_port', b'40123',
+            b'--csrf_token', CSRF.encode()]
+    (proc / 'cmdline').write_bytes(b'\0'.join(argv) + b'\0')
+    (proc / 'stat').write_text(f"{pid} (language server) {state} 1 2 3\n")
+    os.symlink(f"socket:[{inode}]", proc / 'fd' / '7')
+    os.symlink('/dev/null', proc / 'fd' / '0')
+
+    # Unrelated process
+    other = root / '1'
+    other.mkdir()
+    (other / 'cmdline').write_bytes(b'/sbin/init\0')
+
+    (root / 'net').mkdir()
+    header = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+    (root / 'net' / 'tcp').write_text(
+        header +
+        f"   0: 0100007F:{port:04X} 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 {inode} 1\n"
+        f"   1: 0100007F:1F90 0100007F:C000 01 00000000:00000000 00:00000000 00000000  1000        0 {inode} 1\n"
+        "   2: 0100007F:2710 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 9999 1\n"
+    )
+    return root
+
+
+def test_proc_backend(tmp_path):
+    backend = LinuxProcBackend(proc_root=_make_proc(tmp_path))
+
+    candidates = backend.find_candidates()
+    assert len(candidates) == 1
+    assert candidates[0].pid == 4242
+    assert candidates[0].extension_port == 40123
+    assert candidates[0].csrf_token == CSRF
+
+    # Only the LISTEN socket owned by the pid
+    assert backend.listening_ports(4242) == [0xA1B2]
+    assert backend.pid_alive(4242)
+    assert not backend.pid_alive(31337)
+
+
+def test_zombie_is_not_alive(tmp_path):
+    backend = LinuxProcBackend(proc_root=_make_proc(tmp_path, state='Z'))
+    assert not backend.pid_alive(4242)
+
+
+def test_cached_info_validated_before_rediscovery(tmp_path):
+    cache = tmp_path / 'ls_discovery.json'
+    backend = LinuxProcBackend(proc_root=_make_proc(tmp_path / 'proc'))
+    calls = {'rediscover': 0, 'probe': 0}
+    probe_gate = threading.Event()
+    probe_gate.set()
+    fresh = ProcessInfo(extension_port=40123, connect_port=50000, csrf_token=CSRF, pid=4242)
+
+    def rediscover():
+        calls['rediscover'] += 1
+        return fresh
+
+    def probe(port, csrf):
+        probe_gate.wait(5)
+        calls['probe'] += 1
+        return port == 0xA1B2
+
+    # Persisted info whose port still answers: no rediscovery
+    service = LanguageServerDiscovery(rediscover, probe, backend=backend, cache_file=cache)
+    service.set(ProcessInfo(40123, 0xA1B2, CSRF, 4242), persist=True)
+    service = LanguageServerDiscovery(rediscover, probe, backend=backend, cache_file=cache)
+    assert service.current().connect_port == 0xA1B2
+
+    probe_gate.clear()  # Hold validation so the suspect state is observable
+    service.report_failure()
+    assert service.current() is None  # Never blocks while suspect
+    probe_gate.set()
+    deadline = time.time() + 5
+    while service.current() is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert service.current().connect_port == 0xA1B2
+    assert calls == {'rediscover': 0, 'probe': 1}
+
+    # Port stops answering: full rediscovery, new info persisted
+    service.set(ProcessInfo(40123, 1234, CSRF, 4242))
+    service.report_failure()
+    deadline = time.time() + 5
+    while service.current() != fresh and time.time() < deadline:
+        time.sleep(0.01)
+    assert service.current() == fresh
+    assert calls['rediscover'] == 1
+    reloaded = LanguageServerDiscovery(rediscover, probe, backend=backend, cache_file=cache)
+    assert reloaded.current() == fresh
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_proc_backend, test_zombie_is_not_alive, test_cached_info_validated_before_rediscovery):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Discovery tests passed!")
@@ -0,0 +1,66 @@
+"""
+Test Script for Memory Trend Tracker
+Verifies the rolling regression, ring-buffer eviction and leak alerts.
+"""
+from memory_trend import MemorySeries, MemoryTrendTracker, TOTAL_KEY
+
+THRESHOLDS = {'proc_warn': 500, 'proc_crit': 1000, 'total_warn': 2000, 'total_crit': 3000}
+
+
+def test_rolling_slope_matches_window():
+    series = MemorySeries(maxlen=10)
+    # Flat for 20 samples, then rising 2MB per 10s; window only sees the rise
+    for i in range(20):
+        series.add(i * 10.0, 100)
+    for i in range(20, 30):
+        series.add(i * 10.0, 100 + (i - 19) * 2)
+    assert len(series) == 10
+    assert abs(series.slope() - 0.2) < 1e-9
+    assert abs(series.time_to(140) - (140 - 120) / 0.2) < 1e-6
+    assert series.time_to(50) == 0.0
+
+    # Duplicate timestamps are ignored
+    series.add(290.0, 9999)
+    assert series.latest == 120
+
+
+def test_leak_alert_for_language_server():
+    tracker = MemoryTrendTracker(maxlen=60, min_samples=5, min_span=60, horizon=1800)
+    for i in range(30):
+        tracker.record([
+            {'Id': '7', 'Type': 'Language Server', 'Mem': 600 + i * 10},  # +60MB/min
+            {'Id': '8', 'Type': 'Renderer', 'Mem': 400},
+        ], now=i * 10.0)
+
+    alerts = tracker.check(THRESHOLDS)
+    # Soonest first: the process limit, then the total (1290MB, 1710s to 3000MB)
+    assert [a.key for a in alerts] == [('7', 'Language Server'), TOTAL_KEY]
+    assert abs(alerts[1].seconds_to_limit - 1710) <= 1
+    alert = alerts[0]
+    assert abs(alert.slope_mb_per_min - 60) < 1e-6
+    # 890MB now, 110MB to go at 1MB/s
+    assert abs(alert.seconds_to_limit - 110) <= 1
+    assert tracker.trend(('8', 'Renderer')) == 0
+
+
+def test_no_alert_without_enough_history():
+    tracker = MemoryTrendTracker(min_samples=12, min_span=120)
+    for i in range(5):
+        tracker.record([{'Id': '7', 'Type': 'Language Server', 'Mem': 900 + i * 50}], now=i * 10.0)
+    assert tracker.check(THRESHOLDS) == []
+
+
+def test_exited_process_forgotten():
+    tracker = MemoryTrendTracker()
+    tracker.record([{'Id': '1', 'Type': 'Main', 'Mem': 100}], now=0)
+    tracker.record([{'Id': '2', 'Type': 'Main', 'Mem': 300}], now=10)
+    assert ('1', 'Main') not in tracker.series
+    assert tracker.series[TOTAL_KEY].values() == [100, 300]
+
+
+if __name__ == "__main__":
+    test_rolling_slope_matches_window()
+    test_leak_alert_for_language_server()
+    test_no_alert_without_enough_history()
+    test_exited_process_forgotten()
+    print("✅ Memory trend tests passed!")
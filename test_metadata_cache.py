@@ -0,0 +1,54 @@
+"""
+Test Script for Session Metadata Cache
+Verifies version matching, LRU eviction, explicit invalidation and the
+counters shown in diagnostics.
+"""
+from metadata_cache import MetadataCache, SessionMeta
+from project_resolver import ProjectResolver
+
+
+def _meta(mtime=1.0, size=100, tokens=25, project='proj'):
+    return SessionMeta(mtime, size, {'tokens_used': tokens, 'context_window': 1000, 'method': 'charclass',
+                                     'payload_bytes': 80, 'project_name': 'head-proj'}, project)
+
+
+def test_record_round_trip():
+    meta = _meta()
+    assert not hasattr(meta, '__dict__')
+    assert meta.token_data == {'tokens_used': 25, 'context_window': 1000, 'tokens_remaining': 975,
+                               'project_name': 'head-proj', 'method': 'charclass', 'payload_bytes': 80,
+                               'cost_ms_per_mb': None}
+    assert meta.project_name == 'proj'
+
+
+def test_lru_and_counters():
+    cache = MetadataCache(max_entries=2)
+    cache.put('a', _meta())
+    cache.put('b', _meta())
+    assert cache.get('a', 1.0, 100) is not None  # 'a' is now most recent
+    assert cache.get('a', 2.0, 100) is None  # Stale version
+    assert cache.get('zz', 1.0, 100) is None
+    cache.put('c', _meta())  # Evicts 'b'
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+    assert cache.peek('a').matches(1.0, 100)
+    assert cache.stats == {'hits': 1, 'misses': 1, 'stale': 1, 'evictions': 1, 'invalidations': 0}
+
+    cache.invalidate(['a', 'missing'])
+    assert len(cache) == 1 and cache.stats['invalidations'] == 1
+    assert "1/2 entries" in cache.describe()
+
+
+def test_project_resolver_is_bounded():
+    resolver = ProjectResolver(github_path=None, window_fn=lambda: "win", scan_fn=lambda p: None, max_entries=2)
+    for sid in ('a', 'b', 'a', 'c'):
+        resolver.resolve(sid, content_hint="hinted")
+    assert list(resolver.attributions) == ['a', 'c']
+    assert set(resolver.names) == {'a', 'c'} and 'b' not in resolver.timestamps
+    assert resolver.stats['evictions'] == 1
+
+
+if __name__ == "__main__":
+    test_record_round_trip()
+    test_lru_and_counters()
+    test_project_resolver_is_bounded()
+    print("✅ Metadata cache tests passed!")
@@ -0,0 +1,141 @@
+"""
+Test Script for Port Probing
+Spins up several local HTTPS listeners (only one is the real API) and checks
+that discovery finds it without waiting on the others.
+"""
+import shutil
+import socket
+import ssl
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from antigravity_api import AntigravityAPI, UNLEASH_PATH, PROBE_TIMEOUT
+from ls_discovery import LanguageServerDiscovery, ProcessInfo, ServerCandidate
+from bench_quota_fetch import make_self_signed_cert
+
+CSRF_TOKEN = "11111111-2222-3333-4444-555555555555"
+
+
+class _FakeListener(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    is_api = False
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        ok = (self.is_api and self.path == UNLEASH_PATH
+              and self.headers.get('X-Codeium-Csrf-Token') == CSRF_TOKEN)
+        body = b'{}'
+        self.send_response(200 if ok else 404)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ApiListener(_FakeListener):
+    is_api = True
+
+
+class _FakeBackend:
+    def __init__(self, ports):
+        self.ports = ports
+
+    def find_candidates(self):
+        return [ServerCandidate(pid=1, extension_port=self.extension_port, csrf_token=CSRF_TOKEN)]
+
+    def listening_ports(self, pid):
+        return list(self.ports)
+
+    def pid_alive(self, pid):
+        return True
+
+
+@pytest.fixture(scope="module")
+def listeners():
+    if shutil.which('openssl') is None:
+        pytest.skip("openssl CLI not available")
+    tmp = tempfile.TemporaryDirectory()
+    cert, key = make_self_signed_cert(Path(tmp.name))
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(cert, key)
+
+    servers = []
+    for handler in (_FakeListener, _FakeListener, _ApiListener, _FakeListener):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+
+    # Accepts TCP but never completes a TLS handshake
+    black_hole = socket.socket()
+    black_hole.bind(('127.0.0.1', 0))
+    black_hole.listen(8)
+
+    ports = [s.server_address[1] for s in servers]
+    yield {'api': ports[2], 'decoys': ports[:2] + ports[3:], 'hang': black_hole.getsockname()[1]}
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    black_hole.close()
+    tmp.cleanup()
+
+
+def _make_api(ports, extension_port=0):
+    api = AntigravityAPI()
+    api.backend = _FakeBackend(ports)
+    api.backend.extension_port = extension_port
+    api.discovery = LanguageServerDiscovery(api.detect_process, api._test_port,
+                                            backend=api.backend, cache_file=None)
+    return api
+
+
+def test_finds_api_among_listeners(listeners):
+    ports = [listeners['hang']] + listeners['decoys'] + [listeners['api']]
+    api = _make_api(ports)
+
+    start = time.perf_counter()
+    info = api.detect_process()
+    elapsed = time.perf_counter() - start
+
+    assert info.connect_port == listeners['api']
+    assert info.csrf_token == CSRF_TOKEN
+    # The hung listener never holds up the answer
+    assert elapsed < PROBE_TIMEOUT
+    api.close_connections()
+
+
+def test_hints_are_probed_first(listeners):
+    ports = listeners['decoys'] + [listeners['hang'], listeners['api']]
+    api = _make_api(ports)
+    api.discovery.set(ProcessInfo(0, listeners['api'], CSRF_TOKEN))
+
+    order = api._probe_order(ports, extension_port=listeners['hang'] - 1)
+    assert order[0] == listeners['api']       # last-known port
+    assert order[1] == listeners['hang']      # extension_port + 1
+    assert sorted(order) == sorted(ports)
+
+    probed = []
+    real_test_port = api._test_port
+    api._test_port = lambda port, csrf: probed.append(port) or real_test_port(port, csrf)
+    assert api._probe_ports(order, CSRF_TOKEN) == listeners['api']
+    assert probed[0] == listeners['api']
+    api.close_connections()
+
+
+def test_no_listener_answers(listeners):
+    api = _make_api(listeners['decoys'])
+    assert api.detect_process() is None
+    api.close_connections()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-q"])
@@ -0,0 +1,85 @@
+"""
+Test Script for Process Sampler
+Verifies /proc parsing, CPU% deltas and process classification
+against a fake procfs tree.
+"""
+from process_sampler import LinuxSamplerBackend, ProcessSampler, classify_process
+
+PAGE = 4096
+
+
+def _write_proc(root, pid, comm, cmdline, utime, stime, rss_pages, start=1000):
+    proc = root / str(pid)
+    proc.mkdir(parents=True, exist_ok=True)
+    # Fields 3..22: state ppid pgrp session tty tpgid flags minflt cminflt majflt cmajflt
+    #               utime stime cutime cstime priority nice threads itrealvalue starttime
+    rest = ['S', '1', '1', '1', '0', '-1', '0', '0', '0', '0', '0',
+            str(utime), str(stime), '0', '0', '20', '0', '8', '0', str(start), '0']
+    (proc / 'stat').write_text(f"{pid} ({comm}) {' '.join(rest)}\n")
+    (proc / 'statm').write_text(f"100000 {rss_pages} 500 10 0 2000 0\n")
+    (proc / 'cmdline').write_bytes(b'\0'.join(a.encode() for a in cmdline) + b'\0')
+
+
+def _fake_proc(root, renderer_utime=0):
+    _write_proc(root, 100, 'antigravity', ['/opt/Antigravity/antigravity'], 500, 100, 51200)
+    _write_proc(root, 101, 'antigravity', ['/opt/Antigravity/antigravity', '--type=renderer'],
+                renderer_utime, 0, 102400)
+    _write_proc(root, 102, 'antigravity', ['/opt/Antigravity/antigravity', '--type=utility',
+                                           '--utility-sub-type=node.mojom.NodeService'], 0, 0, 25600)
+    _write_proc(root, 103, 'language_server', ['/opt/Antigravity/language_server_linux_x64',
+                                               '--csrf_token', 'abc'], 0, 0, 12800)
+    # Unrelated process with a tricky comm
+    _write_proc(root, 200, 'bash) S 1 (x', ['/bin/bash'], 0, 0, 1000)
+    return root
+
+
+def test_linux_sampling(tmp_path):
+    root = _fake_proc(tmp_path)
+    sampler = ProcessSampler(LinuxSamplerBackend(str(root), clk_tck=100, page_size=PAGE), cpu_count=2)
+
+    procs = sampler.sample(now=10.0)
+    by_id = {p['Id']: p for p in procs}
+    assert set(by_id) == {'100', '101', '102', '103'}
+    assert by_id['101']['Type'] == 'Renderer'
+    assert by_id['102']['Type'] == 'Extension Host'
+    assert by_id['103']['Type'] == 'Language Server'
+    assert by_id['100']['Type'] == 'Main'
+    assert by_id['101']['Mem'] == 102400 * PAGE // (1024 * 1024)
+    assert procs[0]['Id'] == '101'  # Largest first
+    assert all(p['CPU'] == 0 for p in procs)  # No previous sample yet
+
+    # Renderer burns 1 CPU-second (100 ticks) over 2 wall seconds on 2 cores = 25%
+    _fake_proc(tmp_path, renderer_utime=100)
+    procs = sampler.sample(now=12.0)
+    by_id = {p['Id']: p for p in procs}
+    assert by_id['101']['CPU'] == 25.0
+    assert by_id['100']['CPU'] == 0
+
+
+def test_pid_reuse_resets_cpu(tmp_path):
+    root = tmp_path
+    _write_proc(root, 300, 'antigravity', ['antigravity', '--type=renderer'], 1000, 0, 100)
+    sampler = ProcessSampler(LinuxSamplerBackend(str(root), clk_tck=100, page_size=PAGE), cpu_count=1)
+    sampler.sample(now=0.0)
+
+    # Same pid, new process (different start time): no bogus delta, re-classified
+    _write_proc(root, 300, 'antigravity', ['antigravity', '--type=gpu-process'], 5, 0, 100, start=9999)
+    procs = sampler.sample(now=1.0)
+    assert procs[0]['CPU'] == 0
+    assert procs[0]['Type'] == 'GPU'
+
+
+def test_classify_process():
+    assert classify_process('Antigravity.exe --type=extensionHost') == 'Extension Host'
+    assert classify_process('Antigravity.exe --type=crashpad-handler') == 'Crashpad'
+    assert classify_process('language_server_windows_x64.exe --enable_lsp') == 'Language Server'
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_linux_sampling, test_pid_reuse_resets_cpu):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    test_classify_process()
+    print("✅ Process sampler tests passed!")
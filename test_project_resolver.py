@@ -0,0 +1,90 @@
+"""
+Test Script for Project Resolver
+Verifies strategy order, per-session caching, and invalidation of the
+GitHub-dir scan on the parent's mtime.
+"""
+import os
+
+from project_resolver import ProjectResolver, UNKNOWN_PROJECT
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _resolver(github, window=None):
+    calls = {'window': 0, 'scan': 0}
+    clock = _Clock()
+
+    def window_fn():
+        calls['window'] += 1
+        return window
+
+    def scan_fn(path):
+        calls['scan'] += 1
+        dirs = [(d.stat().st_mtime, d.name) for d in path.iterdir() if d.is_dir()]
+        return max(dirs)[1] if dirs else None
+
+    return ProjectResolver(github, window_fn=window_fn, scan_fn=scan_fn, clock=clock), calls, clock
+
+
+def test_strategy_order_and_provenance(tmp_path):
+    (tmp_path / 'folder-proj').mkdir()
+    resolver, calls, _ = _resolver(tmp_path, window='window-proj')
+
+    assert resolver.resolve('repo/abc') == 'repo'
+    assert resolver.explain('repo/abc').source == 'session_path'
+    assert resolver.resolve('s1', content_hint='content-proj') == 'content-proj'
+    assert resolver.explain('s1').source == 'file_content'
+    assert resolver.resolve('s2') == 'window-proj'
+    assert resolver.explain('s2').describe() == "window-proj (via active window)"
+    assert resolver.resolve('s3', skip_vscode=True) == 'folder-proj'
+    assert resolver.explain('s3').source == 'recent_folder'
+    assert resolver.names == {'repo/abc': 'repo', 's1': 'content-proj', 's2': 'window-proj', 's3': 'folder-proj'}
+
+    empty, _, _ = _resolver(tmp_path / 'missing')
+    assert empty.resolve('s4', skip_vscode=True) == UNKNOWN_PROJECT
+
+
+def test_warm_cache_and_invalidation(tmp_path):
+    old = tmp_path / 'old-proj'
+    old.mkdir()
+    os.utime(old, (1, 1))
+    resolver, calls, clock = _resolver(tmp_path)
+
+    assert resolver.resolve('s1', skip_vscode=True) == 'old-proj'
+    for _ in range(100):
+        resolver.resolve('s1', skip_vscode=True)
+    assert calls['scan'] == 1 and resolver.stats['hits'] == 100
+
+    # A stable attribution is never recomputed
+    resolver.resolve('s2', content_hint='pinned')
+    clock.now += 10_000
+    assert resolver.resolve('s2') == 'pinned'
+
+    # New project folder changes the parent's mtime -> rescan once the entry expires
+    (tmp_path / 'new-proj').mkdir()
+    os.utime(tmp_path, (clock.now, clock.now))
+    assert resolver.resolve('s1', skip_vscode=True) == 'new-proj'
+    assert calls['scan'] == 2
+
+    # Content evidence upgrades a weak guess immediately
+    assert resolver.resolve('s1', skip_vscode=True, content_hint='real-proj') == 'real-proj'
+
+    resolver.invalidate('s1')
+    assert 's1' not in resolver.names and 's2' in resolver.names
+    resolver.invalidate()
+    assert not resolver.names
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_strategy_order_and_provenance, test_warm_cache_and_invalidation):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Project resolver tests passed!")
@@ -3,6 +3,9 @@ Test Script for Quota Manager
 Verifies rolling window resets and tier switching.
 """
 import time
+
+import pytest
+
 from quota_manager import QuotaManager
 
 def test_quota_manager():
@@ -58,5 +61,113 @@ def test_quota_manager():
     
     print("\n✅ Verification Passed!")
 
+def test_bucketed_window():
+    """Agentic calls must be stored as one bucket, not one entry per unit."""
+    qm = QuotaManager()
+    qm.usage_history.clear()
+    qm.set_tier("Pro")
+    
+    for _ in range(20):
+        qm.add_usage(usage_type="agentic")
+    
+    buckets = qm.usage_history.buckets()
+    assert len(buckets) <= 20, f"Expected <=20 buckets, got {len(buckets)}"
+    assert sum(c for _, c in buckets) == 100
+    
+    status = qm.get_status()
+    if status['source'] == 'rolling_window':
+        assert status['used'] == 100
+        assert status['remaining'] == 0
+        assert 0 < status['next_reset_seconds'] <= 5 * 3600
+    
+    # Recovery lookup: 60 units 4h ago, 60 units 1h ago, capacity 100
+    qm.usage_history.clear()
+    now = time.time()
+    qm.usage_history.append(now - 4 * 3600, 60)
+    qm.usage_history.append(now - 1 * 3600, 60)
+    recover = qm.usage_history.time_to_recover(now, 5 * 3600, 100)
+    assert abs(recover - 3600) < 1, f"Expected ~1h, got {recover}"
+    
+    # Out-of-order append keeps buckets sorted
+    qm.usage_history.append(now - 2 * 3600, 1)
+    assert [c for _, c in qm.usage_history.buckets()] == [60, 1, 60]
+    assert qm.usage_history.used == 121
+    
+    # Leave a clean window behind
+    qm.usage_history.clear()
+    qm.save_state(force=True)
+
+
+def _wait_idle(qm, timeout=5):
+    deadline = time.time() + timeout
+    while qm._api_refreshing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_api_cache_never_blocks():
+    """get_status serves the cached snapshot while one background refresh runs."""
+    import threading
+    from datetime import datetime
+    import quota_manager as qm_module
+    if not qm_module.HAS_API:
+        pytest.skip("antigravity_api not importable")
+    from antigravity_api import QuotaSnapshot, ModelQuotaInfo
+    
+    calls = []
+    release = threading.Event()
+    
+    def slow_fetch():
+        calls.append(time.time())
+        release.wait(5)
+        model = ModelQuotaInfo("Gemini 3 Pro (High)", "m", 0.25, 25.0, False, None, 600, "10m")
+        return QuotaSnapshot(datetime.now(), [model], None)
+    
+    original = qm_module.antigravity_api.fetch_quota
+    qm_module.antigravity_api.fetch_quota = slow_fetch
+    try:
+        qm = QuotaManager()
+        
+        # Cold cache: falls back immediately instead of waiting on the API
+        start = time.time()
+        for _ in range(5):
+            status = qm.get_status()
+        assert time.time() - start < 0.5
+        assert status['source'] == 'rolling_window'
+        assert len(calls) == 1, "Only one refresh may be in flight"
+        
+        release.set()
+        deadline = time.time() + 5
+        while qm.get_status()['source'] != 'antigravity_api' and time.time() < deadline:
+            time.sleep(0.01)
+        status = qm.get_status()
+        assert status['percent_remaining'] == 25.0
+        assert status['data_age_seconds'] <= 1 and not status['is_stale']
+        
+        # add_usage marks stale but keeps serving the snapshot
+        release.clear()
+        qm.add_usage()
+        status = qm.get_status()
+        assert status['source'] == 'antigravity_api' and status['is_stale']
+        release.set()
+        _wait_idle(qm)
+        assert not qm._api_stale  # That fetch began after the usage
+        
+        # Usage added while a fetch is in flight isn't in its snapshot: stay stale
+        release.clear()
+        fetches = len(calls)
+        qm.get_api_quota(force_refresh=True)
+        deadline = time.time() + 5
+        while len(calls) == fetches and time.time() < deadline:
+            time.sleep(0.01)
+        qm.add_usage()
+        release.set()
+        _wait_idle(qm)
+        assert qm._api_stale
+    finally:
+        qm_module.antigravity_api.fetch_quota = original
+
+
 if __name__ == "__main__":
     test_quota_manager()
+    test_bucketed_window()
+    test_api_cache_never_blocks()
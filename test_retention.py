@@ -0,0 +1,102 @@
+"""
+Test Script for Retention Policy Engine
+Verifies age/size/budget/keep-N planning, protection of the active session,
+and that the background engine re-checks files before acting.
+"""
+import os
+import time
+from pathlib import Path
+
+from retention import RetentionEngine, RetentionPolicy, format_report, plan
+from session_scanner import SessionRecord
+
+NOW = 1_700_000_000
+DAY = 86400
+
+
+def _session(sid, days_old, size_mb, project, directory=Path('.'), compressed=False):
+    return SessionRecord(sid, int(size_mb * 1024 * 1024), NOW - days_old * DAY, project_name=project,
+                         compressed=compressed, path=directory / (sid + ('.pb.gz' if compressed else '.pb')))
+
+
+def _by_id(actions):
+    return {a.session_id: (a.action, a.reason) for a in actions}
+
+
+def test_plan_rules():
+    sessions = [
+        _session('active', 40, 50, 'alpha'),
+        _session('a1', 1, 1, 'alpha'),
+        _session('a2', 10, 1, 'alpha'),
+        _session('a3', 40, 1, 'alpha'),
+        _session('b1', 5, 30, 'beta'),
+        _session('b2', 6, 2, 'beta', compressed=True),
+        _session('b3', 8, 25, 'beta', compressed=True),
+        _session('u1', 2, 0.05, None),
+    ]
+    policy = RetentionPolicy(archive_after_days=3, archive_min_size=100_000, delete_after_days=30,
+                             max_session_mb=20, keep_per_project=1, min_idle_hours=24)
+    result = _by_id(plan(sessions, policy, active_ids=['active'], now=NOW))
+
+    assert 'active' not in result  # Never touched, even though old and huge
+    assert 'a1' not in result  # Newest of its project
+    assert result['a2'] == ('archive', 'age')
+    assert result['a3'] == ('delete', 'age')
+    assert result['b1'] == ('archive', 'age')  # Too large, but the newest 'beta' is only archived
+    assert 'b2' not in result  # Already compressed, below every delete rule
+    assert result['b3'] == ('delete', 'size')
+    assert 'u1' not in result  # Too small to archive, protected as newest 'Unknown'
+
+
+def test_plan_disk_budget_deletes_oldest_first():
+    sessions = [_session(f"s{i}", i + 2, 10, 'p') for i in range(6)]  # 60 MB total
+    policy = RetentionPolicy(archive_after_days=None, disk_budget_mb=35, keep_per_project=2)
+    actions = plan(sessions, policy, active_ids=[], now=NOW)
+
+    assert [a.session_id for a in actions] == ['s5', 's4', 's3']
+    assert all(a.reason == 'budget' for a in actions)
+    assert "Would delete 3 sessions" in format_report(actions, sessions, policy)
+
+
+def test_engine_rechecks_and_never_touches_active(tmp_path):
+    old = time.time() - 40 * DAY
+    paths = {}
+    for sid in ('keep', 'gone', 'changed', 'current'):
+        path = tmp_path / f"{sid}.pb"
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (old, old))
+        paths[sid] = path
+    index = [SessionRecord(sid, 1000, os.stat(p).st_mtime, path=p, project_name='p') for sid, p in paths.items()]
+    index[0].modified += 1  # 'keep' is the newest -> protected by keep_per_project
+    os.utime(paths['keep'], (old + 1, old + 1))
+
+    state = {'active': ['current']}
+    policy = RetentionPolicy(enabled=True, archive_after_days=None, delete_after_days=30, keep_per_project=1)
+    engine = RetentionEngine(lambda: index, lambda: state['active'], lambda: policy)
+
+    # 'changed' is written to between planning and acting
+    paths['changed'].write_bytes(b"y" * 2000)
+    result = engine.run_pass()
+
+    assert result['deleted'] == 1
+    assert not paths['gone'].exists()
+    assert paths['keep'].exists() and paths['changed'].exists() and paths['current'].exists()
+
+    # An unchanged index is not re-planned; nothing left to do
+    assert engine.run_pass()['deleted'] == 0
+
+
+def test_policy_roundtrip_ignores_unknown_keys():
+    policy = RetentionPolicy(disk_budget_mb=500, keep_per_project=5)
+    restored = RetentionPolicy.from_dict(dict(policy.to_dict(), obsolete_key=1))
+    assert restored == policy
+
+
+if __name__ == "__main__":
+    import tempfile
+    test_plan_rules()
+    test_plan_disk_budget_deletes_oldest_first()
+    test_policy_roundtrip_ignores_unknown_keys()
+    with tempfile.TemporaryDirectory() as tmp:
+        test_engine_rechecks_and_never_touches_active(Path(tmp))
+    print("✅ Retention tests passed!")
@@ -0,0 +1,85 @@
+"""
+Test Script for Session Index
+Verifies term matching (substring, word prefix, id prefix), newest-first
+ordering, incremental updates, and first-message extraction.
+"""
+import gzip
+
+from session_index import SessionIndex, read_title
+from session_scanner import SessionRecord
+
+
+def _index(tmp_path):
+    index = SessionIndex(titles_file=tmp_path / 'titles.json')
+    index.titles.update({
+        'aaaa-1111': "Fix the flaky discovery test",
+        'bbbb-2222': "Add retention policy engine",
+        'cccc-3333': "Refactor discovery backoff",
+    })
+    sessions = [SessionRecord('cccc-3333', modified=300.0), SessionRecord('bbbb-2222', modified=200.0),
+                SessionRecord('aaaa-1111', modified=100.0)]
+    index.update(sessions, {'aaaa-1111': 'context-monitor', 'bbbb-2222': 'context-monitor', 'cccc-3333': 'web-app'})
+    return index, sessions
+
+
+def test_search_terms(tmp_path):
+    index, _ = _index(tmp_path)
+    assert index.search('') == ['cccc-3333', 'bbbb-2222', 'aaaa-1111']
+    assert index.search('discovery') == ['cccc-3333', 'aaaa-1111']
+    assert index.search('cover') == ['cccc-3333', 'aaaa-1111']  # Substring inside a word
+    assert index.search('DISCO context') == ['aaaa-1111']  # Every term must match
+    assert index.search('re') == ['cccc-3333', 'bbbb-2222']  # Short terms match word prefixes
+    assert index.search('bbbb-2') == ['bbbb-2222']  # Id prefix
+    assert index.search('web-app') == ['cccc-3333']
+    assert index.search('nothing') == []
+    assert index.search('discovery', limit=1) == ['cccc-3333']
+
+
+def test_incremental_update(tmp_path):
+    index, sessions = _index(tmp_path)
+    version = index.version
+    index.update(sessions, {'aaaa-1111': 'context-monitor', 'bbbb-2222': 'context-monitor', 'cccc-3333': 'web-app'})
+    assert index.version == version  # Nothing changed
+
+    # Project renamed, one session deleted, one added
+    sessions = [SessionRecord('dddd-4444', modified=400.0)] + sessions[1:]
+    index.update(sessions, {'aaaa-1111': 'tools', 'bbbb-2222': 'context-monitor'})
+    assert index.search('web') == []
+    assert index.search('tools') == ['aaaa-1111']
+    assert index.search('context') == ['bbbb-2222']
+    assert index.search('') == ['dddd-4444', 'bbbb-2222', 'aaaa-1111']
+    assert 'refactor' not in index._word_sessions  # Vocabulary of the removed session is dropped
+    assert 'cccc-3333' not in index.titles  # ...and so is its title
+
+
+def test_read_title(tmp_path):
+    pb = tmp_path / 's.pb'
+    pb.write_bytes(b'\x0a\x24\x08\x01abc-123\x12\x05\x1a\x03idx\x22\x40Please fix the flaky test in the '
+                   b'discovery module\x2a\x02\x08\x01')
+    assert read_title(pb).startswith("Please fix the flaky test in the discovery module")
+
+    gz = tmp_path / 's.pb.gz'
+    gz.write_bytes(gzip.compress(pb.read_bytes()))
+    assert read_title(gz) == read_title(pb)
+    assert read_title(tmp_path / 'missing.pb') == ""
+
+
+def test_titles_persist(tmp_path):
+    index, sessions = _index(tmp_path)
+    index.save_titles()
+    assert SessionIndex(titles_file=tmp_path / 'titles.json').titles == index.titles
+
+    # Titles of deleted sessions are pruned from the file, even with no new titles to read
+    index.update(sessions[:2], {})
+    index.load_titles_async(sessions[:2])
+    index._title_thread.join()
+    assert set(SessionIndex(titles_file=tmp_path / 'titles.json').titles) == {'cccc-3333', 'bbbb-2222'}
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_search_terms, test_incremental_update, test_read_title, test_titles_persist):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Session index tests passed!")
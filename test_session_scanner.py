@@ -0,0 +1,101 @@
+"""
+Test Script for Session Scanner
+Verifies the incremental scan: top-k order, the directory mtime
+short-circuit with hot re-stats, the full-scan backstop, change reports and
+in-place record updates.
+"""
+import os
+
+from session_scanner import SessionScanner
+
+
+def _touch(path, mtime, data=b"x"):
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+
+
+def _ids(sessions):
+    return [s.id for s in sessions]
+
+
+def test_top_k_and_full_order(tmp_path):
+    for i in range(10):
+        _touch(tmp_path / f"s{i}.pb", 1_000 + i)
+    (tmp_path / "notes.txt").write_text("ignored")
+    (tmp_path / "s99.pb.tmp").write_bytes(b"partial")
+    scanner = SessionScanner(tmp_path, top_k=3)
+
+    assert _ids(scanner.scan()) == ['s9', 's8', 's7']
+    assert _ids(scanner.sessions()) == [f"s{i}" for i in range(9, -1, -1)]
+    assert scanner.stats['full_scans'] == 1
+
+
+def test_unchanged_directory_only_restats_hot_sessions(tmp_path):
+    for i in range(6):
+        _touch(tmp_path / f"s{i}.pb", 1_000 + i)
+    clock = [0.0]
+    scanner = SessionScanner(tmp_path, top_k=2, full_scan_interval=30, clock=lambda: clock[0])
+    scanner.scan()
+    scanner.sessions()  # Builds the full order, which is then kept up to date
+    dir_mtime = os.stat(tmp_path).st_mtime_ns
+
+    # Appends don't touch the directory mtime; a hot session is still picked up
+    _touch(tmp_path / "s4.pb", 2_000, b"longer")
+    first = scanner.scan()
+    assert _ids(first) == ['s4', 's5'] and first[0].size == 6
+    assert scanner.stats == {'full_scans': 1, 'short_circuits': 1}
+    assert _ids(scanner.sessions())[:3] == ['s4', 's5', 's3']
+
+    # Pinned (selected) sessions are re-stat'ed too; other cold writes wait for the backstop
+    _touch(tmp_path / "s0.pb", 3_000)
+    _touch(tmp_path / "s1.pb", 3_100)
+    os.utime(tmp_path, ns=(dir_mtime, dir_mtime))
+    assert _ids(scanner.scan(pinned=('s0',))) == ['s0', 's4']
+    clock[0] = 31.0
+    assert _ids(scanner.scan()) == ['s1', 's0']
+    assert scanner.stats['full_scans'] == 2
+    assert _ids(scanner.sessions()) == ['s1', 's0', 's4', 's5', 's3', 's2']
+
+
+def test_reports_removed_and_renamed_sessions(tmp_path):
+    for i in range(3):
+        _touch(tmp_path / f"s{i}.pb", 1_000 + i)
+    scanner = SessionScanner(tmp_path, top_k=5)
+    scanner.scan()
+    first = scanner.records['s0']
+
+    (tmp_path / "s2.pb").unlink()
+    (tmp_path / "s1.pb").rename(tmp_path / "s1.pb.xz")
+    assert _ids(scanner.scan()) == ['s1', 's0']
+    assert scanner.removed == {'s2': tmp_path / "s2.pb"}
+    assert scanner.moved == {'s1': tmp_path / "s1.pb"}
+    assert scanner.records['s1'].compressed and scanner.records['s0'] is first  # Unchanged record reused
+
+    scanner.scan()
+    assert scanner.removed == {} and scanner.moved == {}
+
+
+def test_records_are_updated_in_place(tmp_path):
+    _touch(tmp_path / "s0.pb", 1_000)
+    clock = [0.0]
+    scanner = SessionScanner(tmp_path, top_k=5, clock=lambda: clock[0])
+    record = scanner.scan()[0]
+    assert not hasattr(record, '__dict__') and record._path is None  # Path built on first use
+    record.token_data = {'tokens_used': 1}
+
+    _touch(tmp_path / "s0.pb", 2_000, b"grown")
+    clock[0] = 60.0  # Full scan
+    assert scanner.scan()[0] is record and scanner.records['s0'] is record
+    assert (record.size, record.modified, record.estimated_tokens) == (5, 2_000, 1)
+    assert record.token_data is None  # Stale metadata is cleared
+    assert record.pb_path == tmp_path / "s0.pb"
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_top_k_and_full_order, test_unchanged_directory_only_restats_hot_sessions,
+                 test_reports_removed_and_renamed_sessions, test_records_are_updated_in_place):
+        with tempfile.TemporaryDirectory() as d:
+            test(Path(d))
+    print("✅ Session scanner tests passed!")
@@ -0,0 +1,114 @@
+"""
+Test Script for Session Tracker
+Verifies active-session selection over a newest-first scan and per-session
+state (delta bases, alert throttling).
+"""
+from datetime import datetime
+
+from data_service import DataService
+from session_scanner import SessionRecord
+from session_tracker import SessionTracker
+
+
+def _sessions(now, ages):
+    return [SessionRecord(f"s{i}", modified=now - age) for i, age in enumerate(ages)]
+
+
+def test_select_active_window():
+    now = 10_000.0
+    sessions = _sessions(now, [5, 60, 400, 2_000, 3_000])
+    tracker = SessionTracker(window=900, max_sessions=6)
+
+    picked = tracker.select(sessions, 's1', now)
+    assert [s.id for s in picked] == ['s0', 's2']
+    assert tracker.active == ['s1', 's0', 's2']
+
+    # Current session outside the window is still tracked first
+    assert [s.id for s in tracker.select(sessions, 's4', now)] == ['s0', 's1', 's2']
+
+    # Cap includes the current session
+    tracker.max_sessions = 2
+    assert [s.id for s in tracker.select(sessions, 's1', now)] == ['s0']
+
+    tracker.window = 0
+    assert tracker.select(sessions, 's1', now) == [] and tracker.active == ['s1']
+
+
+def test_selection_stops_at_first_old_session():
+    class Sessions(list):
+        visited = 0
+
+        def __iter__(self):
+            for s in list.__iter__(self):
+                Sessions.visited += 1
+                yield s
+
+    now = 10_000.0
+    sessions = Sessions(_sessions(now, [1, 2] + [5_000 + i for i in range(10_000)]))
+    SessionTracker(window=900).select(sessions, 's0', now)
+    assert Sessions.visited == 3
+
+
+def test_per_session_state():
+    tracker = SessionTracker()
+    tracker.state('a').last_tokens = 1_000
+    assert tracker.state('b').last_tokens == 0
+
+    tracker.select([SessionRecord('b', modified=99.0)], 'a', now=100.0)
+    tracker.record(SessionRecord('a', modified=100.0), 42, 'proj-a')
+    tracker.record(SessionRecord('b', modified=99.0), 85, None)
+    assert [(s.session_id, s.percent, s.project) for s in tracker.snapshot()] == [('a', 42, 'proj-a'), ('b', 85, None)]
+
+    assert tracker.should_alert('b', 1_000, 300)
+    assert not tracker.should_alert('b', 1_100, 300)
+    assert tracker.should_alert('a', 1_100, 300)  # Throttled independently
+    assert tracker.should_alert('b', 1_400, 300)
+
+
+def _record(tracker, service, sid, tokens, source):
+    """One sample in the order the monitor records it: analytics, then history."""
+    last_tokens = tracker.delta_base(sid, source)
+    service.save_analytics(tokens, last_tokens, 'proj', 'model')
+    service.save_history(sid, tokens, last_tokens, throttle_seconds=3600)
+    tracker.state(sid).last_tokens = tokens
+
+
+def _today_total(service):
+    return service.load_analytics()['daily'][datetime.now().strftime('%Y-%m-%d')]['total']
+
+
+def test_alternating_current_session_in_api_mode(tmp_path):
+    """Two parallel sessions swap the current role each poll while the API reads 600k."""
+    service = DataService()
+    service.history_file = tmp_path / 'history.json'
+    service.analytics_file = tmp_path / 'analytics.json'
+    tracker = SessionTracker()
+    estimates = {'a': 200_000, 'b': 150_000}
+
+    for poll in range(4):
+        current, background = ('a', 'b') if poll % 2 == 0 else ('b', 'a')
+        # Both sessions are recorded from their file estimates; 600k only drives the gauge
+        for sid in (current, background):
+            _record(tracker, service, sid, estimates[sid] + poll * 1_000, 'estimate')
+    assert _today_total(service) == 6_000
+    assert [p['delta'] for p in service.load_history()['a']] == [0, 1_000, 1_000, 1_000]
+
+    # Mixing sources in one series never counts the gap between them as usage
+    tracker = SessionTracker()
+    for poll in range(4):
+        current, background = ('a', 'b') if poll % 2 == 0 else ('b', 'a')
+        _record(tracker, service, current, 600_000, 'api')
+        _record(tracker, service, background, estimates[background] + poll * 1_000, 'estimate')
+    assert _today_total(service) == 6_000
+    assert tracker.delta_base('a', 'estimate') == 203_000 and tracker.state('a').source == 'estimate'
+
+
+if __name__ == "__main__":
+    test_select_active_window()
+    test_selection_stops_at_first_old_session()
+    test_per_session_state()
+    import tempfile
+    from pathlib import Path
+    with tempfile.TemporaryDirectory() as d:
+        test_alternating_current_session_in_api_mode(Path(d))
+    print("✅ Session tracker tests passed!")
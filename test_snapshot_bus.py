@@ -0,0 +1,108 @@
+"""
+Test Script for Snapshot Bus
+Verifies that hidden views are skipped and catch up when mapped, that
+destroyed views are unsubscribed, and that metrics are computed lazily,
+once per snapshot.
+"""
+from types import SimpleNamespace
+
+from snapshot_bus import Snapshot, SnapshotBus
+
+
+class Widget:
+    """Just the Tk widget calls the bus uses."""
+
+    def __init__(self, viewable=True):
+        self.viewable = viewable
+        self.exists = True
+        self.handlers = []
+
+    def winfo_exists(self):
+        return self.exists
+
+    def winfo_viewable(self):
+        return self.viewable
+
+    def bind(self, sequence, handler, add=None):
+        self.handlers.append(handler)
+
+    def map(self):
+        self.viewable = True
+        for handler in self.handlers:
+            handler(SimpleNamespace(widget=self))
+
+
+def _snap(percent, session_id='s1'):
+    return Snapshot(session_id, 'proj', percent, percent * 10, 1000 - percent * 10, 1000, 0)
+
+
+def test_views_update_only_while_visible():
+    bus = SnapshotBus()
+    shown, hidden = Widget(), Widget(viewable=False)
+    seen = {'shown': [], 'hidden': []}
+    bus.subscribe(lambda s: seen['shown'].append(s.percent), shown)
+    bus.subscribe(lambda s: seen['hidden'].append(s.percent), hidden)
+
+    bus.publish(_snap(10))
+    bus.publish(_snap(20))
+    assert seen == {'shown': [10, 20], 'hidden': []}
+
+    hidden.map()  # Catches up on the latest snapshot only
+    hidden.map()  # ...once
+    assert seen['hidden'] == [20]
+
+    hidden.exists = False
+    bus.publish(_snap(30))
+    assert seen == {'shown': [10, 20, 30], 'hidden': [20]}
+    assert len(bus._subscriptions) == 1
+    assert bus.stats['skipped'] == 2
+
+
+def test_fresh_views_and_unsubscribe():
+    bus = SnapshotBus()
+    bus.publish(_snap(10))
+    tab = Widget(viewable=False)
+    calls = []
+    unsubscribe = bus.subscribe(calls.append, tab, fresh=True)
+    tab.map()
+    assert calls == []  # Rendered from current state already
+
+    unsubscribe()
+    bus.publish(_snap(20))
+    assert calls == []
+
+
+def test_metrics_are_lazy_and_shared():
+    bus = SnapshotBus()
+    computed = []
+    bus.register_metric('eta', lambda s: computed.append(s.percent) or s.percent * 2)
+    hidden = Widget(viewable=False)
+    bus.subscribe(lambda s: s.metric('eta'), hidden)
+
+    bus.publish(_snap(10))
+    assert computed == []  # Nobody visible asked for it
+
+    results = []
+    bus.subscribe(lambda s: results.append(s.metric('eta')), Widget())
+    bus.subscribe(lambda s: results.append(s.metric('eta')))
+    bus.publish(_snap(20))
+    hidden.map()
+    assert results == [40, 40] and computed == [20]
+    assert bus.stats['computed'] == 1
+
+
+def test_failing_view_does_not_block_others():
+    bus = SnapshotBus()
+    calls = []
+    bus.subscribe(lambda s: 1 / 0, Widget())
+    bus.subscribe(calls.append, Widget())
+    bus.publish(_snap(10))
+    assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    test_views_update_only_while_visible()
+    test_fresh_views_and_unsubscribe()
+    test_metrics_are_lazy_and_shared()
+    test_failing_view_does_not_block_others()
+    print("✅ Snapshot bus tests passed!")
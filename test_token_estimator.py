@@ -0,0 +1,118 @@
+"""
+Test Script for Token Estimator
+Verifies payload extraction, the estimators, the per-model fallback chain,
+and that incremental scans of a growing file match a full scan.
+"""
+import base64
+import gzip
+import os
+import random
+
+from token_estimator import (BPEEstimator, BytesEstimator, CharClassEstimator, TokenEngine,
+                             estimator_for, extract_text)
+
+
+def _protobuf_like(rnd, records=300):
+    words = [b'hello', b'world', b'def main():', b'tokens', b'12345', 'été'.encode(), b'\n']
+    out = bytearray()
+    for _ in range(records):
+        text = b' '.join(rnd.choice(words) for _ in range(rnd.randint(1, 40)))
+        out += bytes(rnd.randrange(0, 9) for _ in range(rnd.randint(2, 6)))  # tag / varint framing
+        out += text
+    return bytes(out)
+
+
+def test_extract_text_drops_framing():
+    data = b'\x0a\x05\x08\x01Hello world, this is text\x12\x03abc\x1a\x02\x10\x00more text here'
+    assert extract_text(data) == b'Hello world, this is text\nmore text here\n'
+    assert extract_text(b'\x00\x01\x02') == b''
+
+
+def test_estimators():
+    assert BytesEstimator()._count(b'x' * 400) == 100
+    charclass = CharClassEstimator()
+    prose = b'The quick brown fox jumps over the lazy dog. ' * 100
+    assert 0.15 < charclass.count(prose) / len(prose) < 0.35
+    assert charclass.count(b'{}();' * 100) > charclass.count(b'abcde' * 100)
+    assert charclass.cost_per_mb is not None
+
+
+def test_bpe_and_fallback(tmp_path):
+    vocab = tmp_path / 'vocab.tiktoken'
+    tokens = [bytes([b]) for b in range(256)] + [b'he', b'll', b'hell', b'hello', b' w', b' wo', b' world']
+    vocab.write_bytes(b''.join(base64.b64encode(t) + b' %d\n' % rank for rank, t in enumerate(tokens)))
+    bpe = BPEEstimator(vocab_file=vocab)
+    assert bpe.count(b'hello world') == 2
+    assert bpe.count(b'hellx') == 2  # he + ll -> hell, then no rank for 'hellx'
+
+    missing = BPEEstimator(vocab_file=tmp_path / 'missing.tiktoken')
+    assert not missing.available
+    assert estimator_for('GPT-OSS 120B').name in ('bpe', 'charclass')
+    assert estimator_for('Gemini 3 Flash').name == 'charclass'
+    assert estimator_for('Custom').name == 'bytes'
+    assert estimator_for('Gemini 3 Flash', override='bytes').name == 'bytes'
+
+
+def test_incremental_matches_full_scan(tmp_path):
+    rnd = random.Random(11)
+    data = _protobuf_like(rnd)
+
+    whole = tmp_path / 'whole.pb'
+    whole.write_bytes(data)
+    expected = TokenEngine().estimate(whole, override='charclass')
+    assert 0 < expected['payload_bytes'] < len(data)
+
+    engine = TokenEngine(block=1024)  # Larger than any text run, so no run is force-split
+    growing = tmp_path / 'growing.pb'
+    growing.write_bytes(b'')
+    pos = 0
+    while pos < len(data):
+        step = rnd.randint(1, 1500)
+        with open(growing, 'ab') as f:
+            f.write(data[pos:pos + step])
+        pos += step
+        engine.estimate(growing, override='charclass')
+    result = engine.estimate(growing, override='charclass')
+    assert result['payload_bytes'] == expected['payload_bytes']
+    assert abs(result['tokens'] - expected['tokens']) <= 1  # Float sums in a different order
+
+
+def test_compressed_files_scan_once_and_files_lock_separately(tmp_path):
+    data = _protobuf_like(random.Random(5))
+    archived = tmp_path / 'old.pb.gz'
+    with gzip.open(archived, 'wb') as f:
+        f.write(data * 20)  # Decompresses to far more than its size on disk
+    engine = TokenEngine()
+    scans = []
+    scan = engine._scan
+    engine._scan = lambda *args: scans.append(1) or scan(*args)
+
+    first = engine.estimate(archived, override='charclass')
+    assert engine.estimate(archived, override='charclass') == first
+    assert engine.estimate(archived, override='charclass') == first
+    assert len(scans) == 1
+
+    # A rewritten archive is scanned again from the start
+    with gzip.open(archived, 'wb') as f:
+        f.write(data)
+    os.utime(archived, (1, 1))
+    assert engine.estimate(archived, override='charclass')['payload_bytes'] < first['payload_bytes']
+    assert len(scans) == 2
+
+    # A scan in progress on one file doesn't hold up estimates for another
+    other = tmp_path / 'live.pb'
+    other.write_bytes(data)
+    with engine._files[str(archived)]['lock']:
+        assert engine.estimate(other, override='charclass')['payload_bytes'] > 0
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    test_extract_text_drops_framing()
+    test_estimators()
+    for test in (test_bpe_and_fallback, test_incremental_matches_full_scan,
+                 test_compressed_files_scan_once_and_files_lock_separately):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Token estimator tests passed!")
@@ -0,0 +1,98 @@
+"""
+Test Script for Workspace Index
+Verifies root discovery, single-pass scoring, and that incremental scans
+of a growing file count exactly what a full scan would.
+"""
+import gzip
+import random
+
+from workspace_index import WorkspaceIndex, discover_roots
+
+
+def _layout(tmp_path):
+    github = tmp_path / 'GitHub'
+    for name in ('context-monitor', 'context', 'web-app'):
+        (github / name).mkdir(parents=True)
+    repo = tmp_path / 'work' / 'tools'
+    (repo / '.git').mkdir(parents=True)
+    brain = tmp_path / 'brain' / 'sess-1'
+    brain.mkdir(parents=True)
+    (brain / 'task.md').write_text(f"Edit `{repo / 'src' / 'main.py'}` (see https://example.com/a/b)\n")
+    return github, tmp_path / 'brain'
+
+
+def test_discover_roots(tmp_path):
+    github, brain = _layout(tmp_path)
+    (tmp_path / 'home-proj').mkdir()
+    roots = discover_roots(github, [tmp_path / 'home-proj'], brain)
+    assert set(roots.values()) == {'context-monitor', 'context', 'web-app', 'home-proj', 'tools'}
+
+
+def test_scores_prefer_exact_root(tmp_path):
+    github, brain = _layout(tmp_path)
+    session = tmp_path / 's.pb'
+    session.write_bytes(b"\x0a\x10C:\\Users\\me\\Documents\\GitHub\\context-monitor\\ui.py"
+                        b"\x12 file:///c%3A/Users/me/Documents/GitHub/context-monitor/a.py"
+                        b"\x12 C:\\\\Users\\\\me\\\\GitHub\\\\context\\\\x.py"
+                        b"\x12 /home/me/GitHub/web-app/y.ts not GitHub/web-apps or myGitHub/context")
+    index = WorkspaceIndex(github_dir=github, brain_dir=brain)
+    assert index.scores('s', session) == {'context-monitor': 2, 'context': 1, 'web-app': 1}
+    assert index.project_for('s', session) == 'context-monitor'
+
+
+def test_incremental_matches_full_scan(tmp_path):
+    github, brain = _layout(tmp_path)
+    rnd = random.Random(7)
+    mentions = [b"GitHub/context-monitor/a.py ", b"GitHub\\web-app\\b ", b"GitHub/context ",
+                b"GitHub/context-monitorx ", b"work/tools/c "]
+    data = b"".join(rnd.randbytes(rnd.randint(0, 300)) + rnd.choice(mentions) for _ in range(400))
+
+    full = WorkspaceIndex(github_dir=github, brain_dir=brain, block=64 * 1024)
+    whole = tmp_path / 'whole.pb'
+    whole.write_bytes(data)
+    expected = full.scores('whole', whole)
+    assert expected['context-monitor'] > 0 and expected['tools'] > 0
+
+    # Grow a file in uneven appends (splitting paths) and scan with tiny blocks
+    index = WorkspaceIndex(github_dir=github, brain_dir=brain, block=97)
+    growing = tmp_path / 'growing.pb'
+    growing.write_bytes(b"")
+    pos = 0
+    while pos < len(data):
+        step = rnd.randint(1, 2000)
+        with open(growing, 'ab') as f:
+            f.write(data[pos:pos + step])
+        pos += step
+        index.scores('growing', growing)
+    assert index.scores('growing', growing) == expected
+
+
+def test_archived_sessions_scan_once(tmp_path):
+    github, brain = _layout(tmp_path)
+    archived = tmp_path / 'old.pb.gz'
+    with gzip.open(archived, 'wb') as f:
+        f.write(b"GitHub/web-app/a.ts " + b"\x00" * 500_000)  # Decompresses to far more than its size on disk
+    index = WorkspaceIndex(github_dir=github, brain_dir=brain)
+    scans = []
+    scan = index._scan
+    index._scan = lambda *args: scans.append(1) or scan(*args)
+
+    for _ in range(3):
+        assert index.scores('old', archived) == {'web-app': 1}
+    assert len(scans) == 1
+
+    # A scan in progress on one session doesn't hold up another
+    live = tmp_path / 'live.pb'
+    live.write_bytes(b"GitHub/context-monitor/x.py ")
+    with index._sessions['old']['lock']:
+        assert index.scores('live', live) == {'context-monitor': 1}
+
+
+if __name__ == "__main__":
+    import tempfile
+    from pathlib import Path
+    for test in (test_discover_roots, test_scores_prefer_exact_root, test_incremental_matches_full_scan,
+                 test_archived_sessions_scan_once):
+        with tempfile.TemporaryDirectory() as tmp:
+            test(Path(tmp))
+    print("✅ Workspace index tests passed!")
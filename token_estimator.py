@@ -0,0 +1,317 @@
+"""
+Token Estimator
+Pluggable token-count estimators run over the text inside conversation files.
+
+A `.pb` conversation is protobuf: text fields interleaved with binary framing
+(tags, varint lengths, ids). Runs of printable ASCII / UTF-8 bytes at least
+TOKEN_MIN_TEXT_RUN bytes long are taken as the text payload (one newline
+after each run); everything else is ignored instead of being counted as
+1 token per 4 bytes.
+
+Estimators (selected per model via TOKEN_ESTIMATOR_BY_MODEL):
+- bytes:     payload bytes / TOKEN_ESTIMATION_BYTES
+- charclass: per-character-class weights (letters, digits, spaces,
+             punctuation, non-ASCII), counted with bytes.translate/count
+- bpe:       real byte-pair encoding with a local tiktoken-format vocabulary
+             (TOKEN_BPE_VOCAB_FILE), loaded on first use; a bounded sample is
+             encoded and extrapolated. Falls back to charclass if missing.
+
+Each estimator runs on whole payload blocks (no per-byte Python loops except
+the sampled BPE) and records its cost in ms per MB. `TokenEngine` remembers
+how far each file has been scanned, so a growing session only scans new bytes.
+"""
+import base64
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from archiver import is_appendable, open_session_file
+from config import (TOKEN_ESTIMATION_BYTES, TOKEN_MIN_TEXT_RUN, TOKEN_SCAN_BLOCK, TOKEN_BPE_VOCAB_FILE,
+                    TOKEN_BPE_SAMPLE, TOKEN_ESTIMATOR_BY_MODEL)
+
+_TEXTISH = bytes(b'\t\n\r' + bytes(range(0x20, 0x7f)) + bytes(range(0x80, 0xf5)))
+
+
+def _run_pattern(min_run):
+    # A single byte class (no UTF-8 sequence validation) keeps the scan at ~150 MB/s
+    return re.compile(rb'[\t\n\r\x20-\x7e\x80-\xf4]{%d,}' % min_run)
+
+
+_TEXT_RUN = _run_pattern(TOKEN_MIN_TEXT_RUN)
+
+
+def _join(runs) -> bytes:
+    # Newline-terminate every run so the payload doesn't depend on how the file was split into blocks
+    return b'\n'.join(runs) + b'\n' if runs else b''
+
+
+def extract_text(data: bytes, min_run=TOKEN_MIN_TEXT_RUN) -> bytes:
+    """Concatenated text payload of a protobuf blob."""
+    pattern = _TEXT_RUN if min_run == TOKEN_MIN_TEXT_RUN else _run_pattern(min_run)
+    return _join(pattern.findall(data))
+
+
+class TokenEstimator:
+    """Base class: subclasses implement `_count(payload) -> float`."""
+    name = 'base'
+    label = 'Base'
+
+    def __init__(self):
+        self.bytes_seen = 0
+        self.seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def count(self, payload: bytes) -> float:
+        start = time.perf_counter()
+        tokens = self._count(payload) if payload else 0.0
+        self.seconds += time.perf_counter() - start
+        self.bytes_seen += len(payload)
+        return tokens
+
+    def _count(self, payload: bytes) -> float:
+        raise NotImplementedError
+
+    @property
+    def cost_per_mb(self) -> Optional[float]:
+        """Measured milliseconds per MB of payload (None until used)."""
+        if not self.bytes_seen:
+            return None
+        return self.seconds * 1000 / (self.bytes_seen / 1024 / 1024)
+
+
+class BytesEstimator(TokenEstimator):
+    name = 'bytes'
+    label = 'Bytes / 4'
+
+    def __init__(self, bytes_per_token=TOKEN_ESTIMATION_BYTES):
+        super().__init__()
+        self.bytes_per_token = bytes_per_token
+
+    def _count(self, payload):
+        return len(payload) / self.bytes_per_token
+
+
+# Byte -> class letter: a(lpha) d(igit) s(pace) p(unct) u(tf-8 lead) c(ontinuation)
+_CLASS_TABLE = bytes(
+    ord('a') if chr(b).isalpha() and b < 0x80 else
+    ord('d') if chr(b).isdigit() and b < 0x80 else
+    ord('s') if b in b' \t\n\r\x0b\x0c' else
+    ord('c') if 0x80 <= b < 0xc0 else
+    ord('u') if b >= 0xc0 else
+    ord('p')
+    for b in range(256))
+
+# Tokens per byte of each class (English prose and code average ~4 chars per token)
+DEFAULT_CLASS_WEIGHTS = {'a': 0.23, 'd': 0.4, 's': 0.08, 'p': 0.6, 'u': 0.9, 'c': 0.0}
+
+
+class CharClassEstimator(TokenEstimator):
+    name = 'charclass'
+    label = 'Character classes'
+
+    def __init__(self, weights=None):
+        super().__init__()
+        self.weights = dict(DEFAULT_CLASS_WEIGHTS, **(weights or {}))
+
+    def _count(self, payload):
+        classes = payload.translate(_CLASS_TABLE)
+        return sum(classes.count(ord(cls)) * w for cls, w in self.weights.items() if w)
+
+
+# GPT-style pre-tokenizer: contractions, words with a leading space, 1-3 digit groups, symbols, spaces
+_PRETOKENIZE = re.compile(rb"'(?:[sdmt]|ll|ve|re)| ?[A-Za-z]+| ?[0-9]{1,3}| ?[^\sA-Za-z0-9]+|\s+(?!\S)|\s+")
+
+
+class BPEEstimator(TokenEstimator):
+    name = 'bpe'
+    label = 'BPE vocabulary'
+
+    def __init__(self, vocab_file=TOKEN_BPE_VOCAB_FILE, sample=TOKEN_BPE_SAMPLE, max_cache=200_000):
+        super().__init__()
+        self.vocab_file = Path(vocab_file)
+        self.sample = sample
+        self.max_cache = max_cache
+        self._ranks = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return self._ranks is not None or self.vocab_file.exists()
+
+    def _load(self):
+        with self._lock:
+            if self._ranks is None:
+                ranks = {}
+                with open(self.vocab_file, 'rb') as f:
+                    for line in f:
+                        parts = line.split()
+                        if len(parts) == 2:
+                            ranks[base64.b64decode(parts[0])] = int(parts[1])
+                self._ranks = ranks
+                print(f"[Tokens] Loaded BPE vocabulary ({len(ranks):,} tokens)")
+        return self._ranks
+
+    def _piece_tokens(self, piece: bytes, ranks) -> int:
+        if piece in ranks:
+            return 1
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        while len(parts) > 1:
+            best, best_rank = None, None
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best, best_rank = i, rank
+            if best is None:
+                break
+            parts[best:best + 2] = [parts[best] + parts[best + 1]]
+        return len(parts)
+
+    def _encode_len(self, text: bytes) -> int:
+        ranks = self._ranks or self._load()
+        cache = self._cache
+        if len(cache) > self.max_cache:
+            cache.clear()
+        total = 0
+        for piece in _PRETOKENIZE.findall(text):
+            n = cache.get(piece)
+            if n is None:
+                n = cache[piece] = self._piece_tokens(piece, ranks)
+            total += n
+        return total
+
+    def _count(self, payload):
+        if len(payload) <= self.sample:
+            return self._encode_len(payload)
+        # Encode evenly spaced windows and scale up
+        windows = 8
+        width = self.sample // windows
+        step = len(payload) // windows
+        sampled = tokens = 0
+        for i in range(windows):
+            window = payload[i * step:i * step + width]
+            sampled += len(window)
+            tokens += self._encode_len(window)
+        return tokens * len(payload) / sampled
+
+
+ESTIMATORS: Dict[str, TokenEstimator] = {
+    'bytes': BytesEstimator(),
+    'charclass': CharClassEstimator(),
+    'bpe': BPEEstimator(),
+}
+FALLBACKS = {'bpe': 'charclass', 'charclass': 'bytes'}
+
+
+def estimator_for(model: Optional[str] = None, override: Optional[str] = None) -> TokenEstimator:
+    """Estimator configured for a model (first available along the fallback chain)."""
+    name = override
+    if not name:
+        name = next((est for prefix, est in TOKEN_ESTIMATOR_BY_MODEL.items()
+                     if model and model.startswith(prefix)), 'bytes')
+    while name in ESTIMATORS and not ESTIMATORS[name].available:
+        name = FALLBACKS.get(name, 'bytes')
+    return ESTIMATORS.get(name, ESTIMATORS['bytes'])
+
+
+# ==== INCREMENTAL FILE SCANS ====
+
+def _reset(state):
+    state.update(resume=0, tokens=0.0, payload=0, tail_tokens=0.0, tail_payload=0)
+
+
+class TokenEngine:
+    """Per-file incremental payload extraction and token estimation."""
+
+    def __init__(self, block=TOKEN_SCAN_BLOCK, min_run=TOKEN_MIN_TEXT_RUN):
+        self.block = block
+        self.min_run = min_run
+        self._files = {}  # path -> scan state
+        self._lock = threading.Lock()  # Guards _files only; each state has its own lock for the scan
+
+    def estimate(self, path, model=None, override=None) -> Optional[dict]:
+        """Token estimate for a conversation file; only bytes appended since the last call are read."""
+        estimator = estimator_for(model, override)
+        key = str(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            state = self._files.get(key)
+            if state is None or state['estimator'] != estimator.name:
+                state = {'estimator': estimator.name, 'lock': threading.Lock(), 'size': -1, 'mtime': None}
+                _reset(state)
+                self._files[key] = state
+        # A first scan of a large file only holds up callers asking about that same file
+        with state['lock']:
+            if (stat.st_size, stat.st_mtime) != (state['size'], state['mtime']):
+                if state['size'] >= 0 and (stat.st_size < state['size'] or not is_appendable(path)):
+                    _reset(state)  # Truncated or rewritten: start over
+                try:
+                    with open_session_file(path) as f:
+                        self._scan(f, state, estimator)
+                except (OSError, EOFError, ValueError) as e:
+                    print(f"[Tokens] Could not scan {Path(path).name}: {e}")
+                    _reset(state)
+                    state['size'] = -1
+                    return None
+                state['size'], state['mtime'] = stat.st_size, stat.st_mtime
+            cost = estimator.cost_per_mb
+            return {
+                'tokens': int(state['tokens'] + state['tail_tokens']),
+                'payload_bytes': state['payload'] + state['tail_payload'],
+                'file_bytes': stat.st_size,
+                'estimator': estimator.name,
+                'cost_ms_per_mb': round(cost, 2) if cost is not None else None,
+            }
+
+    def _scan(self, f, state, estimator):
+        """Extract text runs from `resume` onwards.
+
+        Text at the very end of the data (including a partial UTF-8 sequence
+        or a run still shorter than min_run) may continue in the next write,
+        so it is counted provisionally as the tail and rescanned next time.
+        Only a single text run longer than `block` is split (adding one
+        separator), which keeps memory bounded.
+        """
+        pattern = self._pattern()
+        base = state['resume']
+        if base:
+            f.seek(base)
+        buf = f.read(self.block)
+        while True:
+            more = f.read(self.block)
+            commit_to = len(buf.rstrip(_TEXTISH))
+            if commit_to == 0 and more and len(buf) >= self.block:
+                commit_to = len(buf)  # One huge text region: split it rather than buffer it all
+            payload = _join(pattern.findall(buf, 0, commit_to))
+            state['tokens'] += estimator.count(payload)
+            state['payload'] += len(payload)
+            base += commit_to
+            buf = buf[commit_to:]
+            if not more:
+                break
+            buf += more
+        state['resume'] = base
+        tail_payload = _join(pattern.findall(buf))
+        state['tail_tokens'] = estimator.count(tail_payload)
+        state['tail_payload'] = len(tail_payload)
+
+    def _pattern(self):
+        if self.min_run == TOKEN_MIN_TEXT_RUN:
+            return _TEXT_RUN
+        return _run_pattern(self.min_run)
+
+    def forget(self, path):
+        with self._lock:
+            self._files.pop(str(path), None)
+
+
+token_engine = TokenEngine()
@@ -5,7 +5,11 @@ Extracted from context_monitor.pyw for modularity (Phase 5: V2.52)
 All UI setup functions receive the monitor instance to set widget references.
 """
 import tkinter as tk
+from datetime import datetime
+from functools import partial
 from widgets import ToolTip
+from memory_trend import memory_trend, TOTAL_KEY
+from config import TOKEN_INPUT_SHARE
 
 # Check for optional tray support at module level
 try:
@@ -170,6 +174,11 @@ def setup_compact_mode(monitor, w_px, h_px, x_pos, y_pos):
         lbl.bind('<Button-3>', monitor.show_context_menu)
         monitor.history_labels.append(lbl)
     
+    # Parallel sessions (hidden while only one is active)
+    monitor.sessions_strip = tk.Canvas(content, height=0, bg=monitor.colors['bg2'], highlightthickness=0)
+    monitor.sessions_strip.pack(fill='x', pady=(6, 0))
+    monitor.sessions_strip.bind('<Button-3>', monitor.show_context_menu)
+    
     # Status bar
     monitor.status_frame = tk.Frame(monitor.root, bg=monitor.colors['bg3'], padx=8, pady=6)
     monitor.status_frame.pack(fill='x', side='bottom')
@@ -200,6 +209,8 @@ def setup_compact_mode(monitor, w_px, h_px, x_pos, y_pos):
     _create_tooltip(monitor, monitor.session_label, "Current Project\nAuto-detected from VS Code/GitHub")
     _create_tooltip(monitor, mini_btn, "Toggle Mini Mode (M)\nSwitch to compact view")
     _create_tooltip(monitor, alpha_frame, "Transparency (+/-)\nAdjust window opacity")
+    
+    subscribe_session_views(monitor, monitor.session_label, history_frame)
 
 
 def setup_full_mode(monitor, w_px, h_px, x_pos, y_pos):
@@ -250,6 +261,10 @@ def setup_full_mode(monitor, w_px, h_px, x_pos, y_pos):
                                      bg=monitor.colors['bg2'], fg=monitor.colors['muted'])
     monitor.project_label.pack(anchor='w', pady=(2, 0))
     
+    # Parallel sessions (hidden while only one is active)
+    monitor.sessions_strip = tk.Canvas(monitor.root, height=0, bg=monitor.colors['bg2'], highlightthickness=0)
+    monitor.sessions_strip.pack(fill='x', padx=15)
+    
     # Tab bar
     tab_bar = tk.Frame(monitor.root, bg=monitor.colors['bg3'], height=35)
     tab_bar.pack(fill='x')
@@ -312,6 +327,44 @@ def setup_full_mode(monitor, w_px, h_px, x_pos, y_pos):
                                     bg=monitor.colors['bg3'], fg=monitor.colors['blue'])
     monitor.refresh_btn.pack(side='right', padx=5)
     monitor.refresh_btn.bind('<Button-1>', lambda e: monitor.force_refresh())
+    
+    subscribe_session_views(monitor, monitor.project_label)
+
+
+def draw_session_strip(monitor):
+    """One small gauge per session active in the last pass; click to switch."""
+    canvas = monitor.sessions_strip
+    if not canvas.winfo_exists():
+        return
+    canvas.delete('all')
+    states = monitor.session_tracker.snapshot()
+    if len(states) < 2:
+        canvas.config(height=0)
+        return
+    
+    height = 20
+    canvas.config(height=height)
+    width = max(canvas.winfo_width(), 200)
+    cell = width / len(states)
+    current_id = monitor.current_session.id if monitor.current_session else None
+    for i, state in enumerate(states):
+        x0, x1 = i * cell + 2, (i + 1) * cell - 2
+        pct = state.percent
+        color = monitor.colors['red'] if pct >= 80 else (monitor.colors['yellow'] if pct >= 60 else monitor.colors['green'])
+        tag = f"session_{i}"
+        outline = monitor.colors['blue'] if state.session_id == current_id else ''
+        canvas.create_rectangle(x0, 2, x1, height - 2, fill=monitor.colors['bg3'], outline=outline, tags=tag)
+        fill_w = (x1 - x0) * min(100, pct) / 100
+        if fill_w > 0:
+            canvas.create_rectangle(x0, height - 5, x0 + fill_w, height - 2, fill=color, outline='', tags=tag)
+        name = state.project or state.session_id[:8]
+        max_chars = max(4, int((x1 - x0) / 7) - 5)
+        name = (name[:max_chars - 1] + "…") if len(name) > max_chars else name
+        canvas.create_text(x0 + 4, 9, text=f"{name} {pct}%", anchor='w',
+                           font=('Segoe UI', 7), fill=monitor.colors['text2'], tags=tag)
+        canvas.tag_bind(tag, '<Button-1>', lambda e, sid=state.session_id: monitor.switch_session(sid))
+        canvas.tag_bind(tag, '<Enter>', lambda e: canvas.config(cursor='hand2'))
+        canvas.tag_bind(tag, '<Leave>', lambda e: canvas.config(cursor=''))
 
 
 def bind_keyboard_shortcuts(monitor):
@@ -323,6 +376,100 @@ def bind_keyboard_shortcuts(monitor):
     # 'a' shortcut removed (use 'd' for dashboard)
     monitor.root.bind('<KeyPress-d>', lambda e: monitor.show_analytics_dashboard())
     monitor.root.bind('<KeyPress-e>', lambda e: monitor.export_history_csv())
+    monitor.root.bind('<KeyPress-s>', lambda e: monitor.show_session_picker())
+
+
+# ==== SNAPSHOT VIEWS (updated by the snapshot bus while visible) ====
+
+def subscribe_session_views(monitor, name_label, history_frame=None):
+    """Subscribe the compact/full header widgets to refresh snapshots."""
+    bus = monitor.snapshot_bus
+    bus.subscribe(partial(update_token_labels, monitor, monitor.tokens_label, monitor.delta_label, name_label),
+                  monitor.tokens_label)
+    bus.subscribe(partial(update_handoff_label, monitor, monitor.ttf_label), monitor.ttf_label)
+    if history_frame is not None:
+        bus.subscribe(partial(update_history_labels, monitor, monitor.history_labels), history_frame)
+    bus.subscribe(partial(update_status, monitor, monitor.status_label, monitor.status_frame), monitor.status_label)
+
+
+def update_token_labels(monitor, tokens_label, delta_label, name_label, snap):
+    tokens_label.config(text=f"{snap.tokens_left:,}")
+    
+    if snap.delta > 0:
+        delta_label.config(text=f"↑ +{snap.delta:,} since last", fg=monitor.colors['yellow'])
+    elif snap.delta < 0:
+        delta_label.config(text=f"↓ {snap.delta:,} (new session)", fg=monitor.colors['blue'])
+    else:
+        delta_label.config(text="— no change", fg=monitor.colors['muted'])
+    
+    # PERFORMANCE: Cap display name to prevent layout breakage
+    name = snap.project
+    name_label.config(text=(name[:25] + "...") if len(name) > 25 else name)
+
+
+def update_handoff_label(monitor, label, snap):
+    estimate = snap.metric('handoff')
+    seconds = estimate.seconds if estimate else None
+    
+    # Color based on urgency
+    if seconds is None:
+        color = monitor.colors['text2']
+    elif seconds < 300:  # < 5 min (or past the handoff point)
+        color = monitor.colors['red']
+    elif seconds < 900:  # < 15 min
+        color = monitor.colors['yellow']
+    else:
+        color = monitor.colors['green']
+    label.config(text=f"⏱️ {monitor.format_time_remaining(seconds)}", fg=color)
+
+
+def update_history_labels(monitor, labels, snap):
+    """Mini history panel: recent non-zero deltas, newest first."""
+    recent = snap.metric('recent_deltas')
+    for i, lbl in enumerate(labels):
+        if i >= len(recent):
+            lbl.config(text="—", fg=monitor.colors['muted'], font=('Consolas', 11))
+            continue
+        delta = recent[-(i + 1)]
+        if delta > 0:
+            text = f"+{delta:,}"
+            # Color based on magnitude
+            if delta > 5000:
+                color = monitor.colors['red']
+            elif delta > 2000:
+                color = monitor.colors['yellow']
+            else:
+                color = monitor.colors['green']
+        else:
+            text = f"{delta:,}"
+            color = monitor.colors['blue']
+        lbl.config(text=text, fg=color, font=('Consolas', 11, 'bold') if i == 0 else ('Consolas', 11))
+
+
+def update_status(monitor, status_label, status_frame, snap):
+    updated_time = datetime.fromtimestamp(snap.timestamp).strftime('%H:%M:%S')
+    if snap.percent >= 80:
+        status_label.config(text=f"🔴 Handoff copied! | {updated_time}", fg=monitor.colors['red'])
+        status_frame.config(bg='#2d1518')
+    elif snap.percent >= 60:
+        status_label.config(text=f"⚡ Approaching limit | {updated_time}", fg=monitor.colors['yellow'])
+        status_frame.config(bg='#2d2a1a')
+    else:
+        status_label.config(text=f"✓ Plenty of fuel | {updated_time}", fg=monitor.colors['green'])
+        status_frame.config(bg=monitor.colors['bg3'])
+
+
+def update_token_stats(monitor, used_label, left_label, snap):
+    usage_color = monitor.colors['red'] if snap.percent >= 80 else (monitor.colors['yellow'] if snap.percent >= 60 else monitor.colors['green'])
+    used_label.config(text=f"  • Tokens Used: {snap.tokens_used:,} ({snap.percent}%)", fg=usage_color)
+    left_label.config(text=f"  • Tokens Remaining: {snap.tokens_left:,}")
+
+
+def refresh_diagnostics_inline(monitor, parent, snap):
+    """Re-render the diagnostics tab with the snapshot's process list."""
+    for widget in parent.winfo_children():
+        widget.destroy()
+    render_diagnostics_inline(monitor, parent, snap.metric('processes'))
 
 
 # ==== INLINE TAB RENDERERS (Extracted from context_monitor.pyw) ====
@@ -348,11 +495,13 @@ def render_history_inline(monitor, parent):
     except Exception as e:
         canvas.create_text(310, 190, text=f"Graph error: {e}",
                          fill=monitor.colors['muted'], font=('Segoe UI', 10))
+    monitor.snapshot_bus.subscribe(lambda snap: monitor.draw_mini_graph(), canvas, fresh=True)
 
 
-def render_diagnostics_inline(monitor, parent):
+def render_diagnostics_inline(monitor, parent, procs=None):
     """Render system diagnostics inline"""
-    procs = monitor.get_antigravity_processes()
+    if procs is None:
+        procs = monitor.current_processes()
     limits = monitor.thresholds
     
     total_mem = sum(p.get('Mem', 0) for p in procs)
@@ -370,6 +519,11 @@ def render_diagnostics_inline(monitor, parent):
     
     tk.Label(info_frame, text=f"💾 RAM: {monitor.total_ram_mb // 1024} GB  |  ⚙️ Processes: {len(procs)}  |  📊 Total Memory: {total_mem}MB",
             font=('Segoe UI', 10), bg=monitor.colors['bg'], fg=monitor.colors['text']).pack(anchor='w')
+    tk.Label(info_frame, text=f"🗃️ Metadata cache: {monitor.session_metadata_cache.describe()}",
+            font=('Segoe UI', 8), bg=monitor.colors['bg'], fg=monitor.colors['muted']).pack(anchor='w')
+    
+    # Memory trend sparkline (sampled every poll)
+    _render_memory_trend(monitor, container, limits)
     
     # Process list
     tk.Label(container, text="Process Memory:", font=('Segoe UI', 9, 'bold'),
@@ -380,18 +534,57 @@ def render_diagnostics_inline(monitor, parent):
         ptype = p.get('Type', 'Unknown')
         color = monitor.colors['red'] if mem > limits['proc_crit'] else (monitor.colors['yellow'] if mem > limits['proc_warn'] else monitor.colors['green'])
         
-        tk.Label(container, text=f"  • {ptype}: {mem}MB",
+        trend = memory_trend.trend((p.get('Id'), ptype))
+        trend_text = f"  {trend:+.1f}MB/min" if trend is not None and abs(trend) >= 0.1 else ""
+        tk.Label(container, text=f"  • {ptype}: {mem}MB  ({p.get('CPU', 0):.1f}% CPU){trend_text}",
                 font=('Segoe UI', 9), bg=monitor.colors['bg2'], fg=color).pack(anchor='w')
 
 
+def _render_memory_trend(monitor, parent, limits, width=360, height=50):
+    """Sparkline of total Antigravity memory with leak projection"""
+    series = memory_trend.series.get(TOTAL_KEY)
+    if not series or len(series) < 2:
+        return
+    
+    tk.Label(parent, text="Memory Trend:", font=('Segoe UI', 9, 'bold'),
+            bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w', pady=(5, 2))
+    canvas = tk.Canvas(parent, width=width, height=height, bg=monitor.colors['bg'],
+                       highlightthickness=0)
+    canvas.pack(anchor='w')
+    
+    vals = series.values(width // 3)
+    top = max(max(vals), limits['total_warn']) * 1.1
+    step = width / max(1, len(vals) - 1)
+    coords = []
+    for i, v in enumerate(vals):
+        coords += [i * step, height - 2 - (v / top) * (height - 4)]
+    
+    # Warning line, then the series
+    warn_y = height - 2 - (limits['total_warn'] / top) * (height - 4)
+    canvas.create_line(0, warn_y, width, warn_y, fill=monitor.colors['yellow'], dash=(2, 4))
+    canvas.create_line(*coords, fill=monitor.colors['blue'], width=2)
+    
+    alerts = memory_trend.check(limits)
+    if alerts:
+        a = alerts[0]
+        text = f"⚠️ {a.label}: {a.slope_mb_per_min:+.1f}MB/min, limit in ~{monitor.format_time_remaining(a.seconds_to_limit)}"
+        color = monitor.colors['red']
+    else:
+        trend = memory_trend.trend(TOTAL_KEY)
+        text = f"Total {series.latest}MB" + (f"  ({trend:+.1f}MB/min)" if trend is not None else "")
+        color = monitor.colors['muted']
+    tk.Label(parent, text=text, font=('Segoe UI', 8),
+            bg=monitor.colors['bg2'], fg=color).pack(anchor='w')
+
+
 def render_token_stats_inline(monitor, parent):
     """Render token statistics inline"""
     if not monitor.current_session:
         return
     
-    context_window = monitor._context_window
-    tokens_used = monitor.current_session['estimated_tokens'] // 10
-    context_limit = monitor._context_window
+    # Same calibrated reading (and size fallback) the monitor records
+    tokens_used, context_window, _ = monitor.session_reading(monitor.current_session)
+    context_limit = context_window
     percent_used = min(100, (tokens_used / context_limit) * 100)
     tokens_left = max(0, context_limit - tokens_used)
     
@@ -408,21 +601,21 @@ def render_token_stats_inline(monitor, parent):
     
     usage_color = monitor.colors['red'] if percent_used >= 80 else (monitor.colors['yellow'] if percent_used >= 60 else monitor.colors['green'])
     
-    # Store these for updates
-    monitor.stats_tokens_used_label = tk.Label(container, text=f"  • Tokens Used: {tokens_used:,} ({percent_used}%)",
+    used_label = tk.Label(container, text=f"  • Tokens Used: {tokens_used:,} ({percent_used}%)",
             font=('Segoe UI', 10), bg=monitor.colors['bg2'], fg=usage_color)
-    monitor.stats_tokens_used_label.pack(anchor='w')
+    used_label.pack(anchor='w')
     
-    monitor.stats_tokens_left_label = tk.Label(container, text=f"  • Tokens Remaining: {tokens_left:,}",
+    left_label = tk.Label(container, text=f"  • Tokens Remaining: {tokens_left:,}",
             font=('Segoe UI', 10), bg=monitor.colors['bg2'], fg=monitor.colors['blue'])
-    monitor.stats_tokens_left_label.pack(anchor='w')
+    left_label.pack(anchor='w')
+    monitor.snapshot_bus.subscribe(partial(update_token_stats, monitor, used_label, left_label), container, fresh=True)
     
     tk.Label(container, text=f"  • Total Capacity: {context_window:,}",
             font=('Segoe UI', 10), bg=monitor.colors['bg2'], fg=monitor.colors['muted']).pack(anchor='w')
     
     # Breakdown
-    estimated_input = int(tokens_used * 0.4)
-    estimated_output = int(tokens_used * 0.6)
+    estimated_input = int(tokens_used * TOKEN_INPUT_SHARE)
+    estimated_output = tokens_used - estimated_input
     
     tk.Label(container, text="Estimated Breakdown:", font=('Segoe UI', 9, 'bold'),
             bg=monitor.colors['bg2'], fg=monitor.colors['text']).pack(anchor='w', pady=(10, 5))
@@ -526,7 +719,16 @@ def render_quota_inline(monitor, parent):
         
     tk.Label(gauge_frame, text=reset_text, font=('Segoe UI', 9, 'italic'),
             bg=monitor.colors['bg2'], fg=reset_color).pack(anchor='e')
-    
+
+    # Data age (API snapshots are served from cache while refreshing)
+    if status.get('source') == 'antigravity_api':
+        age = status.get('data_age_seconds', 0)
+        age_text = f"Updated {age}s ago" if age < 120 else f"Updated {age // 60}m ago"
+        if status.get('is_stale'):
+            age_text += " • refreshing"
+        tk.Label(gauge_frame, text=age_text, font=('Segoe UI', 8),
+                bg=monitor.colors['bg2'], fg=monitor.colors['muted']).pack(anchor='e')
+
     # Manual Add Buttons
     btn_frame = tk.Frame(container, bg=monitor.colors['bg2'], pady=15)
     btn_frame.pack(fill='x')
@@ -0,0 +1,117 @@
+"""
+Usage Window
+Run-length bucketed rolling window used by QuotaManager.
+
+Usage is stored as (timestamp, count) buckets with running cumulative
+counts, so adding and pruning are O(1) amortized and the "when does the
+next slot recover" lookup is a binary search instead of a scan.
+"""
+from bisect import bisect_left, insort
+from typing import Iterable, Iterator, List
+
+# Entries closer together than this share a bucket (seconds).
+# Expiry may be late by at most this much.
+BUCKET_RESOLUTION = 1.0
+
+
+class UsageWindow:
+    """Rolling window of usage events stored as run-length buckets."""
+
+    def __init__(self, buckets: Iterable = ()):
+        self._ts: List[float] = []   # Bucket timestamps (ascending)
+        self._cum: List[int] = []    # Cumulative count through each bucket
+        self._head = 0               # First live bucket
+        self._expired = 0            # Cumulative count before _head
+        for ts, count in buckets:
+            self.append(ts, count)
+
+    # === MUTATION ===
+
+    def append(self, ts, count=1):
+        """Record `count` units of usage at time `ts`."""
+        if count <= 0:
+            return
+        total = self._cum[-1] if self._cum else self._expired
+
+        if self._head < len(self._ts):
+            last_ts = self._ts[-1]
+            if 0 <= ts - last_ts < BUCKET_RESOLUTION:
+                self._cum[-1] += count
+                return
+            if ts < last_ts:
+                self._insert_out_of_order(ts, count)
+                return
+
+        self._ts.append(ts)
+        self._cum.append(total + count)
+
+    def extend(self, timestamps: Iterable[float]):
+        """Append one unit per timestamp (legacy deque-compatible API)."""
+        for ts in timestamps:
+            self.append(ts)
+
+    def clear(self):
+        self._ts.clear()
+        self._cum.clear()
+        self._head = 0
+        self._expired = 0
+
+    def prune(self, now, window_seconds):
+        """Drop buckets older than the window. O(1) amortized."""
+        ts, head = self._ts, self._head
+        while head < len(ts) and now - ts[head] > window_seconds:
+            self._expired = self._cum[head]
+            head += 1
+        self._head = head
+
+        # Compact occasionally so dead buckets don't accumulate
+        if head > 64 and head * 2 > len(ts):
+            del self._ts[:head]
+            del self._cum[:head]
+            self._head = 0
+
+    def _insert_out_of_order(self, ts, count):
+        """Slow path for timestamps older than the newest bucket (rare)."""
+        live = self.buckets()
+        insort(live, [ts, count])
+        self.clear()
+        for b_ts, b_count in live:
+            self.append(b_ts, b_count)
+
+    # === QUERIES ===
+
+    @property
+    def used(self) -> int:
+        """Units of usage currently in the window."""
+        return (self._cum[-1] - self._expired) if self._head < len(self._cum) else 0
+
+    def oldest(self):
+        return self._ts[self._head] if self._head < len(self._ts) else None
+
+    def time_to_recover(self, now, window_seconds, capacity):
+        """Seconds until usage drops below `capacity` (0 if already below)."""
+        used = self.used
+        if used < capacity:
+            return 0
+        # The bucket whose expiry frees the (used - capacity + 1)-th unit
+        target = self._expired + (used - capacity + 1)
+        idx = bisect_left(self._cum, target, self._head)
+        return max(0, (self._ts[idx] + window_seconds) - now)
+
+    def buckets(self) -> List[list]:
+        """Live buckets as [[ts, count], ...] (persisted format)."""
+        out = []
+        prev = self._expired
+        for i in range(self._head, len(self._ts)):
+            out.append([self._ts[i], self._cum[i] - prev])
+            prev = self._cum[i]
+        return out
+
+    def __len__(self):
+        return self.used
+
+    def __iter__(self) -> Iterator[float]:
+        """Yield one timestamp per unit (legacy deque-compatible API)."""
+        for ts, count in self.buckets():
+            for _ in range(count):
+                yield ts
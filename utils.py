@@ -6,37 +6,17 @@ import ctypes
 import platform
 import re
 # Path objects passed from callers, no import needed
-import subprocess
 from config import DEFAULT_CONTEXT_WINDOW, TOKEN_ESTIMATION_BYTES
+from process_sampler import process_sampler
+from token_estimator import token_engine
 
 def get_antigravity_processes():
-    """Get memory/CPU usage of Antigravity processes (Fast fallback)"""
-    # PowerShell/WMI is too slow on this user's machine (causing UI freeze)
-    # We will iterate processes using tasklist which is faster, or just return empty for speed
-    try:
-         # Fast check using tasklist CSV format
-        cmd = "tasklist /FI \"IMAGENAME eq Antigravity.exe\" /FO CSV /NH"
-        result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
-        
-        data = []
-        if result.stdout:
-            for line in result.stdout.splitlines():
-                if 'Antigravity' in line:
-                    parts = line.split('","')
-                    if len(parts) >= 5:
-                        pid = parts[1]
-                        mem_str = parts[4].replace('"', '').replace(' K', '').replace(',', '')
-                        mem_mb = int(mem_str) // 1024
-                        data.append({
-                            'Id': pid,
-                            'Type': 'Process', # Detailed type requires slow WMI
-                            'Mem': mem_mb,
-                            'CPU': 0 # CPU requires slow PerfCounters
-                        })
-        return data
-    except Exception as e:
-        print(f"Error getting processes: {e}")
-        return []
+    """Get memory/CPU usage and type of Antigravity processes.
+    
+    Reads the OS process table directly (no tasklist spawn); CPU% is measured
+    since the previous call.
+    """
+    return process_sampler.sample()
 
 def parse_varint(data, offset):
     """Parse a protobuf varint from data at offset."""
@@ -88,10 +68,11 @@ def calculate_thresholds(ram_mb):
         'total_crit': max(3000, int(ram_mb * 0.15))  # 15%
     }
 
-def extract_pb_tokens(pb_file_path, default_context_window=DEFAULT_CONTEXT_WINDOW):
+def extract_pb_tokens(pb_file_path, default_context_window=DEFAULT_CONTEXT_WINDOW, model=None, estimator=None):
     """
     Extract token count from protobuf conversation file.
-    Uses file-size estimation (st_size // 4) for refined accuracy and stability.
+    Runs the model's token estimator over the file's text payload (incremental,
+    see token_estimator); falls back to file-size estimation (st_size // 4).
     Only reads partial content for project detection to avoid race conditions.
     """
     try:
@@ -109,8 +90,12 @@ def extract_pb_tokens(pb_file_path, default_context_window=DEFAULT_CONTEXT_WINDO
             # File might be locked or moving
             return None
         
-        # Estimate: 4 bytes per token
-        estimated_tokens = file_size // TOKEN_ESTIMATION_BYTES
+        # Estimate from the text payload; 4 bytes per token if the file can't be scanned
+        estimate = token_engine.estimate(pb_file_path, model, estimator)
+        if estimate:
+            estimated_tokens = estimate['tokens']
+        else:
+            estimated_tokens = file_size // TOKEN_ESTIMATION_BYTES
         
         # Extract project name (Optimized: First 100KB only)
         project_name = None
@@ -129,7 +114,9 @@ def extract_pb_tokens(pb_file_path, default_context_window=DEFAULT_CONTEXT_WINDO
             'context_window': default_context_window,
             'tokens_remaining': default_context_window - estimated_tokens,
             'project_name': project_name,
-            'method': 'stat_estimation'
+            'method': estimate['estimator'] if estimate else 'stat_estimation',
+            'payload_bytes': estimate['payload_bytes'] if estimate else file_size,
+            'cost_ms_per_mb': estimate['cost_ms_per_mb'] if estimate else None
         }
     except Exception as e:
         print(f"[Token Extraction] Error: {e}")
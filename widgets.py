@@ -53,3 +53,99 @@ class ToolTip:
             except:
                 pass
             self.tooltip = None
+
+
+class VirtualList:
+    """Canvas list that only draws the rows in view (any number of items).
+
+    `row_fn(index) -> (title, detail, color)` is called for visible rows only;
+    `on_select(index)` runs on double-click or Enter.
+    """
+
+    def __init__(self, parent, colors, row_fn, on_select, row_height=38):
+        self.colors = colors
+        self.row_fn = row_fn
+        self.on_select = on_select
+        self.row_height = row_height
+        self.count = 0
+        self.selected = 0
+        self.top = 0  # Index of the first visible row
+
+        self.frame = tk.Frame(parent, bg=colors['bg'])
+        self.canvas = tk.Canvas(self.frame, bg=colors['bg'], highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(self.frame, orient='vertical', command=self._on_scrollbar)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        self.canvas.bind('<Configure>', lambda e: self.redraw())
+        self.canvas.bind('<MouseWheel>', lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.canvas.bind('<Button-4>', lambda e: self.scroll(-1))
+        self.canvas.bind('<Button-5>', lambda e: self.scroll(1))
+        self.canvas.bind('<Button-1>', self._on_click)
+        self.canvas.bind('<Double-Button-1>', lambda e: self.activate())
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_count(self, count, reset=True):
+        """Replace the contents (rows are fetched lazily through row_fn)."""
+        self.count = count
+        if reset:
+            self.top = 0
+            self.selected = 0
+        self.selected = min(self.selected, max(0, count - 1))
+        self.redraw()
+
+    @property
+    def visible_rows(self):
+        return max(1, self.canvas.winfo_height() // self.row_height)
+
+    def scroll(self, rows):
+        self.top = max(0, min(self.top + rows, self.count - self.visible_rows))
+        self.redraw()
+
+    def move_selection(self, step):
+        if not self.count:
+            return
+        self.selected = max(0, min(self.selected + step, self.count - 1))
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible_rows:
+            self.top = self.selected - self.visible_rows + 1
+        self.redraw()
+
+    def redraw(self):
+        canvas = self.canvas
+        canvas.delete('all')
+        width = canvas.winfo_width()
+        rows = self.visible_rows
+        self.top = max(0, min(self.top, self.count - rows))
+        for offset, index in enumerate(range(self.top, min(self.count, self.top + rows + 1))):
+            y = offset * self.row_height
+            if index == self.selected:
+                canvas.create_rectangle(0, y, width, y + self.row_height, fill=self.colors['bg3'], outline='')
+            title, detail, color = self.row_fn(index)
+            canvas.create_text(10, y + 11, text=title, anchor='w', font=('Segoe UI', 9, 'bold'), fill=color)
+            canvas.create_text(10, y + 27, text=detail, anchor='w', font=('Segoe UI', 8), fill=self.colors['muted'])
+        if self.count > rows:
+            self.scrollbar.set(self.top / self.count, min(1.0, (self.top + rows) / self.count))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.top = int(float(amount) * self.count)
+        elif action == 'scroll':
+            step = self.visible_rows if unit == 'pages' else 1
+            self.top += int(amount) * step
+        self.scroll(0)
+
+    def _on_click(self, event):
+        index = self.top + event.y // self.row_height
+        if index < self.count:
+            self.selected = index
+            self.redraw()
+
+    def activate(self):
+        if self.count:
+            self.on_select(self.selected)
@@ -0,0 +1,275 @@
+"""
+Workspace Index
+Attributes conversations to projects by counting mentions of known
+workspace roots in the conversation file.
+
+Roots come from the GitHub dir's subfolders, roots configured in settings
+('workspace_roots'), and git repositories referenced by paths in brain
+artifacts. Every root is matched by its last two path components (e.g.
+`GitHub/my-repo`), which survives drive letters, home dirs, file:// URIs and
+escaped backslashes. All roots are compiled into one bytes regex, so a file
+is scanned in a single pass (~100+ MB/s).
+
+Scans are incremental: each session remembers the offset it has counted up
+to, and only bytes appended since are read on the next call. Matches too
+close to the end of the file (where a longer path may still be written) are
+re-counted each time instead of being committed.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from archiver import is_appendable, open_session_file
+from config import (GITHUB_DIR, BRAIN_DIR, WORKSPACE_INDEX_TTL, WORKSPACE_MIN_HITS,
+                    WORKSPACE_SCAN_BLOCK, WORKSPACE_BRAIN_FILES)
+
+_SEP = rb'[/\\]{1,4}'  # Raw, JSON-escaped or doubled separators
+_BOUNDARY = frozenset(b'abcdefghijklmnopqrstuvwxyz0123456789_.-')
+
+# Absolute paths in brain artifacts (Windows drives, file:// URIs, POSIX)
+_PATH_RE = re.compile(r'(?:file:///)?(?:[A-Za-z](?::|%3A)[\\/]|(?<![\w.:/])/(?=[\w.-]+/))[^\s"\'<>|*?`()\[\]]+')
+
+
+def _key(parent: str, name: str) -> bytes:
+    return f"{parent}/{name}".lower().encode('utf-8')
+
+
+class _Matcher:
+    """One compiled alternation over every root's `parent/name` tail.
+
+    Input is lower-cased before matching (bytes.lower is far cheaper than
+    re.IGNORECASE), and names are grouped under their parent so a literal
+    prefix such as `github` lets the regex engine skip most of the buffer.
+    """
+
+    def __init__(self, roots: Dict[bytes, str]):
+        self.roots = roots
+        self.pattern = None
+        self.overlap = 0
+        if roots:
+            by_parent = {}
+            for key in roots:
+                parent, name = key.split(b'/', 1)
+                by_parent.setdefault(parent, []).append(name)
+            groups = []
+            for parent in sorted(by_parent, key=len, reverse=True):
+                names = sorted(by_parent[parent], key=len, reverse=True)  # Prefer the longest name
+                groups.append(re.escape(parent) + _SEP + rb'(?:' + b'|'.join(map(re.escape, names)) + rb')')
+            self.pattern = re.compile(rb'(?:' + b'|'.join(groups) + rb')(?![\w.-])')
+            # Longest possible match plus lookahead room
+            self.overlap = max(len(k) for k in roots) + 8
+
+    def project(self, buf: bytes, m) -> Optional[str]:
+        """Project for a match in lower-cased `buf`, or None if it is part of a longer name."""
+        if m.start() and buf[m.start() - 1] in _BOUNDARY:
+            return None
+        return self.roots.get(re.sub(rb'[/\\]+', b'/', m.group()))
+
+
+def discover_roots(github_dir=GITHUB_DIR, extra_roots: Iterable = (), brain_dir=BRAIN_DIR,
+                   brain_files=WORKSPACE_BRAIN_FILES) -> Dict[bytes, str]:
+    """Map of `parent/name` match key -> project name for every known root."""
+    roots = {}
+
+    def add(path: Path):
+        if path.name and path.parent.name and not path.name.startswith('.'):
+            roots.setdefault(_key(path.parent.name, path.name), path.name)
+
+    if github_dir and Path(github_dir).is_dir():
+        for d in Path(github_dir).iterdir():
+            if d.is_dir():
+                add(d)
+    for root in extra_roots or ():
+        add(Path(root).expanduser())
+    for root in _roots_from_brain(brain_dir, brain_files):
+        add(root)
+    return roots
+
+
+def _roots_from_brain(brain_dir, limit) -> List[Path]:
+    """Git repositories containing paths mentioned in the newest brain artifacts."""
+    if not brain_dir or not Path(brain_dir).is_dir():
+        return []
+    files = []
+    for session in Path(brain_dir).iterdir():
+        if not session.is_dir():
+            continue
+        for f in session.glob('*.md'):
+            try:
+                files.append((f.stat().st_mtime, f))
+            except OSError:
+                continue
+    files.sort(reverse=True)
+
+    found, checked = set(), {}
+    for _, f in files[:limit]:
+        try:
+            with open(f, 'r', encoding='utf-8', errors='ignore') as fh:
+                text = fh.read(256 * 1024)
+        except OSError:
+            continue
+        for raw in _PATH_RE.findall(text):
+            path = raw.replace('file:///', '').replace('%3A', ':')
+            repo = _git_root(Path(path), checked)
+            if repo:
+                found.add(repo)
+    return sorted(found)
+
+
+def _git_root(path: Path, checked: dict) -> Optional[Path]:
+    for parent in [path] + list(path.parents)[:8]:
+        if parent in checked:
+            return checked[parent]
+        try:
+            is_repo = (parent / '.git').exists()
+        except OSError:
+            is_repo = False
+        if is_repo:
+            checked[parent] = parent
+            return parent
+        checked[parent] = None
+    return None
+
+
+class WorkspaceIndex:
+    """Known workspace roots plus incremental per-session mention counts."""
+
+    def __init__(self, github_dir=GITHUB_DIR, brain_dir=BRAIN_DIR, extra_roots=(),
+                 ttl=WORKSPACE_INDEX_TTL, min_hits=WORKSPACE_MIN_HITS, block=WORKSPACE_SCAN_BLOCK):
+        self.github_dir = github_dir
+        self.brain_dir = brain_dir
+        self.extra_roots = list(extra_roots)
+        self.ttl = ttl
+        self.min_hits = min_hits
+        self.block = block
+        self._matcher = _Matcher({})
+        self._version = 0
+        self._built = None  # (signature, time)
+        self._sessions = {}  # sid -> {'version', 'path', 'lock', 'resume', 'size', 'mtime', 'counts', 'tail'}
+        self._lock = threading.RLock()
+
+    # --- Roots ---
+
+    def set_extra_roots(self, roots):
+        with self._lock:
+            if list(roots) != self.extra_roots:
+                self.extra_roots = list(roots)
+                self._built = None
+
+    def _signature(self):
+        sig = [tuple(self.extra_roots)]
+        for d in (self.github_dir, self.brain_dir):
+            try:
+                sig.append(os.stat(d).st_mtime)
+            except (OSError, TypeError):
+                sig.append(None)
+        return tuple(sig)
+
+    def refresh(self, force=False):
+        """Rebuild the matcher if the roots may have changed (at most once per ttl)."""
+        with self._lock:
+            now = time.time()
+            if not force and self._built and now - self._built[1] < self.ttl:
+                return
+            signature = self._signature()
+            if not force and self._built and self._built[0] == signature:
+                self._built = (signature, now)
+                return
+            roots = discover_roots(self.github_dir, self.extra_roots, self.brain_dir)
+            if roots != self._matcher.roots:
+                self._matcher = _Matcher(roots)
+                self._version += 1
+                print(f"[Workspace] Indexed {len(roots)} workspace roots")
+            self._built = (signature, now)
+
+    @property
+    def projects(self) -> List[str]:
+        return sorted(set(self._matcher.roots.values()))
+
+    # --- Scanning ---
+
+    def scores(self, session_id, path) -> Counter:
+        """Mentions per project in a conversation file (incremental)."""
+        self.refresh()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return Counter()
+        with self._lock:
+            matcher = self._matcher
+            if matcher.pattern is None:
+                return Counter()
+            state = self._sessions.get(session_id)
+            if state is None or state['version'] != self._version or str(path) != state['path']:
+                state = {'version': self._version, 'path': str(path), 'lock': threading.Lock(),
+                         'resume': 0, 'size': -1, 'mtime': None, 'counts': Counter(), 'tail': Counter()}
+                self._sessions[session_id] = state
+        # Scanning one conversation doesn't hold up lookups for the others
+        with state['lock']:
+            if (stat.st_size, stat.st_mtime) != (state['size'], state['mtime']):
+                if state['size'] >= 0 and (stat.st_size < state['size'] or not is_appendable(path)):
+                    # Truncated or rewritten: start over
+                    state.update(resume=0, counts=Counter(), tail=Counter())
+                try:
+                    with open_session_file(path) as f:
+                        state['resume'], state['tail'] = self._scan(matcher, f, state['resume'], state['counts'])
+                except (OSError, EOFError, ValueError) as e:
+                    print(f"[Workspace] Could not scan {Path(path).name}: {e}")
+                    state.update(resume=0, size=-1, counts=Counter(), tail=Counter())  # Drop partial counts
+                    return Counter()
+                state['size'], state['mtime'] = stat.st_size, stat.st_mtime
+            return state['counts'] + state['tail']
+
+    def _scan(self, matcher, f, resume, counts) -> Tuple[int, Counter]:
+        """Count matches starting at `resume`; returns (new resume, uncommitted tail counts).
+
+        A match is committed only when at least `overlap` bytes follow it, so a
+        path still being written can't be counted as a shorter root.
+        """
+        pattern, overlap = matcher.pattern, matcher.overlap
+        base = max(0, resume - 1)  # One byte of lookbehind context
+        if base:
+            f.seek(base)
+        buf = f.read(self.block).lower()
+        while True:
+            more = f.read(self.block).lower()
+            limit = len(buf) - overlap  # Only matches starting before this are final
+            pos = resume - base
+            for m in pattern.finditer(buf, pos):
+                if m.start() >= limit:
+                    break
+                project = matcher.project(buf, m)
+                if project:
+                    counts[project] += 1
+                pos = m.end()
+            resume = base + max(pos, limit)
+            if not more:
+                break
+            cut = max(0, resume - 1 - base)
+            buf = buf[cut:] + more
+            base += cut
+
+        tail = Counter()
+        for m in pattern.finditer(buf, resume - base):
+            project = matcher.project(buf, m)
+            if project:
+                tail[project] += 1
+        return resume, tail
+
+    def project_for(self, session_id, path) -> Optional[str]:
+        """Most-mentioned project, if it has at least `min_hits` mentions."""
+        ranked = self.scores(session_id, path).most_common(1)
+        if ranked and ranked[0][1] >= self.min_hits:
+            return ranked[0][0]
+        return None
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+workspace_index = WorkspaceIndex()